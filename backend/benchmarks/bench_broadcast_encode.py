@@ -0,0 +1,82 @@
+"""
+Broadcast encode cost per message
+Compares per-receiver send_json encoding with encoding the frame once on the sender,
+and the JSON and MessagePack encodings of the same frame.
+
+    python benchmarks/bench_broadcast_encode.py [receivers]
+"""
+import json
+import sys
+import uuid
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from chat.frames import decode_frame_msgpack, encode_frame, encode_frame_msgpack  # noqa: E402
+from chat.models import Room, Message  # noqa: E402
+from chat.serializers import MessageSerializer  # noqa: E402
+
+
+def legacy_scrub(message):
+    """The recursive UUID scrubber the consumer used before frames were pre-encoded"""
+    if isinstance(message, dict):
+        serialized = {}
+        for key, value in message.items():
+            if hasattr(value, 'hex'):
+                serialized[key] = str(value)
+            elif isinstance(value, dict):
+                serialized[key] = legacy_scrub(value)
+            elif isinstance(value, list):
+                serialized[key] = [
+                    legacy_scrub(item) if isinstance(item, dict) else str(item) if hasattr(item, 'hex') else item
+                    for item in value
+                ]
+            else:
+                serialized[key] = value
+        return serialized
+    return message
+
+
+def sample_message():
+    now = timezone.now()
+    user = User(id=1, username='bench', email='bench@example.com', date_joined=now)
+    room = Room(id=uuid.uuid4(), name='Bench', slug='bench', created_by=user)
+    message = Message(id=uuid.uuid4(), room=room, user=user, content='x' * 120, created_at=now, updated_at=now)
+    return MessageSerializer(message).data
+
+
+def main():
+    receivers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    message = sample_message()
+    messages = 50
+
+    def before():
+        for _ in range(messages):
+            scrubbed = legacy_scrub(message)
+            for _ in range(receivers):
+                json.dumps({'type': 'chat_message', 'message': scrubbed})
+
+    def after():
+        for _ in range(messages):
+            encode_frame({'type': 'chat_message', 'message': message})
+
+    print(f"{messages} messages fanned out to {receivers} receivers")
+    report('per-receiver send_json (before)', messages, measure(before, repeat=3), unit='msg')
+    report('serialize-once frame (after)', messages, measure(after), unit='msg')
+
+    frame = {'type': 'chat_message', 'message': message}
+    text, packed = encode_frame(frame), encode_frame_msgpack(frame)
+    runs = 10000
+    print(f"frame size: json {len(text.encode())} B, msgpack {len(packed)} B")
+    report('json encode', runs, measure(lambda: [encode_frame(frame) for _ in range(runs)]), unit='frame')
+    report('msgpack encode', runs, measure(lambda: [encode_frame_msgpack(frame) for _ in range(runs)]), unit='frame')
+    report('json decode', runs, measure(lambda: [json.loads(text) for _ in range(runs)]), unit='frame')
+    report('msgpack decode', runs, measure(lambda: [decode_frame_msgpack(packed) for _ in range(runs)]), unit='frame')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Message page serialization
+Compares MessageSerializer over model instances with serialize_message_rows over
+values_list() rows, for the serialization alone and with the page query included.
+
+    python benchmarks/bench_message_serialize.py [page size]
+"""
+import sys
+
+from common import measure, report, setup_django, use_scratch_database
+
+setup_django()
+use_scratch_database()
+
+from django.contrib.auth.models import User  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from chat.models import Room, Message  # noqa: E402
+from chat.serializers import MESSAGE_ROW_FIELDS, MessageSerializer, serialize_message_rows  # noqa: E402
+
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    users = [User.objects.create_user(f'bench{i}', email=f'bench{i}@example.com') for i in range(5)]
+    room = Room.objects.create(name='Bench', created_by=users[0])
+    Message.objects.bulk_create(
+        Message(room=room, user=users[i % len(users)], content=f'message {i} ' + 'x' * 80) for i in range(page_size)
+    )
+    messages = Message.objects.filter(room=room).order_by('created_at')
+    instances = list(messages.select_related('user'))
+    rows = list(messages.values_list(*MESSAGE_ROW_FIELDS))
+    assert JSONRenderer().render(serialize_message_rows(rows)) == JSONRenderer().render(
+        MessageSerializer(instances, many=True).data
+    )
+
+    pages = 200
+    rows_total = pages * page_size
+    print(f"{pages} pages of {page_size} messages")
+    report('MessageSerializer (instances)', rows_total,
+           measure(lambda: [MessageSerializer(instances, many=True).data for _ in range(pages)]), unit='row')
+    report('serialize_message_rows (values_list)', rows_total,
+           measure(lambda: [serialize_message_rows(rows) for _ in range(pages)]), unit='row')
+
+    pages = 50
+    rows_total = pages * page_size
+    report('query + MessageSerializer', rows_total, measure(
+        lambda: [MessageSerializer(messages.select_related('user'), many=True).data for _ in range(pages)]
+    ), unit='row')
+    report('query + serialize_message_rows', rows_total, measure(
+        lambda: [serialize_message_rows(messages.values_list(*MESSAGE_ROW_FIELDS)) for _ in range(pages)]
+    ), unit='row')
+
+
+if __name__ == '__main__':
+    main()
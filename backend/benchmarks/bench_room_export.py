@@ -0,0 +1,68 @@
+"""
+Room history export throughput
+Rows per second of the NDJSON export, plain and gzip, and its peak Python memory
+for rooms of different sizes (flat if nothing is held beyond one chunk).
+
+    python benchmarks/bench_room_export.py [largest room size]
+"""
+import sys
+import tracemalloc
+
+from common import measure, report, setup_django, use_scratch_database
+
+setup_django()
+use_scratch_database()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from chat.export import gzip_stream, iter_room_ndjson  # noqa: E402
+from chat.models import Room, Message  # noqa: E402
+
+
+def create_room(name, size, users):
+    room = Room.objects.create(name=name, created_by=users[0])
+    batch = 5000
+    for start in range(0, size, batch):
+        Message.objects.bulk_create(
+            Message(room=room, user=users[i % len(users)], content=f'message {i} ' + 'x' * 80)
+            for i in range(start, min(size, start + batch))
+        )
+    return room
+
+
+def drain(stream):
+    total = 0
+    for block in stream:
+        total += len(block)
+    return total
+
+
+def peak_memory(stream_factory):
+    tracemalloc.start()
+    drain(stream_factory())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = [User.objects.create_user(f'bench{i}', email=f'bench{i}@example.com') for i in range(5)]
+    sizes = [largest // 10, largest]
+    rooms = {size: create_room(f'Export {size}', size, users) for size in sizes}
+
+    room = rooms[largest]
+    plain = drain(iter_room_ndjson(room.id))
+    compressed = drain(gzip_stream(iter_room_ndjson(room.id)))
+    print(f"{largest} messages: {plain / 1e6:.1f} MB NDJSON, {compressed / 1e6:.1f} MB gzip")
+    report('NDJSON export', largest, measure(lambda: drain(iter_room_ndjson(room.id)), repeat=3), unit='row')
+    report('NDJSON export + gzip', largest,
+           measure(lambda: drain(gzip_stream(iter_room_ndjson(room.id))), repeat=3), unit='row')
+
+    for size, room in rooms.items():
+        peak = peak_memory(lambda: iter_room_ndjson(room.id))
+        print(f"peak Python memory exporting {size:>8} rows: {peak / 1e6:.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+WebSocket JWT handshakes per second per worker
+Compares the old double-verify + query-per-handshake path with the cached middleware.
+
+    python benchmarks/bench_ws_handshake.py [handshakes] [distinct_users]
+"""
+import asyncio
+import sys
+import time
+
+from common import report, setup_django, use_scratch_database
+
+setup_django()
+use_scratch_database()
+
+from channels.db import database_sync_to_async  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken, UntypedToken  # noqa: E402
+
+from chat.middleware import JwtAuthMiddleware, user_cache, verified_token_cache  # noqa: E402
+
+User = get_user_model()
+
+
+class LegacyJwtAuthMiddleware(JwtAuthMiddleware):
+    """The middleware as it was: two signature checks and a query per handshake"""
+
+    @database_sync_to_async
+    def get_user_from_token(self, token):
+        UntypedToken(token)
+        return User.objects.get(id=AccessToken(token)['user_id'])
+
+
+async def inner(scope, receive, send):
+    assert scope['user'].is_authenticated
+
+
+async def receive():
+    return {'type': 'websocket.connect'}
+
+
+async def send(message):
+    return None
+
+
+async def run(middleware_class, tokens, handshakes):
+    middleware = middleware_class(inner)
+    started = time.perf_counter()
+    for i in range(handshakes):
+        scope = {
+            'type': 'websocket',
+            'path': '/ws/chat/bench/',
+            'query_string': f'token={tokens[i % len(tokens)]}'.encode(),
+            'headers': [],
+            'client': ('bench', i),
+        }
+        await middleware(scope, receive, send)
+    return time.perf_counter() - started
+
+
+def main():
+    handshakes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    distinct_users = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    users = [User.objects.create_user(f'bench{i}', password='x') for i in range(distinct_users)]
+    tokens = [str(AccessToken.for_user(user)) for user in users]
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    print(f"{handshakes} handshakes from {distinct_users} users (reconnect storm)")
+    report('legacy middleware', handshakes, asyncio.run(run(LegacyJwtAuthMiddleware, tokens, handshakes)), unit='hs')
+
+    verified_token_cache.clear()
+    user_cache.clear()
+    report('cached middleware', handshakes, asyncio.run(run(JwtAuthMiddleware, tokens, handshakes)), unit='hs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Shared helpers for the micro-benchmarks
+Run scripts from the backend directory: python benchmarks/<script>.py
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module='relaydesk.settings.test'):
+    """Configure Django with the test settings so benchmarks need no services"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def use_scratch_database():
+    """
+    Point the default database at a throwaway SQLite file and migrate it
+
+    A file (not :memory:) so worker threads used by database_sync_to_async
+    see the same data.
+    """
+    import tempfile
+    from django.conf import settings
+    from django.core.management import call_command
+
+    path = Path(tempfile.mkdtemp()) / 'bench.sqlite3'
+    settings.DATABASES['default']['NAME'] = str(path)
+    call_command('migrate', verbosity=0)
+    return path
+
+
+def measure(func, repeat=5):
+    """Return the best wall-clock time of several runs of func()"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(label, operations, seconds, unit='ops'):
+    print(f"{label:<48} {operations / seconds:>14,.0f} {unit}/s  ({seconds * 1000:.2f} ms)")
@@ -0,0 +1,99 @@
+"""
+WebSocket admission control
+Per-process connection caps and handshake concurrency limits, with a published load gauge
+"""
+import threading
+
+from django.conf import settings
+
+from .metrics import registry
+
+DEFAULTS = {
+    'MAX_CONNECTIONS': 5000,
+    'MAX_CONCURRENT_HANDSHAKES': 100,
+    'RETRY_AFTER': 5,
+    'CLOSE_CODE': 4013,
+    'READY_LOAD': 0.9,
+}
+
+connections_gauge = registry.gauge(
+    'relaydesk_ws_connections',
+    'Open WebSocket connections in this process',
+)
+handshakes_gauge = registry.gauge(
+    'relaydesk_ws_handshakes_in_flight',
+    'WebSocket handshakes being processed in this process',
+)
+load_gauge = registry.gauge(
+    'relaydesk_ws_load',
+    'Open WebSocket connections as a fraction of MAX_CONNECTIONS',
+)
+refusals_counter = registry.counter(
+    'relaydesk_ws_admission_refusals_total',
+    'WebSocket connections refused by admission control',
+)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_ADMISSION', {})}
+
+
+class AdmissionController:
+    """
+    Tracks handshakes and open connections for this process
+
+    A handshake is admitted only while both the connection count and the
+    number of handshakes in flight are under their caps; refused clients
+    are told to retry later (and, behind a balancer, land elsewhere).
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.handshakes = 0
+        self.draining = False
+        self._lock = threading.Lock()
+
+    def begin_handshake(self):
+        """
+        Returns:
+            str: None if admitted (call end_handshake later), else the refusal reason
+        """
+        config = get_config()
+        with self._lock:
+            if self.draining:
+                reason = 'draining'
+            elif self.connections >= config['MAX_CONNECTIONS']:
+                reason = 'connections'
+            elif self.handshakes >= config['MAX_CONCURRENT_HANDSHAKES']:
+                reason = 'handshakes'
+            else:
+                self.handshakes += 1
+                handshakes_gauge.set(self.handshakes)
+                return None
+        refusals_counter.inc(reason=reason)
+        return reason
+
+    def end_handshake(self):
+        with self._lock:
+            self.handshakes -= 1
+            handshakes_gauge.set(self.handshakes)
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections += 1
+            self._publish()
+
+    def connection_closed(self):
+        with self._lock:
+            self.connections -= 1
+            self._publish()
+
+    def _publish(self):
+        connections_gauge.set(self.connections)
+        load_gauge.set(round(self.load(), 4))
+
+    def load(self):
+        return self.connections / get_config()['MAX_CONNECTIONS']
+
+
+admission = AdmissionController()
@@ -0,0 +1,146 @@
+"""
+Channel layer extensions
+Consistent-hash sharding over several Redis hosts, node-local group fan-out, and copy counting
+"""
+import asyncio
+import binascii
+import bisect
+import hashlib
+
+from channels_redis.core import RedisChannelLayer
+from channels_redis.pubsub import RedisPubSubChannelLayer, RedisPubSubLoopLayer, RedisSingleShardConnection
+from channels_redis.utils import _wrap_close, decode_hosts
+
+from .metrics import registry
+
+COPY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+group_sends_counter = registry.counter(
+    'relaydesk_channel_layer_group_sends_total',
+    'group_send calls made through the channel layer',
+)
+copies_histogram = registry.histogram(
+    'relaydesk_channel_layer_copies_per_broadcast',
+    'Copies of a group message Redis delivers, per group_send',
+    buckets=COPY_BUCKETS,
+)
+members_histogram = registry.histogram(
+    'relaydesk_channel_layer_members_per_broadcast',
+    'Member channels of the group, per group_send (one copy each without node-local fan-out)',
+    buckets=COPY_BUCKETS,
+)
+
+
+def host_identity(host):
+    """Stable name for a decoded channels_redis host entry, independent of its list position"""
+    if 'address' in host:
+        return str(host['address'])
+    if 'master_name' in host:
+        return f"sentinel:{host['master_name']}"
+    return f"{host.get('host', 'localhost')}:{host.get('port', 6379)}"
+
+
+class ConsistentHashRing:
+    """
+    Hash ring with virtual nodes
+
+    Each node owns `virtual_nodes` points on a 32-bit ring, derived from
+    its name alone, so adding a node only moves the keys that land on its
+    new points (about 1/N of them) and the order of the host list doesn't
+    matter.
+    """
+
+    def __init__(self, names, virtual_nodes=160):
+        points = []
+        for index, name in enumerate(names):
+            for replica in range(virtual_nodes):
+                digest = hashlib.md5(f"{name}#{replica}".encode('utf8')).digest()
+                points.append((int.from_bytes(digest[:4], 'big'), index))
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._indexes = [index for _, index in points]
+
+    def get_index(self, value):
+        if isinstance(value, str):
+            value = value.encode('utf8')
+        position = bisect.bisect(self._hashes, binascii.crc32(value))
+        return self._indexes[position % len(self._indexes)]
+
+
+class InstrumentedRedisChannelLayer(RedisChannelLayer):
+    """
+    RedisChannelLayer that records copies per broadcast
+
+    channels_redis already pushes one copy per receiving process (its
+    process-local "!" channels share one Redis list), but the sender still
+    fetches every member channel name from the group's sorted set.
+    """
+
+    def _map_channel_keys_to_connection(self, channel_names, message):
+        mapping = super()._map_channel_keys_to_connection(channel_names, message)
+        group_sends_counter.inc(mode='core')
+        copies_histogram.observe(len(mapping[1]), mode='core')
+        members_histogram.observe(len(channel_names), mode='core')
+        return mapping
+
+
+class ShardedRedisChannelLayer(InstrumentedRedisChannelLayer):
+    """
+    RedisChannelLayer whose group keys and channel queues are placed on a
+    consistent hash ring instead of channels_redis' range split, so
+    `chat_<slug>` groups (and the per-process channels that receive them)
+    stay put when a host is added and only ~1/N of them move.
+    """
+
+    def __init__(self, hosts=None, virtual_nodes=160, **kwargs):
+        super().__init__(hosts=hosts, **kwargs)
+        self.ring = ConsistentHashRing([host_identity(host) for host in self.hosts], virtual_nodes)
+
+    def consistent_hash(self, value):
+        if self.ring_size == 1:
+            return 0
+        return self.ring.get_index(value)
+
+
+class CountingShardConnection(RedisSingleShardConnection):
+    """Shard connection whose publish returns the number of subscribed processes"""
+
+    async def publish(self, channel, message):
+        async with self._lock:
+            self._ensure_redis()
+            return await self._redis.publish(channel, message)
+
+
+class NodeLocalLoopLayer(RedisPubSubLoopLayer):
+    def __init__(self, hosts=None, **kwargs):
+        super().__init__(hosts=hosts, **kwargs)
+        self._shards = [CountingShardConnection(host, self) for host in decode_hosts(hosts)]
+
+    async def group_send(self, group, message):
+        group_channel = self._get_group_channel_name(group)
+        shard = self._get_shard(group_channel)
+        receivers = await shard.publish(group_channel, self.channel_layer.serialize(message))
+        group_sends_counter.inc(mode='node_local')
+        copies_histogram.observe(receivers or 0, mode='node_local')
+
+
+class NodeLocalChannelLayer(RedisPubSubChannelLayer):
+    """
+    Group fan-out in process memory
+
+    Each process subscribes once per group it has members in; group_send
+    is a single PUBLISH that Redis delivers once per subscribed process,
+    which then hands the message to every local member. Redis work scales
+    with processes, not connections. Like the pub/sub layer it builds on,
+    delivery is at-most-once: there is no capacity or expiry buffering.
+    """
+
+    def _get_layer(self):
+        loop = asyncio.get_running_loop()
+        try:
+            layer = self._layers[loop]
+        except KeyError:
+            layer = NodeLocalLoopLayer(*self._args, **self._kwargs, channel_layer=self)
+            self._layers[loop] = layer
+            _wrap_close(self, loop)
+        return layer
@@ -1,18 +1,471 @@
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.core.cache import cache
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from functools import partial
+from urllib.parse import parse_qs
 from .models import Room, Message
-from .serializers import MessageSerializer
+from .serializers import COMPACT_SHAPE, compact_messages, serialize_message
+from .frames import (
+    MSGPACK_SUBPROTOCOL, decode_frame_msgpack, encode_batch, encode_batch_msgpack, encode_event,
+    encode_frame_msgpack, event_msgpack, msgpack_enabled
+)
+from .admission import admission, get_config as get_admission_config
+from .drain import coordinator as drain_coordinator, ensure_drain_signal_handler
+from .local_cache import ensure_invalidation_listener
+from . import latency, outbound
+from .presence import get_presence_config, get_presence_store
+from .rate_limit import (
+    ConnectionRateLimiter, get_ws_rate_limit_config, ws_rate_limit_closes_counter, ws_throttled_counter
+)
+from .replay import get_replay_buffer
+from .room_cache import aresolve_room, get_active_room_id
+from .typing import get_typing_aggregator, merge_typing_events
+from . import write_behind
+import asyncio
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
-class ChatConsumer(AsyncJsonWebsocketConsumer):
+class BaseChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Room operations shared by the single-room and multiplexed endpoints
+
+    Every outbound frame carries the slug of its room, so the same
+    pre-encoded text can be forwarded to either kind of connection.
+    Clients that offer the "msgpack" subprotocol get binary MessagePack
+    frames with the same schema instead of JSON text. While a room is busy,
+    its chat messages reach each connection in batch frames.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.joined_rooms = set()
+        self.outbound = None
+        self.binary = False
+        self.room_rates = {}
+        # room slug -> ids already replayed, whose live copies are still to be dropped
+        self.replayed = {}
+        self.rate_limiter = None
+        self.admitted = False
+        self.timing = False
+
+    async def websocket_connect(self, message):
+        refusal = admission.begin_handshake()
+        if refusal is not None:
+            await self.refuse_connection(refusal)
+            return
+        try:
+            await super().websocket_connect(message)
+        finally:
+            admission.end_handshake()
+
+    async def refuse_connection(self, reason):
+        """Turn the client away with a retry-after hint; it should try again later or elsewhere"""
+        config = get_admission_config()
+        self.user = self.scope.get('user', AnonymousUser())
+        logger.warning(f"WebSocket refused by admission control ({reason})")
+        await super().accept()
+        await self.send_json({'type': 'retry', 'reason': reason, 'retry_after': config['RETRY_AFTER']})
+        await self.close(code=config['CLOSE_CODE'])
+
+    async def accept(self, subprotocol=None):
+        if subprotocol is None and msgpack_enabled() and MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', ()):
+            subprotocol = MSGPACK_SUBPROTOCOL
+        self.binary = subprotocol == MSGPACK_SUBPROTOCOL
+        await super().accept(subprotocol)
+        admission.connection_opened()
+        self.admitted = True
+        self.timing = latency.is_enabled()
+        ensure_drain_signal_handler()
+        drain_coordinator.register(self)
+        rate_limit_config = get_ws_rate_limit_config()
+        if rate_limit_config['ENABLED']:
+            self.rate_limiter = ConnectionRateLimiter(self.user.id, rate_limit_config)
+        config = outbound.get_config()
+        self.batch_rate_threshold = config['BATCH_RATE_THRESHOLD']
+        self.outbound = outbound.OutboundQueue(
+            self.deliver,
+            max_size=config['MAX_QUEUE'],
+            max_lag=config['MAX_LAG_SECONDS'],
+            deliver_batch=self.deliver_batch,
+            batch_max_size=config['BATCH_MAX_SIZE'],
+            batch_max_delay=config['BATCH_MAX_DELAY_MS'] / 1000.0,
+        )
+        self.outbound.start()
+
+    async def websocket_disconnect(self, message):
+        self.stop_outbound()
+        if self.admitted:
+            self.admitted = False
+            admission.connection_closed()
+            drain_coordinator.unregister(self)
+        await super().websocket_disconnect(message)
+
+    async def drain(self, event):
+        """Ask the client to reconnect (to another worker) after `retry_after` seconds, then close"""
+        self.stop_outbound()
+        await self.send_json({'type': 'reconnect', 'reason': 'draining', 'retry_after': event['retry_after']})
+        await self.close(code=event['code'])
+
+    def stop_outbound(self):
+        if self.outbound is not None:
+            self.outbound.stop()
+            self.outbound = None
+
+    async def enqueue(self, event, priority=outbound.PRIORITY_CHAT, coalesce_key=None, merge=None, batchable=False):
+        """Hand a group event to the outbound queue instead of writing to the socket inline"""
+        if self.outbound is None:
+            await self.deliver(event)
+        elif not self.outbound.put(event, priority, coalesce_key, merge, batchable):
+            await self.evict_slow_consumer()
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if self.binary and bytes_data is not None:
+            content = decode_frame_msgpack(bytes_data)
+        elif text_data:
+            content = await self.decode_json(text_data)
+        else:
+            raise ValueError("No text section for incoming WebSocket frame!")
+        if await self.admit_frame(content):
+            await self.receive_json(content, **kwargs)
+
+    async def admit_frame(self, content):
+        """Charge an inbound frame to the rate limiter; throttle or close if over budget"""
+        if self.rate_limiter is None:
+            return True
+        frame_type = content.get('type', 'chat_message') if isinstance(content, dict) else 'default'
+        retry_after = self.rate_limiter.allow(frame_type)
+        if not retry_after:
+            return True
+        ws_throttled_counter.inc(frame_type=frame_type if frame_type in ('chat_message', 'typing') else 'other')
+        if self.rate_limiter.is_abusive():
+            ws_rate_limit_closes_counter.inc()
+            logger.warning(f"Closing WebSocket of {self.user.username}: sustained rate limit violations")
+            await self.close(code=self.rate_limiter.config['CLOSE_CODE'])
+            return False
+        await self.send_json({
+            'type': 'error',
+            'code': 'throttled',
+            'frame_type': frame_type,
+            'retry_after': round(retry_after, 3),
+            'client_id': content.get('client_id') if isinstance(content, dict) else None,
+        })
+        return False
+
+    async def send_json(self, content, close=False):
+        if self.binary:
+            await self.send(bytes_data=encode_frame_msgpack(content), close=close)
+        else:
+            await super().send_json(content, close)
+
+    async def deliver(self, event):
+        if not event['text']:
+            return
+        sent_at = event.get('sent_at') if self.timing else None
+        if sent_at is not None:
+            started = time.perf_counter()
+        if self.binary:
+            await self.send(bytes_data=event_msgpack(event))
+        else:
+            await self.send(text_data=event['text'])
+        if sent_at is not None:
+            latency.stage_histogram.observe(time.perf_counter() - started, stage='send')
+            latency.observe_since('end_to_end', sent_at)
+
+    async def deliver_batch(self, events):
+        started = time.perf_counter() if self.timing else None
+        if self.binary:
+            await self.send(bytes_data=encode_batch_msgpack([event_msgpack(event) for event in events]))
+        else:
+            await self.send(text_data=encode_batch([event['text'] for event in events]))
+        if started is not None:
+            latency.stage_histogram.observe(time.perf_counter() - started, stage='send')
+            for event in events:
+                if 'sent_at' in event:
+                    latency.observe_since('end_to_end', event['sent_at'])
+
+    async def evict_slow_consumer(self):
+        """Close a connection that can't keep up; the client reconnects and refetches"""
+        outbound.evictions_counter.inc()
+        logger.warning(f"Evicting slow consumer {getattr(self.user, 'username', 'anonymous')}")
+        self.stop_outbound()
+        await self.send_json({'type': 'resync', 'reason': 'slow_consumer', 'rooms': sorted(self.joined_rooms)})
+        await self.close(code=outbound.get_config()['EVICT_CLOSE_CODE'])
+
+    async def join_room(self, room_slug, since=None, shape=None):
+        """
+        Subscribe to a room's group, register presence and announce the join
+
+        With `since` (the last message id the client saw), messages missed
+        since then are replayed before any live traffic, in `shape`.
+        """
+        if since:
+            self.outbound.hold()
+        try:
+            await self.channel_layer.group_add(Room.group_name_for(room_slug), self.channel_name)
+            self.joined_rooms.add(room_slug)
+            version = await self.add_to_presence(room_slug)
+            if not hasattr(self, 'presence_heartbeat'):
+                self.presence_heartbeat = asyncio.create_task(self.run_presence_heartbeat())
+
+            # The snapshot is read after joining, so it already includes this user;
+            # clients drop deltas whose version is not newer than their snapshot
+            await self.send_presence_snapshot(room_slug)
+            if version is not None:
+                await self.broadcast_presence_delta(room_slug, 'user_joined', version)
+            if since:
+                await self.resume_room(room_slug, since, shape)
+        finally:
+            # Whatever failed, live traffic must not stay parked behind the replay
+            if since:
+                self.outbound.release()
+
+    async def leave_room(self, room_slug):
+        """Undo join_room"""
+        self.joined_rooms.discard(room_slug)
+        self.room_rates.pop(room_slug, None)
+        self.replayed.pop(room_slug, None)
+        get_typing_aggregator().update(room_slug, self.user.id, self.user.username, False)
+        version = await self.remove_from_presence(room_slug)
+        if version is not None:
+            await self.broadcast_presence_delta(room_slug, 'user_left', version)
+        await self.channel_layer.group_discard(Room.group_name_for(room_slug), self.channel_name)
+
+    async def leave_all_rooms(self):
+        if hasattr(self, 'presence_heartbeat'):
+            self.presence_heartbeat.cancel()
+            del self.presence_heartbeat
+        for room_slug in list(self.joined_rooms):
+            await self.leave_room(room_slug)
+
+    async def handle_chat_message(self, room_slug, content):
+        message_content = content.get('message', '').strip()
+        if not message_content:
+            return
+        timer = latency.StageTimer() if self.timing else None
+        if write_behind.is_enabled():
+            await self.queue_message(room_slug, message_content, content.get('client_id'), timer)
+            return
+        message = await self.save_message(room_slug, message_content, timer)
+        if message:
+            await self.broadcast_message(room_slug, message, timer)
+
+    async def queue_message(self, room_slug, message_content, client_id=None, timer=None):
+        """Persist through the write-behind buffer and ack once the batch commits"""
+        if timer is None:
+            on_commit = partial(self.broadcast_message, room_slug)
+        else:
+            async def on_commit(message):
+                timer.lap('write_behind')
+                await self.broadcast_message(room_slug, message, timer)
+        try:
+            message = await write_behind.get_buffer().submit(
+                room_slug, self.user, message_content, on_commit=on_commit
+            )
+        except Exception as e:
+            logger.error(f"Write-behind save failed for {self.user.username} in {room_slug}: {e}")
+            await self.send_json({
+                'type': 'error', 'room': room_slug, 'message': 'Failed to save message', 'client_id': client_id
+            })
+            return
+        await self.send_json({
+            'type': 'message_ack', 'room': room_slug, 'message_id': str(message['id']), 'client_id': client_id
+        })
+
+    async def broadcast_message(self, room_slug, message, timer=None):
+        # Encode the frame once here; every receiver forwards the same text or bytes
+        event = {
+            'type': 'chat_message',
+            'room': room_slug,
+            'message_id': str(message['id']),
+            **encode_event({'type': 'chat_message', 'room': room_slug, 'message': message}),
+        }
+        if timer is not None:
+            timer.lap('encode')
+            # Receivers measure fan-out and end-to-end lag against this
+            event['sent_at'] = timer.received_at
+        try:
+            await self.remember_broadcast(room_slug, event['message_id'], event['text'])
+        except Exception as e:
+            logger.warning(f"Could not add message to replay buffer of {room_slug}: {e}")
+        if timer is not None:
+            timer.lap('replay')
+        await self.channel_layer.group_send(Room.group_name_for(room_slug), event)
+        if timer is not None:
+            timer.lap('group_send')
+
+    @database_sync_to_async
+    def remember_broadcast(self, room_slug, message_id, text):
+        get_replay_buffer().append(room_slug, message_id, text)
+
+    @database_sync_to_async
+    def get_missed_broadcasts(self, room_slug, since):
+        return get_replay_buffer().since(room_slug, since)
+
+    async def resume_room(self, room_slug, since, shape=None):
+        """
+        Replay chat messages broadcast after `since`, ahead of live traffic
+
+        Call with the outbound queue held and the room already joined, so
+        nothing is missed in between, and release it afterwards. Live copies
+        of replayed messages broadcast in that window are only dispatched
+        after this returns; chat_message drops them. If `since` has left the
+        replay buffer the client is told to refetch history instead. With
+        the compact shape the replay is one history frame with a users map
+        rather than a chat_message frame per message.
+        """
+        try:
+            missed = await self.get_missed_broadcasts(room_slug, since)
+            if missed is None:
+                await self.send_json({'type': 'resync', 'reason': 'history_gap', 'room': room_slug})
+                return
+            if shape == COMPACT_SHAPE:
+                if missed:
+                    messages, users = compact_messages([json.loads(text)['message'] for _, text in missed])
+                    await self.send_json({'type': 'history', 'room': room_slug, 'messages': messages, 'users': users})
+            else:
+                for _, text in missed:
+                    await self.deliver({'text': text})
+            if missed:
+                self.replayed[room_slug] = {message_id for message_id, _ in missed}
+        except Exception as e:
+            logger.error(f"Replay failed for {self.user.username} in {room_slug}: {e}", exc_info=True)
+            await self.send_json({'type': 'resync', 'reason': 'history_gap', 'room': room_slug})
+
+    async def handle_typing(self, room_slug, content):
+        # Coalesced per room; the aggregator broadcasts at most once per interval
+        get_typing_aggregator().update(
+            room_slug, self.user.id, self.user.username, bool(content.get('is_typing', False))
+        )
+
+    async def chat_message(self, event):
+        if self.timing and 'sent_at' in event:
+            latency.observe_since('fanout', event['sent_at'])
+        if 'text' not in event:
+            # Events from workers that still publish the raw message dict
+            event = {**event, **encode_event({'type': 'chat_message', 'message': event['message']})}
+        room_slug = event.get('room')
+        replayed = self.replayed.get(room_slug)
+        if replayed and event.get('message_id') in replayed:
+            replayed.discard(event['message_id'])
+            if not replayed:
+                del self.replayed[room_slug]
+            return
+        # Batch only while this room is busy; quiet rooms keep per-message latency
+        batchable = False
+        if room_slug is not None:
+            meter = self.room_rates.get(room_slug)
+            if meter is None:
+                meter = self.room_rates[room_slug] = outbound.RateMeter()
+            batchable = meter.tick() >= self.batch_rate_threshold
+        await self.enqueue(event, batchable=batchable)
+
+    async def user_joined(self, event):
+        await self.enqueue(event, outbound.PRIORITY_PRESENCE)
+
+    async def user_left(self, event):
+        await self.enqueue(event, outbound.PRIORITY_PRESENCE)
+
+    async def typing_indicator(self, event):
+        if self.user.id in event['user_ids']:
+            # Typists don't hear about themselves, so their copy is re-encoded
+            started = [user for user in event['started'] if user['user_id'] != self.user.id]
+            stopped = [user for user in event['stopped'] if user['user_id'] != self.user.id]
+            if not started and not stopped:
+                return
+            event = {
+                **event,
+                'started': started,
+                'stopped': stopped,
+                'user_ids': [user['user_id'] for user in started + stopped],
+                **encode_event({
+                    'type': 'typing_indicator', 'room': event['room'], 'started': started, 'stopped': stopped
+                }),
+            }
+        await self.enqueue(
+            event, outbound.PRIORITY_TYPING, coalesce_key=('typing', event['room']), merge=merge_typing_events
+        )
+
+    async def check_room_exists(self, room_slug):
+        await ensure_invalidation_listener()
+        entry = await aresolve_room(room_slug)
+        return bool(entry and entry[1])
+
+    @database_sync_to_async
+    def save_message(self, room_slug, content, timer=None):
+        try:
+            # Served from the per-process room cache; no Room query in steady state
+            room_id = get_active_room_id(room_slug)
+            if room_id is None:
+                raise Room.DoesNotExist(f"Room {room_slug} not found or inactive")
+            message = Message.objects.create(room_id=room_id, user=self.user, content=content)
+            if timer is not None:
+                timer.lap('save')
+            data = serialize_message(message)
+            if timer is not None:
+                timer.lap('serialize')
+            return data
+        except Exception as e:
+            logger.error(f"Error saving message: {e}")
+            return None
+
+    async def run_presence_heartbeat(self):
+        """Keep this connection's presence entries from expiring"""
+        interval = get_presence_config()['HEARTBEAT_INTERVAL']
+        while True:
+            await asyncio.sleep(interval)
+            for room_slug in list(self.joined_rooms):
+                try:
+                    await self.refresh_presence(room_slug)
+                except Exception as e:
+                    logger.warning(f"Presence heartbeat failed for {self.user.username} in {room_slug}: {e}")
+
+    @database_sync_to_async
+    def add_to_presence(self, room_slug):
+        return get_presence_store().join(room_slug, self.channel_name, self.user)
+
+    @database_sync_to_async
+    def refresh_presence(self, room_slug):
+        get_presence_store().heartbeat(room_slug, self.channel_name, self.user)
+
+    @database_sync_to_async
+    def remove_from_presence(self, room_slug):
+        return get_presence_store().leave(room_slug, self.channel_name, self.user)
+
+    @database_sync_to_async
+    def get_presence_snapshot(self, room_slug):
+        return get_presence_store().snapshot(room_slug)
+
+    async def send_presence_snapshot(self, room_slug):
+        """Send the full online list once; afterwards the client applies deltas"""
+        online_users, version = await self.get_presence_snapshot(room_slug)
+        await self.send_json({
+            'type': 'presence_snapshot', 'room': room_slug, 'online_users': online_users, 'version': version
+        })
+
+    async def broadcast_presence_delta(self, room_slug, event_type, version):
+        """Announce a single join or leave; receivers forward it without touching the store"""
+        await self.channel_layer.group_send(
+            Room.group_name_for(room_slug),
+            {'type': event_type, **encode_event({
+                'type': event_type,
+                'room': room_slug,
+                'username': self.user.username,
+                'user_id': self.user.id,
+                'version': version,
+            })}
+        )
+
+
+class ChatConsumer(BaseChatConsumer):
     async def connect(self):
         print("🔌 ChatConsumer.connect() called!")
         self.room_slug = self.scope['url_route']['kwargs']['room_slug']
-        self.room_group_name = f'chat_{self.room_slug}'
+        self.room_group_name = Room.group_name_for(self.room_slug)
         self.user = self.scope['user']
         print(f"🔌 User: {getattr(self.user, 'username', 'anonymous')} authenticated={getattr(self.user, 'is_authenticated', False)}")
         logger.info(f"🔌 WebSocket connect attempt slug={self.room_slug} user={getattr(self.user, 'username', 'anonymous')}")
@@ -22,154 +475,117 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             logger.warning("❌ WebSocket denied: unauthenticated user")
             await self.close()
             return
-        
-        room_exists = await self.check_room_exists()
+
+        room_exists = await self.check_room_exists(self.room_slug)
         if not room_exists:
             logger.warning(f"❌ WebSocket denied: room {self.room_slug} not found or inactive")
             await self.close()
             return
-        
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+
         await self.accept()
-        await self.add_to_presence()
-        
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {'type': 'user_joined', 'username': self.user.username, 'user_id': self.user.id}
-        )
-        
+        await self.join_room(self.room_slug, since=self.get_resume_point(), shape=self.get_query_param('shape'))
+
         logger.info(f"User {self.user.username} connected to {self.room_slug}")
-    
+
+    def get_query_param(self, name):
+        query_params = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+        return query_params.get(name, [None])[0]
+
+    def get_resume_point(self):
+        """Last message id the client saw before reconnecting (?since=<id>), if any"""
+        return self.get_query_param('since')
+
     async def disconnect(self, close_code):
-        if hasattr(self, 'room_group_name'):
-            await self.remove_from_presence()
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {'type': 'user_left', 'username': self.user.username, 'user_id': self.user.id}
-            )
-            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if self.joined_rooms:
+            await self.leave_all_rooms()
             logger.info(f"User {self.user.username} disconnected from {self.room_slug}")
-    
+
     async def receive_json(self, content):
         try:
             logger.debug(f"📨 Received payload in {self.room_slug}: {content}")
             message_type = content.get('type', 'chat_message')
             if message_type == 'chat_message':
-                await self.handle_chat_message(content)
+                await self.handle_chat_message(self.room_slug, content)
             elif message_type == 'typing':
-                await self.handle_typing(content)
+                await self.handle_typing(self.room_slug, content)
+            elif message_type == 'presence_resync':
+                await self.send_presence_snapshot(self.room_slug)
         except Exception as e:
             logger.error(f"Error in receive_json for user {self.user.username}: {e}", exc_info=True)
             await self.send_json({'type': 'error', 'message': 'Failed to process message'})
-    
-    async def handle_chat_message(self, content):
-        message_content = content.get('message', '').strip()
-        if not message_content:
+
+
+class MultiplexChatConsumer(BaseChatConsumer):
+    """
+    Many rooms over one WebSocket connection
+
+    Clients send {"type": "subscribe", "room": "<slug>"} and
+    {"type": "unsubscribe", "room": "<slug>"}; every other frame in either
+    direction names its room. Room access is checked once per connection
+    and cached for its lifetime. A subscribe frame may carry "since": "<id>"
+    (and "shape": "compact") to resume the room like ?since= does on
+    ws/chat/<slug>/.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            logger.warning("❌ Multiplexed WebSocket denied: unauthenticated user")
+            await self.close()
             return
-        message = await self.save_message(message_content)
-        if message:
-            # ✅ FIX: Convert all UUID fields to strings before sending through Redis
-            serialized_message = self.serialize_message(message)
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {'type': 'chat_message', 'message': serialized_message}
-            )
-    
-    async def handle_typing(self, content):
-        is_typing = content.get('is_typing', False)
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'typing_indicator',
-                'username': self.user.username,
-                'user_id': self.user.id,
-                'is_typing': is_typing
-            }
-        )
-    
-    def serialize_message(self, message):
-        """Convert UUID fields to strings for Redis serialization"""
-        if isinstance(message, dict):
-            serialized = {}
-            for key, value in message.items():
-                if hasattr(value, 'hex'):  # Check if it's a UUID
-                    serialized[key] = str(value)
-                elif isinstance(value, dict):
-                    serialized[key] = self.serialize_message(value)
-                elif isinstance(value, list):
-                    serialized[key] = [
-                        self.serialize_message(item) if isinstance(item, dict) else str(item) if hasattr(item, 'hex') else item
-                        for item in value
-                    ]
-                else:
-                    serialized[key] = value
-            return serialized
-        return message
-    
-    async def chat_message(self, event):
-        await self.send_json({'type': 'chat_message', 'message': event['message']})
-    
-    async def user_joined(self, event):
-        online_users = await self.get_presence_list()
-        await self.send_json({
-            'type': 'user_joined',
-            'username': event['username'],
-            'user_id': event['user_id'],
-            'online_users': online_users
-        })
-    
-    async def user_left(self, event):
-        online_users = await self.get_presence_list()
-        await self.send_json({
-            'type': 'user_left',
-            'username': event['username'],
-            'user_id': event['user_id'],
-            'online_users': online_users
-        })
-    
-    async def typing_indicator(self, event):
-        if event['user_id'] != self.user.id:
-            await self.send_json({
-                'type': 'typing_indicator',
-                'username': event['username'],
-                'is_typing': event['is_typing']
-            })
-    
-    @database_sync_to_async
-    def check_room_exists(self):
-        return Room.objects.filter(slug=self.room_slug, is_active=True).exists()
-    
-    @database_sync_to_async
-    def save_message(self, content):
+        self.room_access = {}
+        self.max_rooms = settings.CHAT_MULTIPLEX['MAX_ROOMS']
+        await self.accept()
+        logger.info(f"🔌 Multiplexed WebSocket opened for {self.user.username}")
+
+    async def disconnect(self, close_code):
+        await self.leave_all_rooms()
+        if getattr(self.user, 'is_authenticated', False):
+            logger.info(f"Multiplexed WebSocket closed for {self.user.username}")
+
+    async def receive_json(self, content):
+        room_slug = None
         try:
-            room = Room.objects.get(slug=self.room_slug)
-            message = Message.objects.create(room=room, user=self.user, content=content)
-            serializer = MessageSerializer(message)
-            return serializer.data
+            if not isinstance(content, dict):
+                await self.send_json({'type': 'error', 'message': 'Frame must be a JSON object'})
+                return
+            room_slug = content.get('room')
+            message_type = content.get('type', 'chat_message')
+            if not isinstance(room_slug, str) or not room_slug:
+                await self.send_json({'type': 'error', 'message': 'Frame must name a room'})
+            elif message_type == 'subscribe':
+                await self.subscribe(room_slug, content)
+            elif message_type == 'unsubscribe':
+                await self.unsubscribe(room_slug)
+            elif room_slug not in self.joined_rooms:
+                await self.send_json({'type': 'error', 'room': room_slug, 'message': 'Not subscribed to room'})
+            elif message_type == 'chat_message':
+                await self.handle_chat_message(room_slug, content)
+            elif message_type == 'typing':
+                await self.handle_typing(room_slug, content)
+            elif message_type == 'presence_resync':
+                await self.send_presence_snapshot(room_slug)
         except Exception as e:
-            logger.error(f"Error saving message: {e}")
-            return None
-    
-    @database_sync_to_async
-    def add_to_presence(self):
-        cache_key = f"room_presence:{self.room_slug}"
-        online_users = cache.get(cache_key, [])
-        user_data = {'id': self.user.id, 'username': self.user.username}
-        if user_data not in online_users:
-            online_users.append(user_data)
-            cache.set(cache_key, online_users, timeout=3600)
+            logger.error(f"Error in multiplexed receive_json for user {self.user.username}: {e}", exc_info=True)
+            await self.send_json({'type': 'error', 'room': room_slug, 'message': 'Failed to process message'})
 
-    @database_sync_to_async
-    def remove_from_presence(self):
-        cache_key = f"room_presence:{self.room_slug}"
-        online_users = cache.get(cache_key, [])
-        online_users = [u for u in online_users if u['id'] != self.user.id]
-        if online_users:
-            cache.set(cache_key, online_users, timeout=3600)
-        else:
-            cache.delete(cache_key)
+    async def subscribe(self, room_slug, content):
+        if room_slug in self.joined_rooms:
+            await self.send_json({'type': 'subscribed', 'room': room_slug})
+            return
+        if len(self.joined_rooms) >= self.max_rooms:
+            await self.send_json({'type': 'error', 'room': room_slug, 'message': 'Too many rooms on one connection'})
+            return
+        if room_slug not in self.room_access:
+            self.room_access[room_slug] = await self.check_room_exists(room_slug)
+        if not self.room_access[room_slug]:
+            await self.send_json({'type': 'error', 'room': room_slug, 'message': 'Room not found'})
+            return
+        await self.send_json({'type': 'subscribed', 'room': room_slug})
+        since = content.get('since')
+        await self.join_room(room_slug, since=since if isinstance(since, str) else None, shape=content.get('shape'))
 
-    @database_sync_to_async
-    def get_presence_list(self):
-        cache_key = f"room_presence:{self.room_slug}"
-        return cache.get(cache_key, [])
+    async def unsubscribe(self, room_slug):
+        if room_slug in self.joined_rooms:
+            await self.leave_room(room_slug)
+        await self.send_json({'type': 'unsubscribed', 'room': room_slug})
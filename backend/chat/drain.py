@@ -0,0 +1,140 @@
+"""
+Graceful WebSocket drain
+On a signal, stop admitting connections and close the open ones in jittered waves
+"""
+import asyncio
+import logging
+import math
+import random
+import signal
+import weakref
+
+from django.conf import settings
+
+from .admission import admission
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SIGNAL': 'SIGUSR2',  # None disables the handler
+    'WAVES': 10,
+    'WAVE_INTERVAL': 3,  # seconds between waves
+    'JITTER': 0.5,  # +/- fraction of WAVE_INTERVAL
+    'BACKOFF_MIN': 1,  # seconds; each client gets a random backoff in this range
+    'BACKOFF_MAX': 15,
+    'CLOSE_CODE': 4012,
+}
+
+draining_gauge = registry.gauge(
+    'relaydesk_ws_draining',
+    '1 while this process is draining WebSocket connections',
+)
+drain_remaining_gauge = registry.gauge(
+    'relaydesk_ws_drain_remaining',
+    'WebSocket connections still open in this draining process',
+)
+drained_counter = registry.counter(
+    'relaydesk_ws_drained_total',
+    'WebSocket connections closed by a drain',
+)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_DRAIN', {})}
+
+
+class DrainCoordinator:
+    """
+    Open consumers of this process, and the drain that closes them
+
+    Consumers register once accepted. A drain refuses new handshakes
+    (through admission control) and then closes whatever is open in
+    `WAVES` waves, each taking an even share of what remains, so clients
+    that slip in mid-drain still go out with a later wave.
+    """
+
+    def __init__(self):
+        self.consumers = set()
+        self.task = None
+
+    @property
+    def draining(self):
+        return admission.draining
+
+    def register(self, consumer):
+        self.consumers.add(consumer)
+
+    def unregister(self, consumer):
+        self.consumers.discard(consumer)
+        if self.draining:
+            drain_remaining_gauge.set(len(self.consumers))
+
+    def start(self):
+        """Begin draining on the running loop; returns the drain task"""
+        if self.task is None or self.task.done():
+            admission.draining = True
+            draining_gauge.set(1)
+            logger.warning(f"Draining {len(self.consumers)} WebSocket connections")
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    async def run(self, config=None):
+        config = config or get_config()
+        waves = max(1, config['WAVES'])
+        for wave in range(waves):
+            if wave:
+                jitter = random.uniform(-config['JITTER'], config['JITTER'])
+                await asyncio.sleep(config['WAVE_INTERVAL'] * (1 + jitter))
+            remaining = list(self.consumers)
+            batch = random.sample(remaining, math.ceil(len(remaining) / (waves - wave)))
+            await asyncio.gather(*(self.close(consumer, config) for consumer in batch))
+            drain_remaining_gauge.set(len(self.consumers))
+            logger.info(
+                f"Drain wave {wave + 1}/{waves}: closed {len(batch)}, "
+                f"{len(self.consumers)} connections remaining"
+            )
+        logger.warning("Drain complete")
+
+    async def close(self, consumer, config):
+        backoff = round(random.uniform(config['BACKOFF_MIN'], config['BACKOFF_MAX']), 1)
+        self.unregister(consumer)
+        try:
+            # Through the consumer's own channel, so the drain runs between its
+            # handlers rather than in the middle of a connect or join
+            await consumer.channel_layer.send(consumer.channel_name, {
+                'type': 'drain',
+                'retry_after': backoff,
+                'code': config['CLOSE_CODE'],
+            })
+            drained_counter.inc()
+        except Exception as e:
+            logger.warning(f"Could not drain a WebSocket connection: {e}")
+
+    def status(self):
+        return {
+            'draining': self.draining,
+            'remaining': len(self.consumers),
+            'done': self.task is not None and self.task.done(),
+        }
+
+
+coordinator = DrainCoordinator()
+
+_handled_loops = weakref.WeakSet()
+
+
+def ensure_drain_signal_handler():
+    """Install the drain signal handler on the running event loop if needed"""
+    loop = asyncio.get_running_loop()
+    if loop in _handled_loops:
+        return
+    _handled_loops.add(loop)
+    name = get_config()['SIGNAL']
+    if not name:
+        return
+    try:
+        loop.add_signal_handler(getattr(signal, name), coordinator.start)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError) as e:
+        # Not the main thread, or a platform without this signal
+        logger.info(f"Drain signal handler not installed ({name}): {e}")
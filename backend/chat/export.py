@@ -0,0 +1,84 @@
+"""
+Room history export
+Streams a room's messages as NDJSON, chunk by chunk, optionally gzip-compressed on the fly
+"""
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .frames import encode_frame
+from .models import Message
+from .serializers import MESSAGE_ROW_FIELDS, serialize_message_rows
+
+DEFAULTS = {
+    'CHUNK_SIZE': 2000,
+    'GZIP_LEVEL': 6,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_EXPORT', {})}
+
+
+def iter_room_ndjson(room_id, chunk_size=None):
+    """
+    Yield a room's messages, oldest first, as NDJSON bytes
+
+    Rows are read with .iterator(), i.e. a server-side cursor on
+    PostgreSQL, and serialized a chunk at a time, so memory stays flat
+    however long the history is. Each yielded block holds one chunk of
+    complete lines.
+    """
+    chunk_size = chunk_size or get_config()['CHUNK_SIZE']
+    rows = (
+        Message.objects.filter(room_id=room_id)
+        .order_by('created_at', 'id')
+        .values_list(*MESSAGE_ROW_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _encode_lines(chunk)
+            chunk = []
+    if chunk:
+        yield _encode_lines(chunk)
+
+
+def _encode_lines(rows):
+    return ''.join(f"{encode_frame(message)}\n" for message in serialize_message_rows(rows)).encode('utf8')
+
+
+def gzip_stream(blocks, level=None):
+    """Compress an iterable of byte blocks into a single gzip member, as it is consumed"""
+    compressor = zlib.compressobj(get_config()['GZIP_LEVEL'] if level is None else level, zlib.DEFLATED, 31)
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def aiter_blocks(blocks):
+    """
+    Serve a synchronous block iterator to async code, one block per thread hop
+
+    Each next() runs in the thread-sensitive executor, so the cursor stays
+    on the thread that opened it and only one block is in flight at a time.
+    Closing the async iterator (e.g. the client went away) closes the
+    underlying generator and its cursor.
+    """
+    iterator = iter(blocks)
+    next_block = sync_to_async(next)
+    try:
+        while True:
+            block = await next_block(iterator, None)
+            if block is None:
+                return
+            yield block
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
@@ -0,0 +1,108 @@
+"""
+WebSocket frame encoding
+Outbound frames are encoded to JSON once by the sender; receivers forward the text, or its cached MessagePack form
+"""
+import json
+
+import msgpack
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .local_cache import MISSING, LocalCache
+
+MSGPACK_SUBPROTOCOL = 'msgpack'
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Group events whose MessagePack encoding is kept per process
+    'CACHE_SIZE': 1024,
+}
+
+_json_encoder = DjangoJSONEncoder()
+_BATCH_JSON_PREFIX = '{"type":"batch","events":['
+# A two-entry map holding "type": "batch" and the "events" key, up to its array header
+_BATCH_MSGPACK_PREFIX = b'\x82' + msgpack.packb('type') + msgpack.packb('batch') + msgpack.packb('events')
+
+
+def get_msgpack_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_MSGPACK', {})}
+
+
+def msgpack_enabled():
+    return get_msgpack_config()['ENABLED']
+
+
+_msgpack_events = LocalCache('msgpack_events', maxsize=get_msgpack_config()['CACHE_SIZE'], ttl=60)
+
+
+def encode_frame(payload):
+    """
+    Encode an outbound frame to JSON text
+
+    DjangoJSONEncoder takes care of UUID, datetime and Decimal values,
+    so serializer output can be passed in as-is.
+    """
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def encode_frame_msgpack(payload):
+    """
+    Encode an outbound frame to MessagePack
+
+    Values msgpack has no type for are converted exactly as on the JSON
+    path, so both encodings carry the same schema.
+    """
+    return msgpack.packb(payload, default=_json_encoder.default, use_bin_type=True)
+
+
+def decode_frame_msgpack(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def encode_event(payload):
+    """
+    Encode a frame for a group event
+
+    Returns {'text': ...}, ready to merge into the event. The JSON text is
+    the one canonical encoding on the wire; msgpack sockets get theirs from
+    event_msgpack() on the receiving side.
+    """
+    return {'text': encode_frame(payload)}
+
+
+def event_msgpack(event):
+    """
+    MessagePack encoding of a group event, made from its JSON text on first use
+
+    Encoded at most once per event per process: kept on the event itself,
+    which node-local fan-out shares between consumers, and in a small LRU
+    keyed by the text for layers that hand every channel its own copy.
+    Events from older publishers may still carry 'bytes'.
+    """
+    data = event.get('bytes')
+    if data is not None:
+        return data
+    text = event['text']
+    data = _msgpack_events.get(text)
+    if data is MISSING:
+        data = encode_frame_msgpack(json.loads(text))
+        _msgpack_events.set(text, data)
+    event['bytes'] = data
+    return data
+
+
+def encode_batch(texts):
+    """Wrap already-encoded JSON frames in a batch frame without decoding them"""
+    return _BATCH_JSON_PREFIX + ','.join(texts) + ']}'
+
+
+def encode_batch_msgpack(chunks):
+    """MessagePack counterpart of encode_batch"""
+    count = len(chunks)
+    if count < 16:
+        header = bytes((0x90 | count,))
+    elif count <= 0xFFFF:
+        header = b'\xdc' + count.to_bytes(2, 'big')
+    else:
+        header = b'\xdd' + count.to_bytes(4, 'big')
+    return _BATCH_MSGPACK_PREFIX + header + b''.join(chunks)
@@ -1,9 +1,12 @@
 """
 Health and readiness check endpoints
 """
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.db import connection
+from django.db.models import Sum
 from django.core.cache import cache
+import hmac
 import time
 
 
@@ -40,6 +43,17 @@ def readiness_check(request):
         checks['redis'] = f'error: {str(e)}'
         overall_status = 'not_ready'
     
+    # Check WebSocket load, so the balancer steers new connections elsewhere
+    from chat.admission import admission, get_config as get_admission_config
+    load = admission.load()
+    checks['websockets'] = {'connections': admission.connections, 'load': round(load, 4)}
+    if admission.draining:
+        from chat.drain import coordinator
+        checks['websockets']['drain'] = coordinator.status()
+        overall_status = 'not_ready'
+    elif load >= get_admission_config()['READY_LOAD']:
+        overall_status = 'not_ready'
+
     status_code = 200 if overall_status == 'ready' else 503
     
     return JsonResponse({
@@ -49,31 +63,71 @@ def readiness_check(request):
     }, status=status_code)
 
 
+METRICS_DEFAULTS = {
+    # Scrapers send "Authorization: Bearer <TOKEN>"; without a token only ALLOWED_IPS may scrape
+    'TOKEN': '',
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),
+    # Seconds the object totals are reused between scrapes
+    'COUNTS_TTL': 60,
+}
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def get_metrics_config():
+    return {**METRICS_DEFAULTS, **getattr(settings, 'CHAT_METRICS', {})}
+
+
+def _scrape_allowed(request, config):
+    if config['TOKEN']:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        return hmac.compare_digest(header.encode('utf8'), f"Bearer {config['TOKEN']}".encode('utf8'))
+    return request.META.get('REMOTE_ADDR') in config['ALLOWED_IPS']
+
+
+def _object_counts(ttl):
+    """
+    User, room and message totals, shared between scrapes for `ttl` seconds
+
+    The message total sums the stored Room.message_count counters rather
+    than counting the messages table.
+    """
+    from django.contrib.auth import get_user_model
+    from chat.models import Room
+
+    def count():
+        return {
+            'users': get_user_model().objects.count(),
+            'rooms': Room.objects.count(),
+            'messages': Room.objects.aggregate(total=Sum('message_count'))['total'] or 0,
+        }
+
+    return cache.get_or_set('metrics:object_counts', count, ttl)
+
+
 def metrics(request):
     """Prometheus-compatible metrics endpoint"""
-    # Simple metrics - can be expanded with prometheus_client
-    from django.db import connections
-    from django.contrib.auth import get_user_model
-    from chat.models import Room, Message
-    
-    User = get_user_model()
-    
+    from chat.metrics import registry
+
+    config = get_metrics_config()
+    if not _scrape_allowed(request, config):
+        return HttpResponseForbidden('Forbidden', content_type=PROMETHEUS_CONTENT_TYPE)
+
+    counts = _object_counts(config['COUNTS_TTL'])
     metrics_data = [
         f'# HELP relaydesk_users_total Total number of users',
         f'# TYPE relaydesk_users_total gauge',
-        f'relaydesk_users_total {User.objects.count()}',
+        f'relaydesk_users_total {counts["users"]}',
         '',
         f'# HELP relaydesk_rooms_total Total number of rooms',
         f'# TYPE relaydesk_rooms_total gauge',
-        f'relaydesk_rooms_total {Room.objects.count()}',
+        f'relaydesk_rooms_total {counts["rooms"]}',
         '',
         f'# HELP relaydesk_messages_total Total number of messages',
         f'# TYPE relaydesk_messages_total gauge',
-        f'relaydesk_messages_total {Message.objects.count()}',
+        f'relaydesk_messages_total {counts["messages"]}',
+        '',
     ]
-    
-    return JsonResponse(
-        '\n'.join(metrics_data),
-        content_type='text/plain',
-        safe=False
-    )
+    metrics_data.extend(registry.render())
+
+    return HttpResponse('\n'.join(metrics_data) + '\n', content_type=PROMETHEUS_CONTENT_TYPE)
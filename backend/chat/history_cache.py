@@ -0,0 +1,121 @@
+"""
+Hot history cache
+The newest messages of each room, pre-serialized in the shared cache and appended to on every write
+"""
+import bisect
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SIZE': 100,
+    'TTL': 300,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_HISTORY_CACHE', {})}
+
+
+def _keys(room_id):
+    return f"history:{room_id}", f"history:{room_id}:gen"
+
+
+def _bump_generation(gen_key):
+    cache.add(gen_key, 0, timeout=None)
+    try:
+        return cache.incr(gen_key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(gen_key, 1, timeout=None)
+        return 1
+
+
+def get_latest(room_id):
+    """
+    Return the cached page for a room, or None on a miss
+
+    The page is a dict with 'messages' (serialized, oldest first) and
+    'complete', which is True when the page holds every message in the room.
+    """
+    config = get_config()
+    if not config['ENABLED']:
+        return None
+    entry_key, gen_key = _keys(room_id)
+    values = cache.get_many([entry_key, gen_key])
+    entry = values.get(entry_key)
+    if entry is None or entry['gen'] != values.get(gen_key, 0):
+        return None
+    return entry
+
+
+def current_generation(room_id):
+    """Read before querying the database; pass to store_latest"""
+    return cache.get(_keys(room_id)[1], 0)
+
+
+def store_latest(room_id, messages, generation):
+    """
+    Cache the tail of a room's newest messages, oldest first
+
+    Pass one more than SIZE messages when the room has that many, so the
+    page knows it is not complete. Dropped on the next read if a write bumped the generation in between.
+    """
+    config = get_config()
+    if not config['ENABLED']:
+        return
+    size = config['SIZE']
+    cache.set(_keys(room_id)[0], {
+        'gen': generation,
+        'messages': list(messages[-size:]),
+        'complete': len(messages) <= size,
+    }, config['TTL'])
+
+
+def _position(message):
+    return message['created_at'], str(message['id'])
+
+
+def append_message(room_id, data):
+    """
+    Add a newly written message to the room's cached page, in (created_at, id) order
+
+    Every write bumps the room's generation. The entry is only extended
+    when it was current just before this write; otherwise a concurrent
+    writer got there first and the entry is dropped for the next read
+    to rebuild.
+    """
+    config = get_config()
+    if not config['ENABLED']:
+        return
+    entry_key, gen_key = _keys(room_id)
+    generation = _bump_generation(gen_key)
+    entry = cache.get(entry_key)
+    if entry is None:
+        return
+    if entry['gen'] != generation - 1:
+        cache.delete(entry_key)
+        return
+    # Writers commit in any order; keep the page in (created_at, id) order like the query
+    messages = list(entry['messages'])
+    position = bisect.bisect(messages, _position(data), key=_position)
+    complete = entry['complete']
+    if position == 0 and messages and not complete:
+        # Older than the whole page, with older history beyond it: not among the newest
+        cache.set(entry_key, {**entry, 'gen': generation}, config['TTL'])
+        return
+    messages.insert(position, data)
+    if len(messages) > config['SIZE']:
+        messages = messages[-config['SIZE']:]
+        complete = False
+    cache.set(entry_key, {'gen': generation, 'messages': messages, 'complete': complete}, config['TTL'])
+
+
+def invalidate(room_id):
+    """Mark the room's cached page stale after an edit or delete"""
+    if get_config()['ENABLED']:
+        _bump_generation(_keys(room_id)[1])
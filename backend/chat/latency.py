@@ -0,0 +1,59 @@
+"""
+Chat pipeline latency
+Per-stage timings of a chat message, from server receive to each receiver's socket write
+"""
+import time
+
+from django.conf import settings
+
+from .metrics import registry
+
+DEFAULTS = {
+    'ENABLED': True,
+}
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+# Sender stages: save, serialize, write_behind, encode, replay, group_send
+# Receiver stages: fanout (receive -> handler), send (socket write), end_to_end (receive -> socket write)
+stage_histogram = registry.histogram(
+    'relaydesk_chat_stage_seconds',
+    'Time spent in each stage of the chat message pipeline',
+    buckets=LATENCY_BUCKETS,
+    quantiles=(0.5, 0.95, 0.99),
+)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_LATENCY', {})}
+
+
+def is_enabled():
+    return get_config()['ENABLED']
+
+
+class StageTimer:
+    """
+    Times consecutive stages of one inbound chat message
+
+    `received_at` is wall-clock time so that receivers in other processes
+    can measure lag against it; stage durations use the monotonic clock.
+    """
+
+    __slots__ = ('received_at', 'last')
+
+    def __init__(self):
+        self.received_at = time.time()
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        stage_histogram.observe(now - self.last, stage=stage)
+        self.last = now
+
+
+def observe_since(stage, sent_at):
+    """Record wall-clock time elapsed since an event's `sent_at` stamp"""
+    stage_histogram.observe(max(0.0, time.time() - sent_at), stage=stage)
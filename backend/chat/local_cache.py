@@ -0,0 +1,234 @@
+"""
+Process-local caches with cross-process invalidation
+Bounded TTL/LRU maps whose entries are dropped in every worker when the source row changes
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+INVALIDATION_GROUP = 'local_cache_invalidation'
+GROUP_REFRESH_INTERVAL = 3600
+# Seconds between attempts to reach the channel layer after a failure, doubling up to the max
+RETRY_DELAY = 1
+RETRY_MAX_DELAY = 30
+
+
+class LocalCache:
+    """
+    Thread-safe LRU map with per-entry expiry
+
+    Values may be None (useful for negative caching); a lookup that finds
+    nothing returns MISSING instead.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_caches = {}
+
+
+def get_local_cache(name):
+    return _caches.get(name)
+
+
+def clear_local_caches():
+    for local_cache in list(_caches.values()):
+        local_cache.clear()
+
+
+def invalidate(cache_name, key):
+    """
+    Drop a key from a local cache in this process and every other one
+
+    The local entry goes immediately; the broadcast (and a second local
+    delete, in case a reader re-cached the old row) waits for the current
+    transaction to commit.
+    """
+    local_cache = _caches[cache_name]
+    local_cache.delete(key)
+
+    def broadcast():
+        local_cache.delete(key)
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                INVALIDATION_GROUP,
+                {'type': 'local_cache.invalidate', 'cache': cache_name, 'key': key},
+            )
+        except Exception as e:
+            logger.warning(f"Could not broadcast invalidation of {cache_name}:{key}: {e}")
+
+    transaction.on_commit(broadcast)
+
+
+class InvalidationListener:
+    """Receives invalidation broadcasts for this process on a dedicated channel"""
+
+    def __init__(self, channel_layer):
+        self.channel_layer = channel_layer
+        self.channel_name = None
+        self._tasks = []
+
+    async def start(self):
+        self.channel_name = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(INVALIDATION_GROUP, self.channel_name)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._receive()), loop.create_task(self._refresh_membership())]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _receive(self):
+        delay = RETRY_DELAY
+        while True:
+            try:
+                message = await self.channel_layer.receive(self.channel_name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Local cache invalidation receive failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+                # Broadcasts sent meanwhile are lost; forget anything they might have covered
+                clear_local_caches()
+                await self._join()
+                continue
+            delay = RETRY_DELAY
+            local_cache = _caches.get(message.get('cache'))
+            if local_cache is not None:
+                local_cache.delete(message.get('key'))
+
+    async def _join(self):
+        try:
+            await self.channel_layer.group_add(INVALIDATION_GROUP, self.channel_name)
+        except Exception as e:
+            logger.warning(f"Could not join the local cache invalidation group: {e}")
+
+    async def _refresh_membership(self):
+        # Layer groups expire; keep this process subscribed
+        while True:
+            await asyncio.sleep(GROUP_REFRESH_INTERVAL)
+            await self._join()
+
+
+_listeners = weakref.WeakKeyDictionary()
+_retry_at = weakref.WeakKeyDictionary()
+
+
+async def ensure_invalidation_listener():
+    """Start the invalidation listener for the running event loop if needed"""
+    loop = asyncio.get_running_loop()
+    if loop not in _listeners and _retry_at.get(loop, 0) <= time.monotonic():
+        listener = _listeners[loop] = InvalidationListener(get_channel_layer())
+        try:
+            await listener.start()
+        except Exception as e:
+            del _listeners[loop]
+            # Don't hold up every request while the layer is down
+            _retry_at[loop] = time.monotonic() + RETRY_MAX_DELAY
+            logger.warning(f"Local cache invalidation listener failed to start: {e}")
+    return _listeners.get(loop)
+
+
+class InvalidationListenerMiddleware:
+    """
+    ASGI wrapper that starts the invalidation listener with the server
+
+    Servers that send the lifespan protocol start it at startup; otherwise
+    it starts with the first HTTP request or WebSocket, whichever comes
+    first, so REST-only processes get invalidations too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await ensure_invalidation_listener()
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+_thread_pid = None
+_thread_lock = threading.Lock()
+
+
+def start_invalidation_thread():
+    """
+    Run the invalidation listener on a daemon thread with its own event loop
+
+    For processes without an event loop of their own, i.e. WSGI workers.
+    Safe to call more than once; forked children (gunicorn --preload)
+    start their own thread.
+    """
+    global _thread_pid
+    with _thread_lock:
+        if _thread_pid == os.getpid():
+            return
+        if _thread_pid is None:
+            os.register_at_fork(after_in_child=start_invalidation_thread)
+        _thread_pid = os.getpid()
+    threading.Thread(
+        target=asyncio.run, args=(_run_listener(),), name='local-cache-invalidation', daemon=True
+    ).start()
+
+
+async def _run_listener():
+    while await ensure_invalidation_listener() is None:
+        await asyncio.sleep(RETRY_MAX_DELAY)
+    await asyncio.Event().wait()
@@ -0,0 +1,68 @@
+"""
+Django Management Command: Export Room
+Streams a room's message history to NDJSON (optionally gzip-compressed)
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.export import gzip_stream, iter_room_ndjson
+from chat.models import Room
+
+
+class Command(BaseCommand):
+    help = "Exports a room's messages as NDJSON, one message per line"
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug', help='Room to export')
+        parser.add_argument(
+            '--output',
+            '-o',
+            help='File to write (default: stdout)'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows fetched per cursor round-trip'
+        )
+
+    def handle(self, *args, **options):
+        room_id = Room.objects.filter(slug=options['slug']).values_list('id', flat=True).first()
+        if room_id is None:
+            raise CommandError(f"Room {options['slug']} not found")
+
+        rows = 0
+        blocks = iter_room_ndjson(room_id, chunk_size=options['chunk_size'])
+
+        def counted(blocks):
+            nonlocal rows
+            for block in blocks:
+                rows += block.count(b'\n')
+                yield block
+
+        stream = counted(blocks)
+        if options['gzip']:
+            stream = gzip_stream(stream)
+
+        started = time.perf_counter()
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for block in stream:
+                output.write(block)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f"✅ Exported {rows} messages from {options['slug']} in {elapsed:.2f}s "
+            f"({rows / elapsed if elapsed else 0:,.0f} rows/s)"
+        ))
@@ -0,0 +1,38 @@
+"""
+Django Management Command: Reconcile Room Stats
+Recomputes Room.message_count and Room.last_message_at from the messages table
+"""
+from django.core.management.base import BaseCommand
+
+from chat.models import Room
+from chat.room_stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Repairs denormalized room message counts and last message times'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--room',
+            action='append',
+            dest='rooms',
+            metavar='SLUG',
+            help='Only reconcile this room (repeatable)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without fixing it'
+        )
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.all()
+        if options['rooms']:
+            rooms = rooms.filter(slug__in=options['rooms'])
+
+        drifted = reconcile(rooms, dry_run=options['dry_run'])
+        for room, stored, actual in drifted:
+            self.stdout.write(f'  • {room.slug}: stored {stored}, actual {actual}')
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'✅ {verb} {len(drifted)} rooms with drifted stats'))
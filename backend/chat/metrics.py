@@ -0,0 +1,227 @@
+"""
+In-process metrics registry
+Counters, gauges and histograms rendered in Prometheus text format
+"""
+import bisect
+import threading
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _label_key(labels):
+    """Normalize label kwargs into a hashable, ordered key"""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """Base class for a named metric with optional labels"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        lines.extend(self.samples())
+        return lines
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        super().__init__(name, description)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(key)} {value}' for key, value in items]
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, description):
+        super().__init__(name, description)
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(key)} {value}' for key, value in items]
+
+
+class Histogram(Metric):
+    """
+    Cumulative bucket histogram with running sum and count
+
+    With `quantiles`, estimates of those quantiles (interpolated within
+    buckets) are also rendered as a `<name>_quantiles` gauge family.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS, quantiles=()):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self.quantiles = tuple(quantiles)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'counts': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series['count'] if series else 0
+
+    def total(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series['sum'] if series else 0.0
+
+    def quantile(self, q, **labels):
+        """Estimate the q-quantile (0..1); None without observations"""
+        series = self._series.get(_label_key(labels))
+        if not series or not series['count']:
+            return None
+        with self._lock:
+            counts = list(series['counts'])
+            count = series['count']
+        return self._estimate(q, counts, count)
+
+    def _estimate(self, q, counts, count):
+        rank = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        # Beyond the last bucket: the largest finite bound is the best estimate
+        return self.buckets[-1]
+
+    def render(self):
+        lines = super().render()
+        if self.quantiles:
+            lines.extend([
+                f'# HELP {self.name}_quantiles {self.description} (estimated quantiles)',
+                f'# TYPE {self.name}_quantiles gauge',
+            ])
+            with self._lock:
+                items = sorted((key, list(series['counts']), series['count']) for key, series in self._series.items())
+            for key, counts, count in items:
+                for q in self.quantiles:
+                    value = self._estimate(q, counts, count)
+                    lines.append(f'{self.name}_quantiles{_format_labels(key, [("quantile", q)])} {value}')
+        return lines
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            items = sorted(
+                (key, list(series['counts']), series['sum'], series['count'])
+                for key, series in self._series.items()
+            )
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics, keyed by name"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, description, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, **kwargs)
+            return metric
+
+    def counter(self, name, description):
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name, description):
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS, quantiles=()):
+        return self._get_or_create(Histogram, name, description, buckets=buckets, quantiles=quantiles)
+
+    def render(self):
+        """Render every registered metric in Prometheus text format"""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.extend(metric.render())
+            lines.append('')
+        return lines
+
+
+registry = MetricsRegistry()
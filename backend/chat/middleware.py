@@ -4,16 +4,40 @@ Extracts and validates JWT tokens from WebSocket connections
 """
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken, AccessToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import get_user_model
 from urllib.parse import parse_qs
+from .local_cache import MISSING, LocalCache, invalidate
+import copy
+import hashlib
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+WS_AUTH_DEFAULTS = {
+    'TOKEN_CACHE_SIZE': 10000,
+    'USER_CACHE_SIZE': 5000,
+    'USER_CACHE_TTL': 300,
+}
+_ws_auth_config = {**WS_AUTH_DEFAULTS, **getattr(settings, 'CHAT_WS_AUTH', {})}
+
+# sha256(token) -> user id, kept until the token's own exp claim
+verified_token_cache = LocalCache('ws_tokens', maxsize=_ws_auth_config['TOKEN_CACHE_SIZE'])
+# user id -> User (or None for deleted users), invalidated when the user changes
+user_cache = LocalCache(
+    'ws_users', maxsize=_ws_auth_config['USER_CACHE_SIZE'], ttl=_ws_auth_config['USER_CACHE_TTL']
+)
+
+
+def invalidate_cached_user(user_id):
+    invalidate(user_cache.name, user_id)
+
 
 class JwtAuthMiddleware(BaseMiddleware):
     """
@@ -74,30 +98,35 @@ class JwtAuthMiddleware(BaseMiddleware):
 
         return None
 
-    @database_sync_to_async
-    def get_user_from_token(self, token):
+    async def get_user_from_token(self, token):
         """
         Validate JWT token and return associated user.
 
+        Both the verified claims and the user are cached in-process, so a
+        reconnect with a token we have already seen costs no signature check
+        and no database query.
+
         Args:
             token: JWT token string
 
         Returns:
             User: Authenticated user object or AnonymousUser if validation fails
         """
+        user_id = None
         try:
-            # Step 1: Validate token structure and signature
-            UntypedToken(token)
-
-            # Step 2: Decode token to get user_id
-            access_token = AccessToken(token)
-            user_id = access_token['user_id']
+            # Step 1: Verify signature, expiry and token type (once per token)
+            user_id = self.get_user_id_from_token(token)
 
-            # Step 3: Fetch user from database
-            user = User.objects.get(id=user_id)
+            # Step 2: Fetch user, from the process cache when possible
+            user = user_cache.get(user_id)
+            if user is MISSING:
+                user = await self.load_user(user_id)
+            if user is None:
+                raise User.DoesNotExist
 
             logger.debug(f"User {user.username} authenticated via JWT token")
-            return user
+            # Each connection gets its own copy of the shared cached instance
+            return copy.copy(user)
 
         except (InvalidToken, TokenError) as e:
             logger.warning(f"JWT token validation failed: {e}")
@@ -109,6 +138,32 @@ class JwtAuthMiddleware(BaseMiddleware):
             logger.error(f"Unexpected error during JWT authentication: {e}")
             return AnonymousUser()
 
+    @staticmethod
+    def get_user_id_from_token(token):
+        """
+        Return the user id claim of a valid access token
+
+        Raises:
+            TokenError: The token is malformed, expired or not an access token
+        """
+        token_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        user_id = verified_token_cache.get(token_key)
+        if user_id is not MISSING:
+            return user_id
+
+        access_token = AccessToken(token)
+        user_id = access_token[api_settings.USER_ID_CLAIM]
+        remaining = access_token['exp'] - time.time()
+        if remaining > 0:
+            verified_token_cache.set(token_key, user_id, ttl=remaining)
+        return user_id
+
+    @database_sync_to_async
+    def load_user(self, user_id):
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        user_cache.set(user_id, user)
+        return user
+
 
 def JwtAuthMiddlewareStack(inner):
     """
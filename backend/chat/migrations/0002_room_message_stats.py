@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:55
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def backfill_room_stats(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+    Room = apps.get_model("chat", "Room")
+    stats = Message.objects.values("room_id").annotate(count=Count("pk"), last_at=Max("created_at"))
+    for row in stats.iterator():
+        Room.objects.filter(pk=row["room_id"]).update(message_count=row["count"], last_message_at=row["last_at"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="room",
+            name="last_message_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="message_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_room_stats, migrations.RunPython.noop),
+    ]
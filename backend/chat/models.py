@@ -2,12 +2,17 @@
 Chat Application Models
 Database schema for rooms and messages
 """
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.dispatch import Signal
 from django.utils.text import slugify
 from django.utils import timezone
 import uuid
 
+# Sent inside the deleting transaction with room_counts={room id: messages deleted}.
+# Message has no pre/post_delete receivers, so cascades from Room and User stay fast deletes.
+messages_deleted = Signal()
+
 
 class Room(models.Model):
     """
@@ -26,6 +31,11 @@ class Room(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Maintained by chat.room_stats on every message write; repair with reconcile_room_stats
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    STATS_FIELDS = ('message_count', 'last_message_at')
     
     class Meta:
         ordering = ['-created_at']
@@ -44,13 +54,35 @@ class Room(models.Model):
                 slug = f"{base_slug}-{counter}"
                 counter += 1
             self.slug = slug
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # The stats are maintained with F() updates; never write back a stale copy
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.STATS_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     def __str__(self):
         return self.name
-    
-    # ✅ REMOVED @property decorator - this was causing the error!
-    # The message_count is now calculated in views.py using annotate()
+
+    @staticmethod
+    def group_name_for(slug):
+        """Channel layer group carrying a room's WebSocket events"""
+        return f'chat_{slug}'
+
+
+class MessageQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete, then report the count per room in one messages_deleted signal"""
+        with transaction.atomic(using=self.db):
+            room_counts = dict(self.order_by().values_list('room_id').annotate(count=models.Count('pk')))
+            result = super().delete()
+            if room_counts:
+                messages_deleted.send(sender=Message, room_counts=room_counts)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
 
 
 class Message(models.Model):
@@ -73,6 +105,8 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_edited = models.BooleanField(default=False)
+
+    objects = MessageQuerySet.as_manager()
     
     class Meta:
         ordering = ['created_at']
@@ -83,6 +117,17 @@ class Message(models.Model):
     
     def __str__(self):
         return f"{self.user.username}: {self.content[:50]}"
+
+    def save(self, *args, **kwargs):
+        # post_save receivers (the room counters) commit or roll back with the row
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            result = super().delete(*args, **kwargs)
+            messages_deleted.send(sender=Message, room_counts={self.room_id: 1})
+        return result
     
     def mark_edited(self):
         """Mark message as edited"""
@@ -0,0 +1,239 @@
+"""
+Per-connection outbound queues
+Bounded, prioritised buffering between channel-layer events and the socket
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Lower value wins: chat messages are never dropped in favour of typing or presence
+PRIORITY_CHAT = 0
+PRIORITY_PRESENCE = 1
+PRIORITY_TYPING = 2
+PRIORITY_NAMES = {PRIORITY_CHAT: 'chat', PRIORITY_PRESENCE: 'presence', PRIORITY_TYPING: 'typing'}
+
+DEFAULTS = {
+    'MAX_QUEUE': 256,
+    'MAX_LAG_SECONDS': 10,
+    'EVICT_CLOSE_CODE': 4008,
+    'BATCH_RATE_THRESHOLD': 20,
+    'BATCH_MAX_SIZE': 50,
+    'BATCH_MAX_DELAY_MS': 10,
+}
+
+queue_depth_histogram = registry.histogram(
+    'relaydesk_ws_outbound_queue_depth',
+    'Frames already waiting on a connection when another is queued',
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+queued_frames_gauge = registry.gauge(
+    'relaydesk_ws_outbound_queued_frames',
+    'Frames waiting in outbound queues across all connections',
+)
+dropped_counter = registry.counter(
+    'relaydesk_ws_outbound_dropped_total',
+    'Outbound frames dropped to make room for more important ones',
+)
+coalesced_counter = registry.counter(
+    'relaydesk_ws_outbound_coalesced_total',
+    'Outbound frames merged into a frame already waiting in the queue',
+)
+evictions_counter = registry.counter(
+    'relaydesk_ws_slow_consumer_evictions_total',
+    'Connections closed for falling too far behind',
+)
+batch_size_histogram = registry.histogram(
+    'relaydesk_ws_batch_frame_events',
+    'Events packed into each batch frame',
+    buckets=(2, 5, 10, 20, 50, 100),
+)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_OUTBOUND', {})}
+
+
+class RateMeter:
+    """Events per second over the current and previous one-second windows"""
+
+    __slots__ = ('window_start', 'count', 'previous_rate')
+
+    def __init__(self):
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.previous_rate = 0.0
+
+    def tick(self):
+        """Count one event and return the current rate"""
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed >= 1.0:
+            # A gap longer than one window means the room went quiet
+            self.previous_rate = self.count / elapsed if elapsed < 2.0 else 0.0
+            self.window_start = now
+            self.count = 0
+        self.count += 1
+        return max(self.previous_rate, self.count)
+
+
+class QueuedFrame:
+    __slots__ = ('event', 'priority', 'enqueued_at', 'coalesce_key', 'batchable')
+
+    def __init__(self, event, priority, coalesce_key=None, batchable=False):
+        self.event = event
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.coalesce_key = coalesce_key
+        self.batchable = batchable
+
+
+class OutboundQueue:
+    """
+    Bounded outbound buffer for one socket
+
+    Handlers put events and return immediately, so the channel layer is
+    drained at full speed whatever the client's link is like. A writer task
+    sends queued events in priority order. When the queue is full the oldest
+    least important frame is dropped; frames sharing a coalesce_key are
+    merged in place. A connection whose chat frames cannot be queued, or
+    whose oldest frame has waited longer than max_lag, should be evicted.
+
+    Chat frames put with batchable=True are held for up to batch_max_delay
+    so a burst can be handed to deliver_batch as one ordered list.
+    """
+
+    def __init__(self, deliver, max_size=256, max_lag=10.0, deliver_batch=None, batch_max_size=1,
+                 batch_max_delay=0.0):
+        self.deliver = deliver
+        self.max_size = max_size
+        self.max_lag = max_lag
+        self.deliver_batch = deliver_batch
+        self.batch_max_size = batch_max_size
+        self.batch_max_delay = batch_max_delay
+        self.queues = {priority: deque() for priority in PRIORITY_NAMES}
+        self.pending_by_key = {}
+        self.size = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._held = False
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        queued_frames_gauge.dec(self.size)
+        self.size = 0
+        for queue in self.queues.values():
+            queue.clear()
+        self.pending_by_key.clear()
+
+    def hold(self):
+        """Keep queueing but stop sending, e.g. while replaying missed events ahead of live ones"""
+        self._held = True
+
+    def release(self):
+        self._held = False
+        self._wakeup.set()
+
+    def put(self, event, priority=PRIORITY_CHAT, coalesce_key=None, merge=None, batchable=False):
+        """
+        Queue an event for delivery
+
+        Returns:
+            bool: False if the connection is too far behind and should be evicted
+        """
+        if coalesce_key is not None and coalesce_key in self.pending_by_key:
+            frame = self.pending_by_key[coalesce_key]
+            frame.event = merge(frame.event, event)
+            coalesced_counter.inc(priority=PRIORITY_NAMES[priority])
+            return True
+
+        queue_depth_histogram.observe(self.size)
+        if self.size and time.monotonic() - self._oldest_enqueued_at() > self.max_lag:
+            return False
+        if self.size >= self.max_size and not self._make_room(priority):
+            if priority == PRIORITY_CHAT:
+                return False
+            dropped_counter.inc(priority=PRIORITY_NAMES[priority])
+            return True
+
+        frame = QueuedFrame(event, priority, coalesce_key, batchable)
+        self.queues[priority].append(frame)
+        if coalesce_key is not None:
+            self.pending_by_key[coalesce_key] = frame
+        self.size += 1
+        queued_frames_gauge.inc()
+        self._wakeup.set()
+        return True
+
+    def _oldest_enqueued_at(self):
+        return min(queue[0].enqueued_at for queue in self.queues.values() if queue)
+
+    def _make_room(self, priority):
+        """Drop the oldest frame strictly less important than priority"""
+        for victim_priority in sorted(self.queues, reverse=True):
+            if victim_priority <= priority:
+                break
+            queue = self.queues[victim_priority]
+            if queue:
+                self._forget(queue.popleft())
+                dropped_counter.inc(priority=PRIORITY_NAMES[victim_priority])
+                return True
+        return False
+
+    def _forget(self, frame):
+        if frame.coalesce_key is not None:
+            self.pending_by_key.pop(frame.coalesce_key, None)
+        self.size -= 1
+        queued_frames_gauge.dec()
+
+    def _pop(self):
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            if queue:
+                frame = queue.popleft()
+                self._forget(frame)
+                return frame
+        return None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._held:
+                frame = self._pop()
+                if frame is None:
+                    break
+                try:
+                    if frame.batchable and self.deliver_batch is not None and self.batch_max_size > 1:
+                        await self._deliver_batch(frame)
+                    else:
+                        await self.deliver(frame.event)
+                except Exception as e:
+                    logger.error(f"Outbound delivery failed: {e}", exc_info=True)
+
+    async def _deliver_batch(self, first):
+        queue = self.queues[PRIORITY_CHAT]
+        if len(queue) < self.batch_max_size - 1:
+            # Give the rest of the burst a moment to arrive
+            await asyncio.sleep(self.batch_max_delay)
+        frames = [first]
+        while queue and queue[0].batchable and len(frames) < self.batch_max_size:
+            frame = queue.popleft()
+            self._forget(frame)
+            frames.append(frame)
+        if len(frames) == 1:
+            await self.deliver(first.event)
+            return
+        batch_size_histogram.observe(len(frames))
+        await self.deliver_batch([frame.event for frame in frames])
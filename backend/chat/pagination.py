@@ -0,0 +1,136 @@
+"""
+Message pagination
+Keyset pages over (created_at, id), so any page costs the same however long the history is
+"""
+import uuid
+from base64 import b64decode, b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(created_at, message_id):
+    return b64encode(f"{created_at}|{message_id}".encode('utf8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, id) or raises NotFound"""
+    try:
+        created_at, message_id = b64decode(cursor.encode('ascii'), validate=True).decode('utf8').split('|')
+        created_at = parse_datetime(created_at)
+        message_id = uuid.UUID(message_id)
+    except (TypeError, ValueError, UnicodeError):
+        created_at = None
+    if created_at is None:
+        raise NotFound('Invalid cursor')
+    return created_at, message_id
+
+
+def position(item):
+    """Cursor fields of a Message, a values_list(named=True) row, or a serialized dict"""
+    if isinstance(item, dict):
+        return item['created_at'], item['id']
+    return item.created_at.isoformat(), item.id
+
+
+class MessageKeysetPagination(BasePagination):
+    """
+    Keyset pagination for messages, oldest first within a page
+
+    Without a cursor the newest page is returned. `?before=<cursor>` pages
+    back to older messages and `?after=<cursor>` forward to newer ones;
+    `previous` and `next` link to them. Each page is one range scan on the
+    (room, created_at) index, bounded by the page size.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    before_query_param = 'before'
+    after_query_param = 'after'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def is_newest_page(self, request):
+        params = request.query_params
+        return self.before_query_param not in params and self.after_query_param not in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+
+        if after is not None:
+            created_at, message_id = decode_cursor(after)
+            rows = list(
+                queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id))
+                .order_by('created_at', 'id')[:size + 1]
+            )
+            self.has_older, self.has_newer = True, len(rows) > size
+            self.page = rows[:size]
+            return self.page
+
+        if before is not None:
+            created_at, message_id = decode_cursor(before)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+        rows = list(queryset.order_by('-created_at', '-id')[:size + 1])
+        self.has_older, self.has_newer = len(rows) > size, before is not None
+        self.page = rows[:size][::-1]
+        return self.page
+
+    def paginate_tail(self, items, complete, request):
+        """
+        Page the newest messages from an already loaded, oldest-first tail
+
+        `complete` says whether the tail holds the room's whole history;
+        the tail must then hold at least a page, or be complete.
+        """
+        self.request = request
+        size = self.get_page_size(request)
+        self.has_older = len(items) > size or not complete
+        self.has_newer = False
+        self.page = list(items[-size:])
+        return self.page
+
+    def get_link(self, param, item):
+        url = self.request.build_absolute_uri()
+        for name in (self.before_query_param, self.after_query_param):
+            url = remove_query_param(url, name)
+        return replace_query_param(url, param, encode_cursor(*position(item)))
+
+    def get_previous_link(self):
+        if not self.has_older or not self.page:
+            return None
+        return self.get_link(self.before_query_param, self.page[0])
+
+    def get_next_link(self):
+        if not self.has_newer or not self.page:
+            return None
+        return self.get_link(self.after_query_param, self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response({
+            'previous': self.get_previous_link(),
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
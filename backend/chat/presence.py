@@ -0,0 +1,263 @@
+"""
+Room presence tracking
+Per-connection entries with heartbeat expiry, kept in Redis or in-process
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    'BACKEND': 'chat.presence.LocalPresenceStore',
+    'OPTIONS': {},
+    'HEARTBEAT_INTERVAL': 20,
+}
+
+
+class BasePresenceStore:
+    """
+    Presence store interface
+
+    Each WebSocket connection is tracked separately (keyed by channel name)
+    with an expiry score refreshed by heartbeats. A user is online in a room
+    while at least one of their connections is alive.
+
+    Every change to a room's set of online users bumps a per-room version,
+    so clients applying join/leave deltas can detect a gap and resync.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+
+    def join(self, room_slug, channel_name, user):
+        """Register a connection. Returns the new version if the user just came online, else None."""
+        raise NotImplementedError
+
+    def leave(self, room_slug, channel_name, user):
+        """Drop a connection. Returns the new version if the user just went offline, else None."""
+        raise NotImplementedError
+
+    def heartbeat(self, room_slug, channel_name, user):
+        """Push the connection's expiry forward by ttl seconds"""
+        raise NotImplementedError
+
+    def snapshot(self, room_slug):
+        """Return (online users as {'id', 'username'} dicts, version)"""
+        raise NotImplementedError
+
+    def members(self, room_slug):
+        return self.snapshot(room_slug)[0]
+
+
+# Shared by the scripts below; ARGV[1] is the current time
+PURGE_EXPIRED = """
+local dead = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, member in ipairs(dead) do
+    redis.call('ZREM', KEYS[1], member)
+    local user_id = string.match(member, '^([^:]+):')
+    if redis.call('HINCRBY', KEYS[3], user_id, -1) <= 0 then
+        redis.call('HDEL', KEYS[3], user_id)
+        redis.call('HDEL', KEYS[2], user_id)
+        redis.call('INCR', KEYS[4])
+    end
+end
+"""
+
+# KEYS: conns zset, users hash, refs hash, version counter
+# ARGV: now, member, expires_at, user_id, username, key ttl (ms)
+# Purges expired connections first, so a user who timed out comes online again
+JOIN_SCRIPT = PURGE_EXPIRED + """
+local version = 0
+if redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2]) == 1 then
+    redis.call('HSET', KEYS[2], ARGV[4], ARGV[5])
+    if redis.call('HINCRBY', KEYS[3], ARGV[4], 1) == 1 then
+        version = redis.call('INCR', KEYS[4])
+    end
+end
+for i = 1, 4 do
+    redis.call('PEXPIRE', KEYS[i], ARGV[6])
+end
+return version
+"""
+
+# KEYS: conns zset, users hash, refs hash, version counter
+# ARGV: member, user_id
+LEAVE_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+if redis.call('HINCRBY', KEYS[3], ARGV[2], -1) <= 0 then
+    redis.call('HDEL', KEYS[3], ARGV[2])
+    redis.call('HDEL', KEYS[2], ARGV[2])
+    return redis.call('INCR', KEYS[4])
+end
+return 0
+"""
+
+# KEYS: conns zset, users hash, refs hash, version counter
+# ARGV: now, member, expires_at, user_id, username, key ttl (ms)
+HEARTBEAT_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+else
+    -- Purged after missed heartbeats: register the connection again
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+    redis.call('HSET', KEYS[2], ARGV[4], ARGV[5])
+    if redis.call('HINCRBY', KEYS[3], ARGV[4], 1) == 1 then
+        redis.call('INCR', KEYS[4])
+    end
+end
+for i = 1, 4 do
+    redis.call('PEXPIRE', KEYS[i], ARGV[6])
+end
+return 1
+"""
+
+# KEYS: conns zset, users hash, refs hash, version counter
+# ARGV: now
+# Purges expired connections, then returns {version, users hash as a flat list}
+SNAPSHOT_SCRIPT = PURGE_EXPIRED + """
+return {tonumber(redis.call('GET', KEYS[4]) or 0), redis.call('HGETALL', KEYS[2])}
+"""
+
+
+class RedisPresenceStore(BasePresenceStore):
+    """
+    Redis-backed presence using a sorted set of connections scored by expiry
+    plus per-user reference counts. Every mutation is a single Lua script, so
+    concurrent joins and leaves never lose updates.
+    """
+
+    def __init__(self, url='redis://localhost:6379/2', ttl=60, prefix='presence'):
+        super().__init__(ttl=ttl)
+        import redis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._join = self.client.register_script(JOIN_SCRIPT)
+        self._leave = self.client.register_script(LEAVE_SCRIPT)
+        self._heartbeat = self.client.register_script(HEARTBEAT_SCRIPT)
+        self._snapshot = self.client.register_script(SNAPSHOT_SCRIPT)
+
+    def _keys(self, room_slug):
+        base = f"{self.prefix}:{room_slug}"
+        return [f"{base}:conns", f"{base}:users", f"{base}:refs", f"{base}:version"]
+
+    @staticmethod
+    def _member(channel_name, user):
+        return f"{user.id}:{channel_name}"
+
+    def join(self, room_slug, channel_name, user):
+        now = time.time()
+        version = self._join(
+            keys=self._keys(room_slug),
+            args=[now, self._member(channel_name, user), now + self.ttl, user.id, user.username, self.ttl * 2000],
+        )
+        return version or None
+
+    def leave(self, room_slug, channel_name, user):
+        version = self._leave(
+            keys=self._keys(room_slug),
+            args=[self._member(channel_name, user), user.id],
+        )
+        return version or None
+
+    def heartbeat(self, room_slug, channel_name, user):
+        now = time.time()
+        self._heartbeat(
+            keys=self._keys(room_slug),
+            args=[now, self._member(channel_name, user), now + self.ttl, user.id, user.username, self.ttl * 2000],
+        )
+
+    def snapshot(self, room_slug):
+        version, flat = self._snapshot(keys=self._keys(room_slug), args=[time.time()])
+        pairs = zip(flat[::2], flat[1::2])
+        users = sorted(
+            ({'id': int(user_id), 'username': username} for user_id, username in pairs),
+            key=lambda user: user['id'],
+        )
+        return users, int(version)
+
+
+class LocalPresenceStore(BasePresenceStore):
+    """
+    In-process stand-in with the same semantics as RedisPresenceStore
+    Only suitable for tests and single-process deployments.
+    """
+
+    def __init__(self, ttl=60):
+        super().__init__(ttl=ttl)
+        self._rooms = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _user_ids(connections):
+        return {user_data['id'] for _, user_data in connections.values()}
+
+    def _bump(self, room_slug):
+        version = self._versions.get(room_slug, 0) + 1
+        self._versions[room_slug] = version
+        return version
+
+    def _purge(self, room_slug, connections, now):
+        before = self._user_ids(connections)
+        for channel_name in [name for name, (expires_at, _) in connections.items() if expires_at <= now]:
+            del connections[channel_name]
+        if self._user_ids(connections) != before:
+            self._bump(room_slug)
+
+    def join(self, room_slug, channel_name, user):
+        now = time.time()
+        with self._lock:
+            connections = self._rooms.setdefault(room_slug, {})
+            self._purge(room_slug, connections, now)
+            came_online = user.id not in self._user_ids(connections)
+            connections[channel_name] = (now + self.ttl, {'id': user.id, 'username': user.username})
+            return self._bump(room_slug) if came_online else None
+
+    def leave(self, room_slug, channel_name, user):
+        with self._lock:
+            connections = self._rooms.get(room_slug, {})
+            if connections.pop(channel_name, None) is None:
+                return None
+            if not connections:
+                self._rooms.pop(room_slug, None)
+            went_offline = user.id not in self._user_ids(connections)
+            return self._bump(room_slug) if went_offline else None
+
+    def heartbeat(self, room_slug, channel_name, user):
+        with self._lock:
+            connections = self._rooms.setdefault(room_slug, {})
+            came_online = user.id not in self._user_ids(connections)
+            connections[channel_name] = (time.time() + self.ttl, {'id': user.id, 'username': user.username})
+            if came_online:
+                self._bump(room_slug)
+
+    def snapshot(self, room_slug):
+        with self._lock:
+            connections = self._rooms.get(room_slug, {})
+            self._purge(room_slug, connections, time.time())
+            users = {user_data['id']: user_data for _, user_data in connections.values()}
+            version = self._versions.get(room_slug, 0)
+        return sorted(users.values(), key=lambda user: user['id']), version
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_presence_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_PRESENCE', {})}
+
+
+def get_presence_store():
+    """Return the process-wide presence store configured in CHAT_PRESENCE"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = get_presence_config()
+                _store = import_string(config['BACKEND'])(**config['OPTIONS'])
+    return _store
@@ -1,11 +1,47 @@
 """
 Redis-backed rate limiting middleware
+plus in-process token buckets for WebSocket frames
 """
+from collections import deque
+from django.conf import settings
 from django.core.cache import cache
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
+from .local_cache import MISSING, LocalCache
+from .metrics import registry
 import time
 
+WS_RATE_LIMIT_DEFAULTS = {
+    'ENABLED': True,
+    # Frame type -> (tokens per second, burst) for each connection and each user
+    'BUCKETS': {
+        'chat_message': {'connection': (5, 10), 'user': (10, 20)},
+        'typing': {'connection': (5, 10), 'user': (10, 20)},
+        # subscribe/unsubscribe; the burst covers CHAT_MULTIPLEX['MAX_ROOMS'] subscriptions
+        'control': {'connection': (10, 100), 'user': (20, 200)},
+        'default': {'connection': (10, 20), 'user': (20, 40)},
+    },
+    'MAX_VIOLATIONS': 20,
+    'VIOLATION_WINDOW': 10,
+    'CLOSE_CODE': 4029,
+}
+
+ws_throttled_counter = registry.counter(
+    'relaydesk_ws_frames_throttled_total',
+    'Inbound WebSocket frames rejected by the rate limiter',
+)
+ws_rate_limit_closes_counter = registry.counter(
+    'relaydesk_ws_rate_limit_closes_total',
+    'WebSocket connections closed for sustained rate limit violations',
+)
+
+# Frame types charged to the 'control' bucket rather than their own
+CONTROL_FRAME_TYPES = frozenset({'subscribe', 'unsubscribe'})
+
+# (user id, frame type) -> TokenBucket shared by that user's connections in this process;
+# entries are re-stored on every check, so they only expire once they would be full again
+user_buckets = LocalCache('ws_user_buckets', maxsize=50000, ttl=600)
+
 
 class RateLimitMiddleware(MiddlewareMixin):
     """Rate limit requests by IP/user"""
@@ -68,3 +104,95 @@ class RateLimitMiddleware(MiddlewareMixin):
             ip = request.META.get('REMOTE_ADDR')
         
         return f"ip:{ip}"
+
+
+def get_ws_rate_limit_config():
+    return {**WS_RATE_LIMIT_DEFAULTS, **getattr(settings, 'CHAT_WS_RATE_LIMIT', {})}
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def retry_after(self):
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def refill_time(self):
+        """Seconds an empty bucket takes to fill up"""
+        return self.capacity / self.rate
+
+
+class ConnectionRateLimiter:
+    """
+    Inbound frame budget for one WebSocket connection
+
+    A frame needs a token from both the connection's bucket and the
+    user's bucket for its type; user buckets are shared by all of that
+    user's connections in this process. Everything is in memory, so
+    checking a frame costs no network round-trip.
+    """
+
+    def __init__(self, user_id, config=None):
+        self.config = config or get_ws_rate_limit_config()
+        self.user_id = user_id
+        self.buckets = {}
+        self.violations = deque()
+
+    def _limits(self, frame_type):
+        buckets = self.config['BUCKETS']
+        return buckets.get(frame_type) or buckets['default']
+
+    def _connection_bucket(self, frame_type):
+        bucket = self.buckets.get(frame_type)
+        if bucket is None:
+            bucket = self.buckets[frame_type] = TokenBucket(*self._limits(frame_type)['connection'])
+        return bucket
+
+    def _user_bucket(self, frame_type):
+        key = (self.user_id, frame_type)
+        bucket = user_buckets.get(key)
+        if bucket is MISSING:
+            bucket = TokenBucket(*self._limits(frame_type)['user'])
+        # Dropping the bucket any sooner would hand the user a fresh burst
+        user_buckets.set(key, bucket, ttl=max(user_buckets.ttl, bucket.refill_time()))
+        return bucket
+
+    def allow(self, frame_type):
+        """
+        Take a token for a frame
+
+        Returns:
+            float: 0 if the frame may proceed, else seconds until it would
+        """
+        if frame_type in CONTROL_FRAME_TYPES:
+            frame_type = 'control'
+        if frame_type not in self.config['BUCKETS']:
+            frame_type = 'default'
+        buckets = (self._connection_bucket(frame_type), self._user_bucket(frame_type))
+        now = time.monotonic()
+        for bucket in buckets:
+            bucket.refill(now)
+        if all(bucket.tokens >= 1 for bucket in buckets):
+            for bucket in buckets:
+                bucket.tokens -= 1
+            return 0.0
+        self.violations.append(now)
+        return max(bucket.retry_after() for bucket in buckets)
+
+    def is_abusive(self):
+        """True once MAX_VIOLATIONS frames were throttled within VIOLATION_WINDOW seconds"""
+        cutoff = time.monotonic() - self.config['VIOLATION_WINDOW']
+        while self.violations and self.violations[0] < cutoff:
+            self.violations.popleft()
+        return len(self.violations) >= self.config['MAX_VIOLATIONS']
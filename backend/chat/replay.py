@@ -0,0 +1,115 @@
+"""
+Per-room replay buffers
+Bounded rings of recent chat broadcasts, so reconnecting clients can resume without a history query
+"""
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    'BACKEND': 'chat.replay.LocalReplayBuffer',
+    'OPTIONS': {},
+}
+
+
+class BaseReplayBuffer:
+    """
+    Replay buffer interface
+
+    Each room keeps its last `size` chat_message frames as (message id,
+    encoded frame) pairs, oldest first.
+    """
+
+    def __init__(self, size=200):
+        self.size = size
+
+    def append(self, room_slug, message_id, text):
+        raise NotImplementedError
+
+    def entries(self, room_slug):
+        """Return the room's buffered (message_id, text) pairs, oldest first"""
+        raise NotImplementedError
+
+    def since(self, room_slug, message_id):
+        """
+        Return the pairs broadcast after message_id
+
+        Returns None if message_id is no longer (or was never) in the
+        buffer; the caller can't tell what was missed and must refetch.
+        """
+        entries = self.entries(room_slug)
+        for index, (entry_id, _) in enumerate(entries):
+            if entry_id == message_id:
+                return entries[index + 1:]
+        return None
+
+
+class RedisReplayBuffer(BaseReplayBuffer):
+    """Redis list per room, trimmed to size on every append"""
+
+    def __init__(self, url='redis://localhost:6379/2', size=200, ttl=3600, prefix='replay'):
+        super().__init__(size=size)
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def _key(self, room_slug):
+        return f"{self.prefix}:{room_slug}"
+
+    def append(self, room_slug, message_id, text):
+        key = self._key(room_slug)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(key, json.dumps([str(message_id), text]))
+        pipe.ltrim(key, -self.size, -1)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def entries(self, room_slug):
+        return [tuple(json.loads(raw)) for raw in self.client.lrange(self._key(room_slug), 0, -1)]
+
+
+class LocalReplayBuffer(BaseReplayBuffer):
+    """
+    In-process stand-in for RedisReplayBuffer
+    Only suitable for tests and single-process deployments.
+    """
+
+    def __init__(self, size=200):
+        super().__init__(size=size)
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def append(self, room_slug, message_id, text):
+        with self._lock:
+            ring = self._rooms.get(room_slug)
+            if ring is None:
+                ring = self._rooms[room_slug] = deque(maxlen=self.size)
+            ring.append((str(message_id), text))
+
+    def entries(self, room_slug):
+        with self._lock:
+            return list(self._rooms.get(room_slug, ()))
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_replay_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_REPLAY', {})}
+
+
+def get_replay_buffer():
+    """Return the process-wide replay buffer configured in CHAT_REPLAY"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_replay_config()
+                _buffer = import_string(config['BACKEND'])(**config['OPTIONS'])
+    return _buffer
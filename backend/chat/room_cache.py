@@ -0,0 +1,60 @@
+"""
+Per-process room resolution cache
+Maps slug -> (room id, is_active) so the WebSocket hot path needs no Room query
+"""
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .local_cache import MISSING, LocalCache, invalidate
+from .models import Room
+
+DEFAULTS = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+    'MISS_TTL': 30,
+}
+
+CACHE_NAME = 'rooms'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_ROOM_CACHE', {})}
+
+
+_config = get_config()
+room_cache = LocalCache(CACHE_NAME, maxsize=_config['MAX_SIZE'], ttl=_config['TTL'])
+
+
+def resolve_room(slug):
+    """
+    Return (room_id, is_active) for a slug, or None if no such room exists
+
+    Unknown slugs are cached too, for MISS_TTL seconds.
+    """
+    entry = room_cache.get(slug)
+    if entry is not MISSING:
+        return entry
+    row = Room.objects.filter(slug=slug).values_list('id', 'is_active').first()
+    if row is None:
+        room_cache.set(slug, None, ttl=get_config()['MISS_TTL'])
+        return None
+    entry = (row[0], row[1])
+    room_cache.set(slug, entry)
+    return entry
+
+
+async def aresolve_room(slug):
+    """Async resolve_room; only hops to a worker thread on a cache miss"""
+    entry = room_cache.get(slug)
+    if entry is not MISSING:
+        return entry
+    return await database_sync_to_async(resolve_room)(slug)
+
+
+def get_active_room_id(slug):
+    entry = resolve_room(slug)
+    return entry[0] if entry and entry[1] else None
+
+
+def invalidate_room(slug):
+    invalidate(CACHE_NAME, slug)
@@ -0,0 +1,68 @@
+"""
+Denormalized room statistics
+Room.message_count and Room.last_message_at, kept in step with message writes
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Message, Room
+
+DEFAULTS = {
+    # Serve COUNT(*) per room instead of the stored counter, e.g. to verify it
+    'LIVE_COUNT': False,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_ROOM_STATS', {})}
+
+
+def record_created(messages):
+    """Count new messages against their rooms; one UPDATE per room"""
+    per_room = defaultdict(lambda: [0, None])
+    for message in messages:
+        stats = per_room[message.room_id]
+        stats[0] += 1
+        if stats[1] is None or message.created_at > stats[1]:
+            stats[1] = message.created_at
+    for room_id, (count, last_at) in per_room.items():
+        Room.objects.filter(pk=room_id).update(
+            message_count=F('message_count') + count,
+            last_message_at=Greatest(Coalesce('last_message_at', Value(last_at)), Value(last_at)),
+        )
+
+
+def record_deleted(room_counts):
+    """
+    Uncount deleted messages, given {room id: count}; one UPDATE per room
+
+    The newest timestamp is re-read from the (room, created_at) index.
+    """
+    newest = Message.objects.filter(room_id=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    for room_id, count in room_counts.items():
+        Room.objects.filter(pk=room_id).update(
+            message_count=Greatest(F('message_count') - count, Value(0)),
+            last_message_at=Subquery(newest),
+        )
+
+
+def reconcile(rooms=None, dry_run=False):
+    """
+    Recompute the stored statistics from the messages table
+
+    Returns:
+        list: (room, stored count, actual count) for every room that drifted
+    """
+    rooms = Room.objects.all() if rooms is None else rooms
+    drifted = []
+    for room in rooms.only('id', 'slug', 'message_count', 'last_message_at').iterator():
+        actual = Message.objects.filter(room_id=room.pk).aggregate(count=Count('pk'), last_at=Max('created_at'))
+        if (room.message_count, room.last_message_at) == (actual['count'], actual['last_at']):
+            continue
+        drifted.append((room, room.message_count, actual['count']))
+        if not dry_run:
+            Room.objects.filter(pk=room.pk).update(message_count=actual['count'], last_message_at=actual['last_at'])
+    return drifted
@@ -1,5 +1,8 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import Room, Message
 
 
@@ -48,6 +51,95 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'is_edited']
 
 
+# values_list() lookups for serialize_message_rows, in unpacking order
+MESSAGE_ROW_FIELDS = (
+    'id', 'room_id', 'user_id', 'user__username', 'user__email', 'user__date_joined',
+    'content', 'created_at', 'updated_at', 'is_edited',
+)
+
+
+def _datetime_formatter():
+    """DateTimeField.to_representation with its per-value setup hoisted out"""
+    if not settings.USE_TZ or (api_settings.DATETIME_FORMAT or '').lower() != ISO_8601:
+        return serializers.DateTimeField().to_representation
+    tz = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if not value:
+            return None
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return format_datetime
+
+
+def serialize_message_rows(rows):
+    """
+    MessageSerializer output for MESSAGE_ROW_FIELDS rows, as plain dicts
+
+    Same keys, order and values as MessageSerializer(many=True).data
+    (room stays a UUID, as PrimaryKeyRelatedField returns it), without
+    model instances or per-field DRF dispatch.
+    """
+    format_datetime = _datetime_formatter()
+    return [
+        {
+            'id': str(message_id),
+            'room': room_id,
+            'user': {
+                'id': user_id,
+                'username': username,
+                'email': email,
+                'date_joined': format_datetime(date_joined),
+            },
+            'username': username,
+            'content': content,
+            'created_at': format_datetime(created_at),
+            'updated_at': format_datetime(updated_at),
+            'is_edited': is_edited,
+        }
+        for (message_id, room_id, user_id, username, email, date_joined,
+             content, created_at, updated_at, is_edited) in rows
+    ]
+
+
+def serialize_message(message):
+    """serialize_message_rows for one saved Message (its user must be loaded)"""
+    user = message.user
+    return serialize_message_rows([(
+        message.id, message.room_id, user.id, user.username, user.email, user.date_joined,
+        message.content, message.created_at, message.updated_at, message.is_edited,
+    )])[0]
+
+
+# ?shape=compact on history endpoints ("format" is DRF's renderer override)
+COMPACT_SHAPE = 'compact'
+
+
+def compact_messages(messages):
+    """
+    Normalize serialized messages for the compact shape
+
+    Returns:
+        tuple: (messages referencing user_id, {str(user id): user} with each author once)
+    """
+    users = {}
+    compact = []
+    for message in messages:
+        user = message['user']
+        users.setdefault(str(user['id']), user)
+        compact.append({
+            'id': message['id'],
+            'room': message['room'],
+            'user_id': user['id'],
+            'content': message['content'],
+            'created_at': message['created_at'],
+            'updated_at': message['updated_at'],
+            'is_edited': message['is_edited'],
+        })
+    return compact, users
+
+
 class MessageCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
@@ -63,12 +155,19 @@ class MessageCreateSerializer(serializers.ModelSerializer):
 
 class RoomSerializer(serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
-    message_count = serializers.IntegerField(read_only=True)
+    message_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Room
-        fields = ['id', 'name', 'slug', 'description', 'created_by', 'created_at', 'updated_at', 'is_active', 'message_count']
-        read_only_fields = ['id', 'slug', 'created_by', 'created_at', 'updated_at']
+        fields = [
+            'id', 'name', 'slug', 'description', 'created_by', 'created_at', 'updated_at', 'is_active',
+            'message_count', 'last_message_at',
+        ]
+        read_only_fields = ['id', 'slug', 'created_by', 'created_at', 'updated_at', 'last_message_at']
+    
+    def get_message_count(self, room):
+        # Annotated by RoomViewSet when CHAT_ROOM_STATS['LIVE_COUNT'] is on
+        return getattr(room, 'live_message_count', room.message_count)
 
 
 class RoomCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,128 @@
+"""
+Model signal handlers
+Keep process-local and shared caches in step with the database
+"""
+import logging
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import history_cache, room_stats, versions
+from .middleware import invalidate_cached_user
+from .models import Message, Room, messages_deleted
+from .room_cache import invalidate_room
+from .serializers import serialize_message
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Room)
+def collect_previous_room_slug(sender, instance, update_fields=None, **kwargs):
+    """A rename must drop the old slug's cache entry too; note what it was"""
+    instance._previous_slug = None
+    if instance._state.adding or (update_fields is not None and 'slug' not in update_fields):
+        return
+    instance._previous_slug = Room.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_cached_room(sender, instance, **kwargs):
+    """Rooms are cached by slug in every worker; drop the entry on any change"""
+    invalidate_room(instance.slug)
+    previous_slug = getattr(instance, '_previous_slug', None)
+    if previous_slug and previous_slug != instance.slug:
+        invalidate_room(previous_slug)
+    transaction.on_commit(partial(_bump_versions, instance.pk))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_ws_user(sender, instance, **kwargs):
+    """WebSocket auth caches users per worker; drop the entry on any change"""
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def bump_rooms_for_user(sender, instance, update_fields=None, **kwargs):
+    """The room list nests each room's creator, so user edits change it too"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(_bump_rooms)
+
+
+def _bump_versions(room_id):
+    # After commit, so a stamp never describes data readers can't see yet
+    try:
+        versions.bump_room(room_id)
+    except Exception as e:
+        logger.warning(f"Version stamp update failed for room {room_id}: {e}")
+
+
+def _bump_rooms():
+    try:
+        versions.bump_rooms()
+    except Exception as e:
+        logger.warning(f"Rooms version stamp update failed: {e}")
+
+
+def _update_history_cache(room_id, data=None):
+    try:
+        if data is not None:
+            history_cache.append_message(room_id, data)
+        else:
+            history_cache.invalidate(room_id)
+    except Exception as e:
+        logger.warning(f"History cache update failed for room {room_id}: {e}")
+    _bump_versions(room_id)
+
+
+@receiver(post_save, sender=Message)
+def count_created_message(sender, instance, created, raw=False, **kwargs):
+    """Message.save is atomic, so the counter can't drift on rollback"""
+    if created and not raw:
+        room_stats.record_created([instance])
+
+
+@receiver(messages_deleted, sender=Message)
+def count_deleted_messages(sender, room_counts, **kwargs):
+    room_stats.record_deleted(room_counts)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def collect_deleted_user_messages(sender, instance, **kwargs):
+    """A user's messages go by fast cascade, unseen; note how many each room loses"""
+    instance._message_room_counts = dict(
+        Message.objects.filter(user=instance).order_by().values_list('room_id').annotate(count=Count('pk'))
+    )
+
+
+@receiver(post_delete, sender=get_user_model())
+def count_deleted_user_messages(sender, instance, **kwargs):
+    room_counts = getattr(instance, '_message_room_counts', None)
+    if room_counts:
+        messages_deleted.send(sender=Message, room_counts=room_counts)
+
+
+@receiver(post_save, sender=Message)
+def update_history_cache(sender, instance, created, **kwargs):
+    """New messages extend the room's cached page; edits make it stale"""
+    data = serialize_message(instance) if created else None
+    transaction.on_commit(partial(_update_history_cache, instance.room_id, data))
+
+
+@receiver(messages_deleted, sender=Message)
+def invalidate_history_cache(sender, room_counts, **kwargs):
+    """Once per room, however many of its messages went"""
+    for room_id in room_counts:
+        transaction.on_commit(partial(_update_history_cache, room_id))
+
+
+@receiver(post_delete, sender=Room)
+def forget_room_history(sender, instance, **kwargs):
+    # The room's messages went by fast cascade, without messages_deleted
+    transaction.on_commit(partial(_update_history_cache, instance.pk))
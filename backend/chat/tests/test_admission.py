@@ -0,0 +1,160 @@
+"""Tests for WebSocket admission control."""
+import pytest
+
+from chat.admission import AdmissionController
+
+
+@pytest.fixture
+def admission_settings(settings):
+    settings.CHAT_ADMISSION = {'MAX_CONNECTIONS': 2, 'MAX_CONCURRENT_HANDSHAKES': 1, 'READY_LOAD': 0.5}
+    return settings
+
+
+def test_controller_caps_handshakes_and_connections(admission_settings):
+    """Handshakes past the concurrency cap and connections past the process cap are refused."""
+    controller = AdmissionController()
+    assert controller.begin_handshake() is None
+    assert controller.begin_handshake() == 'handshakes'
+    controller.connection_opened()
+    controller.end_handshake()
+
+    assert controller.begin_handshake() is None
+    controller.connection_opened()
+    controller.end_handshake()
+    assert controller.load() == 1.0
+    assert controller.begin_handshake() == 'connections'
+
+    controller.connection_closed()
+    assert controller.begin_handshake() is None
+
+
+@pytest.mark.django_db
+def test_readiness_reports_websocket_load(admission_settings, client):
+    """The readiness probe fails once the worker passes READY_LOAD."""
+    from chat.admission import admission
+
+    assert client.get('/api/health/ready/').status_code == 200
+    admission.connection_opened()
+    try:
+        response = client.get('/api/health/ready/')
+        assert response.status_code == 503
+        assert response.json()['checks']['websockets']['connections'] >= 1
+    finally:
+        admission.connection_closed()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_websocket_refused_over_capacity(admission_settings):
+    """A full worker tells the client when to retry and closes with 4013."""
+    from asgiref.sync import sync_to_async
+    from channels.testing import WebsocketCommunicator
+    from django.contrib.auth import get_user_model
+
+    from chat.admission import admission
+    from chat.consumers import ChatConsumer
+    from chat.models import Room
+
+    user = await sync_to_async(get_user_model().objects.create_user)(username="latecomer", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Full", slug="full", created_by=user)
+    admission.connections += 2
+    try:
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), "/ws/chat/full/")
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {"kwargs": {"room_slug": "full"}}
+        connected, _ = await communicator.connect()
+        assert connected
+        assert await communicator.receive_json_from() == {'type': 'retry', 'reason': 'connections', 'retry_after': 5}
+        assert await communicator.receive_output() == {"type": "websocket.close", "code": 4013}
+        await communicator.disconnect()
+    finally:
+        admission.connections -= 2
+    assert admission.connections == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_drain_closes_connections_in_waves(settings):
+    """A drain refuses new sockets and sends every open one a reconnect hint before closing with 4012."""
+    from asgiref.sync import sync_to_async
+    from channels.testing import WebsocketCommunicator
+    from django.contrib.auth import get_user_model
+
+    from chat.admission import admission
+    from chat.consumers import ChatConsumer
+    from chat.drain import coordinator
+    from chat.models import Room
+
+    settings.CHAT_DRAIN = {'WAVES': 2, 'WAVE_INTERVAL': 0, 'BACKOFF_MIN': 2, 'BACKOFF_MAX': 4}
+    user = await sync_to_async(get_user_model().objects.create_user)(username="drained", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Drain", slug="drain", created_by=user)
+
+    def communicator():
+        instance = WebsocketCommunicator(ChatConsumer.as_asgi(), "/ws/chat/drain/")
+        instance.scope["user"] = user
+        instance.scope["url_route"] = {"kwargs": {"room_slug": "drain"}}
+        return instance
+
+    clients = [communicator() for _ in range(3)]
+    for client in clients:
+        assert (await client.connect())[0]
+    try:
+        await coordinator.start()
+        assert coordinator.status() == {'draining': True, 'remaining': 0, 'done': True}
+        for client in clients:
+            frame = None
+            while frame is None or frame['type'] != 'reconnect':
+                frame = await client.receive_json_from()
+            assert 2 <= frame['retry_after'] <= 4
+            assert await client.receive_output() == {"type": "websocket.close", "code": 4012}
+            await client.disconnect()
+
+        late = communicator()
+        await late.connect()
+        assert (await late.receive_json_from())['reason'] == 'draining'
+        await late.disconnect()
+    finally:
+        admission.draining = False
+    assert admission.connections == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_drain_waits_for_an_in_flight_join(monkeypatch, settings, ws_connect):
+    """A drain signalled mid-subscribe is handled once the join finishes, not inside it."""
+    import asyncio
+
+    from asgiref.sync import sync_to_async
+    from django.contrib.auth import get_user_model
+
+    from chat.admission import admission
+    from chat.consumers import BaseChatConsumer
+    from chat.drain import coordinator
+    from chat.models import Room
+
+    settings.CHAT_DRAIN = {'WAVES': 1, 'BACKOFF_MIN': 2, 'BACKOFF_MAX': 2}
+    user = await sync_to_async(get_user_model().objects.create_user)(username="drain_join", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Drain join", slug="drain-join", created_by=user)
+    resuming, resume = asyncio.Event(), asyncio.Event()
+
+    async def slow_resume(self, room_slug, since, shape=None):
+        resuming.set()
+        await resume.wait()
+
+    monkeypatch.setattr(BaseChatConsumer, "resume_room", slow_resume)
+    communicator = await ws_connect(user)
+    await communicator.send_json_to({"type": "subscribe", "room": "drain-join", "since": "0"})
+    await asyncio.wait_for(resuming.wait(), 1)
+    try:
+        await coordinator.start()
+        resume.set()
+        frames = []
+        while not frames or frames[-1]['type'] != 'reconnect':
+            frames.append(await communicator.receive_json_from())
+        assert [frame['type'] for frame in frames] == [
+            'subscribed', 'presence_snapshot', 'user_joined', 'reconnect'
+        ]
+        assert await communicator.receive_output() == {"type": "websocket.close", "code": 4012}
+        await communicator.disconnect()
+    finally:
+        admission.draining = False
@@ -0,0 +1,109 @@
+"""Tests for the channel layer extensions.
+
+The ring and copy-counting tests need no Redis. The end-to-end tests run
+against real servers when REDIS_SHARD_TEST_URLS lists them, e.g.
+
+    redis-server --port 6380 & redis-server --port 6381 &
+    REDIS_SHARD_TEST_URLS=redis://localhost:6380,redis://localhost:6381 pytest chat/tests/test_channel_layers.py
+"""
+import asyncio
+import os
+
+import pytest
+
+from chat.channel_layers import (
+    ConsistentHashRing,
+    InstrumentedRedisChannelLayer,
+    NodeLocalChannelLayer,
+    ShardedRedisChannelLayer,
+    copies_histogram,
+    members_histogram,
+)
+
+KEYS = [f"chat_room-{i}" for i in range(5000)]
+TEST_URLS = [url for url in os.environ.get('REDIS_SHARD_TEST_URLS', '').split(',') if url]
+
+
+def test_ring_spreads_groups_evenly():
+    """Every host gets a fair share of room groups."""
+    ring = ConsistentHashRing(['redis://a', 'redis://b', 'redis://c', 'redis://d'])
+    counts = [0] * 4
+    for key in KEYS:
+        counts[ring.get_index(key)] += 1
+    assert min(counts) > len(KEYS) / 4 * 0.75
+
+
+def test_adding_a_host_only_moves_its_share():
+    """Growing from 3 to 4 hosts moves roughly a quarter of the groups, all to the new host."""
+    before = ConsistentHashRing(['redis://a', 'redis://b', 'redis://c'])
+    after = ConsistentHashRing(['redis://a', 'redis://b', 'redis://c', 'redis://d'])
+    moved = [key for key in KEYS if before.get_index(key) != after.get_index(key)]
+    assert all(after.get_index(key) == 3 for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_placement_ignores_host_order():
+    """Reordering the host list doesn't move any group."""
+    layer = ShardedRedisChannelLayer(hosts=['redis://a:6379', 'redis://b:6379'])
+    swapped = ShardedRedisChannelLayer(hosts=['redis://b:6379', 'redis://a:6379'])
+    for key in KEYS[:500]:
+        assert layer.hosts[layer.consistent_hash(key)] == swapped.hosts[swapped.consistent_hash(key)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    len(TEST_URLS) < 2, reason='set REDIS_SHARD_TEST_URLS to two or more redis-server URLs'
+)
+async def test_group_send_across_shards():
+    """Groups hashed to different hosts all reach their members."""
+    layer = ShardedRedisChannelLayer(hosts=TEST_URLS)
+    try:
+        groups = [f"chat_shard-{i}" for i in range(20)]
+        assert len({layer.consistent_hash(group) for group in groups}) > 1
+        channel = await layer.new_channel()
+        for group in groups:
+            await layer.group_add(group, channel)
+        for group in groups:
+            await layer.group_send(group, {'type': 'chat.message', 'group': group})
+        received = [await asyncio.wait_for(layer.receive(channel), timeout=2) for _ in groups]
+        assert sorted(message['group'] for message in received) == sorted(groups)
+    finally:
+        await layer.flush()
+
+
+def test_core_layer_counts_one_copy_per_process():
+    """Members on the same process share a copy; the metrics record both numbers."""
+    layer = InstrumentedRedisChannelLayer(hosts=['redis://localhost:6379'])
+    copies_before = copies_histogram.total(mode='core')
+    members_before = members_histogram.total(mode='core')
+
+    channels = [f"specific.proc-a!{i}" for i in range(500)] + ["specific.proc-b!1"]
+    _, messages, _ = layer._map_channel_keys_to_connection(channels, {'type': 'chat.message'})
+
+    assert len(messages) == 2
+    assert copies_histogram.total(mode='core') - copies_before == 2
+    assert members_histogram.total(mode='core') - members_before == 501
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not TEST_URLS, reason='set REDIS_SHARD_TEST_URLS to a redis-server URL')
+async def test_node_local_layer_sends_one_copy_per_process():
+    """Two "processes" with many members each receive one published copy apiece."""
+    processes = [NodeLocalChannelLayer(hosts=TEST_URLS[:1]) for _ in range(2)]
+    copies_before = copies_histogram.total(mode='node_local')
+    try:
+        channels = []
+        for layer in processes:
+            for _ in range(3):
+                channel = await layer.new_channel()
+                await layer.group_add('chat_node-local', channel)
+                channels.append((layer, channel))
+
+        await processes[0].group_send('chat_node-local', {'type': 'chat.message', 'text': 'hi'})
+        for layer, channel in channels:
+            message = await asyncio.wait_for(layer.receive(channel), timeout=2)
+            assert message['text'] == 'hi'
+        assert copies_histogram.total(mode='node_local') - copies_before == 2
+    finally:
+        for layer in processes:
+            await layer.flush()
@@ -0,0 +1,68 @@
+"""Tests for ETag handling on room and history endpoints."""
+import time
+
+import pytest
+from django.utils.http import http_date
+
+from chat.models import Message
+
+
+@pytest.mark.django_db(transaction=True)
+def test_unchanged_history_is_not_modified(room_client, django_assert_num_queries):
+    """A matching If-None-Match gets a 304 without any query; a new message changes the tag."""
+    client, user, room = room_client
+    url = f'/api/rooms/{room.slug}/messages/'
+    Message.objects.create(room=room, user=user, content='first')
+    first = client.get(url)
+    etag = first['ETag']
+
+    with django_assert_num_queries(0):
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(f'{url}?page_size=1', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    client.post('/api/messages/', {'content': 'second', 'room_slug': room.slug}, format='json')
+    changed = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert changed.status_code == 200
+    assert changed['ETag'] != etag
+    assert len(changed.json()['results']) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_room_list_tag_follows_rooms_and_messages(room_client, django_assert_num_queries):
+    """The room list is revalidated after room edits and after messages change its counts."""
+    client, user, room = room_client
+    etag = client.get('/api/rooms/')['ETag']
+    with django_assert_num_queries(0):
+        assert client.get('/api/rooms/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    Message.objects.create(room=room, user=user, content='counted')
+    response = client.get('/api/rooms/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()[0]['message_count'] == 1
+
+    etag = response['ETag']
+    room.description = 'changed'
+    room.save()
+    assert client.get('/api/rooms/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+    etag = client.get('/api/rooms/')['ETag']
+    user.username = 'renamed_owner'
+    user.save()
+    response = client.get('/api/rooms/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()[0]['created_by']['username'] == 'renamed_owner'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_same_second_write_is_not_answered_not_modified(room_client):
+    """If-Modified-Since has one-second resolution, so it never short-circuits a poll."""
+    client, user, room = room_client
+    url = f'/api/rooms/{room.slug}/messages/'
+    first = client.get(url)
+    assert 'Last-Modified' not in first
+
+    Message.objects.create(room=room, user=user, content='same second')
+    polled = client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1))
+    assert polled.status_code == 200
+    assert [message['content'] for message in polled.json()['results']] == ['same second']
@@ -0,0 +1,72 @@
+"""Tests for the NDJSON history export."""
+import gzip
+import json
+import warnings
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import Message
+
+
+@pytest.fixture
+def export_client(room_client):
+    client, user, room = room_client
+    for i in range(7):
+        Message.objects.create(room=room, user=user, content=f"line {i}")
+    return room_client
+
+
+def _contents(ndjson):
+    return [json.loads(line)['content'] for line in ndjson.decode('utf8').splitlines()]
+
+
+@pytest.mark.django_db
+def test_export_streams_every_message_in_order(export_client, settings):
+    """Chunks smaller than the room still produce one line per message, oldest first."""
+    settings.CHAT_EXPORT = {'CHUNK_SIZE': 3}
+    client, user, room = export_client
+    response = client.get(f'/api/rooms/{room.slug}/export/')
+    assert response.streaming
+    assert response['Content-Type'] == 'application/x-ndjson'
+    body = b''.join(response.streaming_content)
+    assert _contents(body) == [f"line {i}" for i in range(7)]
+    assert json.loads(body.splitlines()[0])['user']['username'] == user.username
+
+    compressed = client.get(f'/api/rooms/{room.slug}/export/?compress=gzip')
+    assert compressed['Content-Disposition'] == f'attachment; filename="{room.slug}.ndjson.gz"'
+    assert gzip.decompress(b''.join(compressed.streaming_content)) == body
+
+    assert client.get('/api/rooms/missing/export/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_export_command_writes_gzip_file(export_client, tmp_path):
+    """The management command writes the same NDJSON, compressed on request."""
+    client, user, room = export_client
+    output = tmp_path / 'archive.ndjson.gz'
+    call_command('export_room', room.slug, '--gzip', '--chunk-size', '2', '--output', str(output))
+    assert _contents(gzip.decompress(output.read_bytes())) == [f"line {i}" for i in range(7)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_export_streams_asynchronously_under_asgi(export_client, settings):
+    """Under ASGI the export is served chunk by chunk, not listed into memory first."""
+    settings.CHAT_EXPORT = {'CHUNK_SIZE': 3}
+    client, user, room = export_client
+    token = await sync_to_async(lambda: str(AccessToken.for_user(user)))()
+    response = await AsyncClient().get(
+        f'/api/rooms/{room.slug}/export/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 200
+    assert response.is_async
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        blocks = [block async for block in response]
+    assert len(blocks) == 3
+    assert _contents(b''.join(blocks)) == [f"line {i}" for i in range(7)]
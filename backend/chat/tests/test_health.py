@@ -64,7 +64,54 @@ def test_metrics_endpoint_counts_objects(client, django_user_model):
 
     response = health_module.metrics(RequestFactory().get('/metrics'))
     assert response.status_code == 200
-    text = response.content.decode()
-    assert 'relaydesk_users_total' in text
-    assert 'relaydesk_rooms_total' in text
-    assert 'relaydesk_messages_total' in text
+    lines = response.content.decode().splitlines()
+    assert 'relaydesk_users_total 1' in lines
+    assert 'relaydesk_rooms_total 1' in lines
+    assert 'relaydesk_messages_total 1' in lines
+
+
+@pytest.mark.django_db
+def test_metrics_scrapes_require_token_or_allowed_ip(settings):
+    """A configured token is required; without one only allowed addresses may scrape."""
+    rf = RequestFactory()
+    assert health_module.metrics(rf.get('/metrics', REMOTE_ADDR='10.1.2.3')).status_code == 403
+
+    settings.CHAT_METRICS = {'TOKEN': 's3cret'}
+    assert health_module.metrics(rf.get('/metrics')).status_code == 403
+    assert health_module.metrics(rf.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong')).status_code == 403
+    response = health_module.metrics(rf.get('/metrics', REMOTE_ADDR='10.1.2.3', HTTP_AUTHORIZATION='Bearer s3cret'))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_includes_registry(client):
+    """In-process registry metrics are appended to the metrics output."""
+    from chat.metrics import registry
+
+    registry.counter('relaydesk_test_events_total', 'Test counter').inc(3, kind='probe')
+    registry.histogram('relaydesk_test_seconds', 'Test histogram', buckets=(0.1, 1.0)).observe(0.5)
+
+    response = client.get('/api/metrics/')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/plain; version=0.0.4; charset=utf-8'
+    lines = response.content.decode().splitlines()
+    assert '# TYPE relaydesk_test_events_total counter' in lines
+    assert 'relaydesk_test_events_total{kind="probe"} 3' in lines
+    assert 'relaydesk_test_seconds_bucket{le="1.0"} 1' in lines
+    assert 'relaydesk_test_seconds_count 1' in lines
+
+
+def test_histogram_quantiles_are_rendered():
+    """Histograms built with quantiles export interpolated estimates alongside the buckets."""
+    from chat.metrics import Histogram
+
+    histogram = Histogram('relaydesk_test_quantile_seconds', 'Test quantiles', buckets=(1.0, 2.0, 4.0), quantiles=(0.5, 0.99))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value, stage='probe')
+
+    assert histogram.quantile(0.5, stage='probe') == 1.5
+    assert 2.0 < histogram.quantile(0.99, stage='probe') <= 4.0
+    assert histogram.quantile(0.5, stage='other') is None
+    lines = histogram.render()
+    assert '# TYPE relaydesk_test_quantile_seconds_quantiles gauge' in lines
+    assert 'relaydesk_test_quantile_seconds_quantiles{stage="probe",quantile="0.5"} 1.5' in lines
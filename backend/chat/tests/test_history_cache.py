@@ -0,0 +1,87 @@
+"""Tests for the hot history cache."""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from chat import history_cache
+from chat.models import Message
+
+
+@pytest.mark.django_db(transaction=True)
+def test_room_messages_served_from_cache_after_first_read(room_client, django_assert_num_queries):
+    """Writes extend the cached page, so later reads need no message query."""
+    client, user, room = room_client
+    Message.objects.create(room=room, user=user, content='first')
+    first = client.get(f'/api/rooms/{room.slug}/messages/')
+    assert [m['content'] for m in first.json()['results']] == ['first']
+
+    client.post('/api/messages/', {'content': 'second', 'room_slug': room.slug}, format='json')
+    with django_assert_num_queries(0):
+        cached = client.get(f'/api/rooms/{room.slug}/messages/')
+    assert [m['content'] for m in cached.json()['results']] == ['first', 'second']
+    assert cached.json()['results'][1]['user']['username'] == user.username
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stale_or_overflowing_pages_fall_back_to_database(room_client, settings):
+    """Edits invalidate the page; pages larger than SIZE, or older than it holds, come from the database."""
+    client, user, room = room_client
+    settings.CHAT_HISTORY_CACHE = {**settings.CHAT_HISTORY_CACHE, 'SIZE': 2}
+    url = f'/api/rooms/{room.slug}/messages/?page_size=2'
+    message = Message.objects.create(room=room, user=user, content='one')
+    client.get(url)
+    assert history_cache.get_latest(room.id)['complete']
+
+    message.content = 'edited'
+    message.save()
+    assert history_cache.get_latest(room.id) is None
+    assert client.get(url).json()['results'][0]['content'] == 'edited'
+
+    Message.objects.create(room=room, user=user, content='two')
+    Message.objects.create(room=room, user=user, content='three')
+    page = history_cache.get_latest(room.id)
+    assert [m['content'] for m in page['messages']] == ['two', 'three']
+    assert not page['complete']
+    cached = client.get(url).json()
+    assert [m['content'] for m in cached['results']] == ['two', 'three']
+    assert [m['content'] for m in client.get(cached['previous']).json()['results']] == ['edited']
+    response = client.get(f'/api/rooms/{room.slug}/messages/?page_size=3')
+    assert [m['content'] for m in response.json()['results']] == ['edited', 'two', 'three']
+
+
+@pytest.mark.django_db
+def test_late_commits_are_placed_in_created_at_order(room_client, settings):
+    """A message committed after a newer one still lands where the history query puts it."""
+    from datetime import timedelta
+
+    from chat.serializers import serialize_message
+
+    client, user, room = room_client
+    settings.CHAT_HISTORY_CACHE = {**settings.CHAT_HISTORY_CACHE, 'SIZE': 3}
+    messages = [Message.objects.create(room=room, user=user, content=f'm{i}') for i in range(2)]
+    history_cache.store_latest(room.id, [serialize_message(m) for m in messages], history_cache.current_generation(room.id))
+
+    late = Message(room=room, user=user, content='late', created_at=messages[0].created_at + timedelta(microseconds=1))
+    history_cache.append_message(room.id, serialize_message(late))
+    assert [m['content'] for m in history_cache.get_latest(room.id)['messages']] == ['m0', 'late', 'm1']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleting_a_room_cascades_fast_and_drops_its_page_once(room_client, monkeypatch):
+    """Room deletes don't load their messages; the cached page is invalidated once."""
+    client, user, room = room_client
+    for i in range(5):
+        Message.objects.create(room=room, user=user, content=f'm{i}')
+    client.get(f'/api/rooms/{room.slug}/messages/')
+    assert history_cache.get_latest(room.id) is not None
+
+    invalidated = []
+    invalidate = history_cache.invalidate
+    monkeypatch.setattr(history_cache, 'invalidate', lambda room_id: invalidated.append(room_id) or invalidate(room_id))
+    room_id = room.id
+    with CaptureQueriesContext(connection) as queries:
+        room.delete()
+    message_queries = [q['sql'] for q in queries.captured_queries if '"chat_message"' in q['sql']]
+    assert len(message_queries) == 1 and message_queries[0].startswith('DELETE')
+    assert invalidated == [room_id]
+    assert history_cache.get_latest(room_id) is None
@@ -66,3 +66,51 @@ async def test_jwt_middleware_handles_missing_token(monkeypatch):
         return None
 
     await middleware(scope, fake_receive, fake_send)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_jwt_middleware_caches_verified_tokens_and_users(monkeypatch):
+    """A repeated handshake skips signature verification and the user query."""
+    from chat import middleware as middleware_module
+
+    user = await sync_to_async(get_user_model().objects.create_user)(
+        username="cached_user",
+        password="demoPass123",
+    )
+    token = str(AccessToken.for_user(user))
+    middleware = JwtAuthMiddleware(lambda *args: None)
+
+    first = await middleware.get_user_from_token(token)
+    assert first.username == "cached_user"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("should have been served from cache")
+
+    monkeypatch.setattr(middleware_module, "AccessToken", fail)
+    monkeypatch.setattr(middleware_module.User.objects, "filter", fail)
+    second = await middleware.get_user_from_token(token)
+    assert second.pk == user.pk
+    assert second is not first
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_user_change_invalidates_cached_user():
+    """Saving a user drops them from the WebSocket user cache."""
+    from chat.middleware import user_cache
+    from chat.local_cache import MISSING
+
+    user = await sync_to_async(get_user_model().objects.create_user)(
+        username="renamed_user",
+        password="demoPass123",
+    )
+    token = str(AccessToken.for_user(user))
+    middleware = JwtAuthMiddleware(lambda *args: None)
+    await middleware.get_user_from_token(token)
+    assert user_cache.get(user.pk) is not MISSING
+
+    user.username = "renamed_again"
+    await sync_to_async(user.save)()
+    assert user_cache.get(user.pk) is MISSING
+    assert (await middleware.get_user_from_token(token)).username == "renamed_again"
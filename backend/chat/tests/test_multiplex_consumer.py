@@ -0,0 +1,134 @@
+"""Tests for the multiplexed WebSocket endpoint."""
+import pytest
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+
+from chat.consumers import MultiplexChatConsumer
+from chat.models import Room
+
+
+async def _subscribe(communicator, slug):
+    await communicator.send_json_to({"type": "subscribe", "room": slug})
+    frames = [await communicator.receive_json_from() for _ in range(3)]
+    assert [frame["type"] for frame in frames] == ["subscribed", "presence_snapshot", "user_joined"]
+    assert all(frame["room"] == slug for frame in frames)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_one_connection_serves_many_rooms(ws_connect):
+    """Frames from every subscribed room arrive on one socket, tagged with their room."""
+    user = await sync_to_async(get_user_model().objects.create_user)(username="mux_user", password="pass123")
+    for slug in ("mux-a", "mux-b"):
+        await sync_to_async(Room.objects.create)(name=slug, slug=slug, created_by=user)
+
+    communicator = await ws_connect(user)
+    await _subscribe(communicator, "mux-a")
+    await _subscribe(communicator, "mux-b")
+
+    await communicator.send_json_to({"type": "chat_message", "room": "mux-b", "message": "to b"})
+    frame = await communicator.receive_json_from()
+    assert frame["type"] == "chat_message"
+    assert frame["room"] == "mux-b"
+    assert frame["message"]["content"] == "to b"
+
+    await communicator.send_json_to({"type": "unsubscribe", "room": "mux-a"})
+    assert await communicator.receive_json_from() == {"type": "unsubscribed", "room": "mux-a"}
+    await communicator.send_json_to({"type": "chat_message", "room": "mux-a", "message": "gone"})
+    error = await communicator.receive_json_from()
+    assert error == {"type": "error", "room": "mux-a", "message": "Not subscribed to room"}
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_subscribing_up_to_the_room_cap_is_not_throttled(settings, ws_connect):
+    """A client can subscribe to every room the connection allows in one burst."""
+    from chat.rate_limit import user_buckets
+
+    user_buckets.clear()
+    settings.CHAT_MULTIPLEX = {'MAX_ROOMS': 45}
+    user = await sync_to_async(get_user_model().objects.create_user)(username="mux_many", password="pass123")
+    slugs = [f"mux-many-{i}" for i in range(45)]
+    await sync_to_async(Room.objects.bulk_create)(
+        [Room(name=slug, slug=slug, created_by=user) for slug in slugs]
+    )
+
+    communicator = await ws_connect(user)
+    for slug in slugs:
+        await _subscribe(communicator, slug)
+    await communicator.send_json_to({"type": "subscribe", "room": "mux-one-too-many"})
+    assert await communicator.receive_json_from() == {
+        "type": "error", "room": "mux-one-too-many", "message": "Too many rooms on one connection"
+    }
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_room_access_is_checked_once_per_connection(monkeypatch, ws_connect):
+    """Unknown rooms are refused and the verdict is cached on the connection."""
+    user = await sync_to_async(get_user_model().objects.create_user)(username="mux_denied", password="pass123")
+    communicator = await ws_connect(user)
+    calls = []
+
+    async def counting_check(self, room_slug):
+        calls.append(room_slug)
+        return False
+
+    monkeypatch.setattr(MultiplexChatConsumer, "check_room_exists", counting_check)
+
+    for _ in range(2):
+        await communicator.send_json_to({"type": "subscribe", "room": "missing-room"})
+        assert await communicator.receive_json_from() == {
+            "type": "error", "room": "missing-room", "message": "Room not found"
+        }
+    assert calls == ["missing-room"]
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_failed_resume_does_not_hold_live_traffic(monkeypatch, ws_connect):
+    """A subscribe with since that fails before its replay leaves the socket delivering."""
+    from channels.layers import get_channel_layer
+
+    user = await sync_to_async(get_user_model().objects.create_user)(username="mux_held", password="pass123")
+    for slug in ("mux-broken", "mux-live"):
+        await sync_to_async(Room.objects.create)(name=slug, slug=slug, created_by=user)
+    layer_class = type(get_channel_layer())
+    group_add = layer_class.group_add
+
+    async def failing_group_add(self, group, channel):
+        if group == Room.group_name_for("mux-broken"):
+            raise ConnectionError("layer unavailable")
+        return await group_add(self, group, channel)
+
+    monkeypatch.setattr(layer_class, "group_add", failing_group_add)
+    communicator = await ws_connect(user)
+    await communicator.send_json_to({"type": "subscribe", "room": "mux-broken", "since": "m1"})
+    assert await communicator.receive_json_from() == {"type": "subscribed", "room": "mux-broken"}
+    assert await communicator.receive_json_from() == {
+        "type": "error", "room": "mux-broken", "message": "Failed to process message"
+    }
+
+    await _subscribe(communicator, "mux-live")
+    await communicator.send_json_to({"type": "chat_message", "room": "mux-live", "message": "still flowing"})
+    assert (await communicator.receive_json_from())["message"]["content"] == "still flowing"
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_non_object_frames_get_an_error(ws_connect):
+    """JSON arrays and scalars are refused with an error frame and the socket stays usable."""
+    user = await sync_to_async(get_user_model().objects.create_user)(username="mux_odd", password="pass123")
+    await sync_to_async(Room.objects.create)(name="mux-odd", slug="mux-odd", created_by=user)
+    communicator = await ws_connect(user)
+
+    for frame in ([1, 2], 42, "room"):
+        await communicator.send_json_to(frame)
+        assert await communicator.receive_json_from() == {"type": "error", "message": "Frame must be a JSON object"}
+
+    await _subscribe(communicator, "mux-odd")
+    await communicator.disconnect()
@@ -0,0 +1,96 @@
+"""Tests for per-connection outbound queues."""
+import asyncio
+
+import pytest
+
+from chat.outbound import PRIORITY_CHAT, PRIORITY_PRESENCE, PRIORITY_TYPING, OutboundQueue
+from chat.typing import merge_typing_events
+
+
+def _typing(started=(), stopped=()):
+    return {
+        'type': 'typing_indicator',
+        'room': 'lobby',
+        'started': [{'user_id': uid, 'username': f'u{uid}'} for uid in started],
+        'stopped': [{'user_id': uid, 'username': f'u{uid}'} for uid in stopped],
+        'text': 'typing',
+    }
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_typing_before_presence_and_chat():
+    """With no room left, the oldest least important frame makes way."""
+    delivered = []
+
+    async def deliver(event):
+        delivered.append(event['text'])
+
+    queue = OutboundQueue(deliver, max_size=3)
+    assert queue.put({'text': 'typing'}, PRIORITY_TYPING)
+    assert queue.put({'text': 'presence'}, PRIORITY_PRESENCE)
+    assert queue.put({'text': 'chat 1'}, PRIORITY_CHAT)
+    assert queue.put({'text': 'chat 2'}, PRIORITY_CHAT)
+    assert queue.put({'text': 'more typing'}, PRIORITY_TYPING)
+
+    queue.start()
+    await asyncio.sleep(0.01)
+    assert delivered == ['chat 1', 'chat 2', 'presence']
+    queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_typing_frames_coalesce_while_queued():
+    """Typing deltas for a room merge into the frame already waiting."""
+    queue = OutboundQueue(None, max_size=10)
+    key = ('typing', 'lobby')
+    queue.put(_typing(started=[1, 2]), PRIORITY_TYPING, key, merge_typing_events)
+    queue.put(_typing(started=[3], stopped=[1]), PRIORITY_TYPING, key, merge_typing_events)
+
+    assert queue.size == 1
+    merged = queue._pop().event
+    assert [user['user_id'] for user in merged['started']] == [2, 3]
+    assert merged['stopped'] == []
+
+
+@pytest.mark.asyncio
+async def test_lagging_consumer_is_flagged_for_eviction():
+    """A chat frame that cannot be queued, or a queue that stops draining, asks for eviction."""
+    unblock = asyncio.Event()
+
+    async def stuck(event):
+        await unblock.wait()
+
+    queue = OutboundQueue(stuck, max_size=2, max_lag=0.02)
+    queue.start()
+    assert queue.put({'text': 'chat 1'}, PRIORITY_CHAT)
+    await asyncio.sleep(0)
+    assert queue.put({'text': 'chat 2'}, PRIORITY_CHAT)
+    assert queue.put({'text': 'chat 3'}, PRIORITY_CHAT)
+    assert not queue.put({'text': 'chat 4'}, PRIORITY_CHAT)
+
+    await asyncio.sleep(0.03)
+    assert not queue.put({'text': 'typing'}, PRIORITY_TYPING)
+    queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_batchable_burst_is_delivered_as_one_batch():
+    """Batchable chat frames arriving within the delay go out together, in order."""
+    delivered, batches = [], []
+
+    async def deliver(event):
+        delivered.append(event['text'])
+
+    async def deliver_batch(events):
+        batches.append([event['text'] for event in events])
+
+    queue = OutboundQueue(deliver, deliver_batch=deliver_batch, batch_max_size=3, batch_max_delay=0.01)
+    queue.start()
+    for i in range(4):
+        queue.put({'text': f'chat {i}'}, PRIORITY_CHAT, batchable=True)
+    queue.put({'text': 'quiet'}, PRIORITY_CHAT)
+    await asyncio.sleep(0.05)
+
+    assert batches == [['chat 0', 'chat 1', 'chat 2']]
+    assert delivered == ['chat 3', 'quiet']
+    queue.stop()
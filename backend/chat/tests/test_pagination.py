@@ -0,0 +1,74 @@
+"""Tests for keyset pagination of message history."""
+import pytest
+from django.utils import timezone
+
+from chat.models import Message
+
+
+def _create_messages(room, user, count):
+    messages = [Message.objects.create(room=room, user=user, content=f"m{i}") for i in range(count)]
+    # Ties on created_at must be broken by id, not skipped or repeated
+    Message.objects.filter(pk__in=[m.pk for m in messages[2:5]]).update(created_at=timezone.now())
+    ordered = Message.objects.filter(room=room).order_by('created_at', 'id')
+    return [m.content for m in ordered]
+
+
+def _walk(client, url, link):
+    pages = []
+    while url:
+        data = client.get(url).json()
+        pages.append([m['content'] for m in data['results']])
+        url = data[link]
+    return pages
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cache_enabled', [True, False])
+def test_pages_walk_the_history_both_ways(room_client, settings, cache_enabled):
+    """Following previous from the newest page, then next from the oldest, visits every message once."""
+    settings.CHAT_HISTORY_CACHE = {**settings.CHAT_HISTORY_CACHE, 'ENABLED': cache_enabled}
+    client, user, room = room_client
+    expected = _create_messages(room, user, 8)
+
+    backwards = _walk(client, f'/api/rooms/{room.slug}/messages/?page_size=3', 'previous')
+    assert [len(page) for page in backwards] == [3, 3, 2]
+    assert [m for page in reversed(backwards) for m in page] == expected
+
+    oldest = client.get(f'/api/rooms/{room.slug}/messages/?page_size=3').json()
+    while oldest['previous']:
+        oldest = client.get(oldest['previous']).json()
+    forwards = _walk(client, oldest['next'], 'next')
+    assert [m for page in forwards for m in page] == expected[2:]
+
+
+@pytest.mark.django_db
+def test_message_list_is_paginated(room_client):
+    """The message list endpoint is bounded by the page size and rejects bad cursors."""
+    client, user, room = room_client
+    expected = _create_messages(room, user, 5)
+
+    data = client.get(f'/api/messages/?room_slug={room.slug}&page_size=2').json()
+    assert [m['content'] for m in data['results']] == expected[-2:]
+    assert data['next'] is None
+    assert client.get(data['previous']).json()['results'][0]['content'] == expected[1]
+    assert client.get('/api/messages/?before=not-a-cursor').status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cache_enabled', [True, False])
+def test_compact_shape_deduplicates_authors(room_client, django_user_model, settings, cache_enabled):
+    """?shape=compact pages reference user_id and carry each author once."""
+    settings.CHAT_HISTORY_CACHE = {**settings.CHAT_HISTORY_CACHE, 'ENABLED': cache_enabled}
+    client, user, room = room_client
+    other = django_user_model.objects.create_user('other_pager', password='pass12345')
+    for i in range(6):
+        Message.objects.create(room=room, user=(user, other)[i % 2], content=f"m{i}")
+
+    full = client.get(f'/api/rooms/{room.slug}/messages/?page_size=4').json()
+    compact = client.get(f'/api/rooms/{room.slug}/messages/?page_size=4&shape=compact').json()
+
+    assert set(compact['users']) == {str(user.id), str(other.id)}
+    assert compact['users'][str(other.id)] == next(m['user'] for m in full['results'] if m['user']['id'] == other.id)
+    assert [m['user_id'] for m in compact['results']] == [m['user']['id'] for m in full['results']]
+    assert 'user' not in compact['results'][0] and 'username' not in compact['results'][0]
+    assert 'shape=compact' in compact['previous']
@@ -0,0 +1,67 @@
+"""Tests for the presence store.
+
+The Redis store is exercised when REDIS_PRESENCE_TEST_URL names a
+redis-server database that may be written to, e.g. redis://localhost:6379/15
+"""
+import os
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from chat.presence import LocalPresenceStore, RedisPresenceStore
+
+REDIS_URL = os.environ.get('REDIS_PRESENCE_TEST_URL')
+
+
+alice = SimpleNamespace(id=1, username='alice')
+bob = SimpleNamespace(id=2, username='bob')
+
+
+def test_join_and_leave_track_user_transitions():
+    """Only the first connection brings a user online and the last takes them offline."""
+    store = LocalPresenceStore(ttl=60)
+
+    assert store.join('lobby', 'chan-a1', alice) == 1
+    assert store.join('lobby', 'chan-a2', alice) is None
+    assert store.join('lobby', 'chan-b1', bob) == 2
+    assert store.snapshot('lobby') == ([{'id': 1, 'username': 'alice'}, {'id': 2, 'username': 'bob'}], 2)
+
+    assert store.leave('lobby', 'chan-a1', alice) is None
+    assert store.leave('lobby', 'chan-a2', alice) == 3
+    assert store.leave('lobby', 'chan-a2', alice) is None
+    assert store.snapshot('lobby') == ([{'id': 2, 'username': 'bob'}], 3)
+
+
+def test_expired_connections_are_purged(monkeypatch):
+    """Connections that stop heartbeating drop out after the ttl."""
+    store = LocalPresenceStore(ttl=10)
+    clock = [1000.0]
+    monkeypatch.setattr('chat.presence.time.time', lambda: clock[0])
+
+    store.join('lobby', 'chan-a', alice)
+    store.join('lobby', 'chan-b', bob)
+
+    clock[0] += 8
+    store.heartbeat('lobby', 'chan-b', bob)
+
+    clock[0] += 5
+    # The purge bumps the version without a delta, so clients notice the gap and resync
+    assert store.snapshot('lobby') == ([{'id': 2, 'username': 'bob'}], 3)
+    assert store.join('lobby', 'chan-a', alice) == 4
+
+
+@pytest.mark.skipif(not REDIS_URL, reason='set REDIS_PRESENCE_TEST_URL to a redis-server URL')
+def test_redis_join_after_expiry_announces_the_user(monkeypatch):
+    """A join purges expired connections first, so a timed-out user comes back online."""
+    store = RedisPresenceStore(url=REDIS_URL, ttl=10, prefix=f'presence-test-{uuid.uuid4().hex}')
+    clock = [1000.0]
+    monkeypatch.setattr('chat.presence.time.time', lambda: clock[0])
+    try:
+        assert store.join('lobby', 'chan-a1', alice) == 1
+        clock[0] += 15
+        # The purge of chan-a1 bumps to 2, the rejoin to 3
+        assert store.join('lobby', 'chan-a2', alice) == 3
+        assert store.snapshot('lobby') == ([{'id': 1, 'username': 'alice'}], 3)
+    finally:
+        store.client.delete(*store._keys('lobby'))
@@ -1,4 +1,4 @@
-"""Tests for the RateLimitMiddleware behavior."""
+"""Tests for the HTTP RateLimitMiddleware and the per-frame-type WebSocket token buckets."""
 import pytest
 from django.test import RequestFactory
 from django.core.cache import cache
@@ -52,3 +52,120 @@ def test_get_client_id_falls_back_to_ip(rf):
     request.META['REMOTE_ADDR'] = '10.0.0.9'
     client_id = RateLimitMiddleware(lambda request: request).get_client_id(request)
     assert client_id == 'ip:10.0.0.9'
+
+
+def _ws_config(**overrides):
+    from chat.rate_limit import WS_RATE_LIMIT_DEFAULTS
+
+    return {
+        **WS_RATE_LIMIT_DEFAULTS,
+        'BUCKETS': {
+            'chat_message': {'connection': (0.001, 2), 'user': (0.001, 3)},
+            'default': {'connection': (100, 100), 'user': (100, 100)},
+        },
+        **overrides,
+    }
+
+
+def test_ws_limiter_enforces_connection_and_user_budgets():
+    """Each connection has its own burst; a user's connections share the user budget."""
+    from chat.rate_limit import ConnectionRateLimiter, user_buckets
+
+    user_buckets.clear()
+    first = ConnectionRateLimiter(1, _ws_config())
+    second = ConnectionRateLimiter(1, _ws_config())
+
+    assert first.allow('chat_message') == 0
+    assert first.allow('chat_message') == 0
+    assert first.allow('chat_message') > 0  # connection burst spent
+    assert first.allow('typing') == 0  # other frame types have their own buckets
+
+    assert second.allow('chat_message') == 0
+    assert second.allow('chat_message') > 0  # user burst spent across both connections
+
+
+def test_ws_user_bucket_outlives_cache_ttl(monkeypatch):
+    """A spent user bucket stays cached until it has refilled, so eviction never resets it."""
+    import time
+
+    from chat.rate_limit import ConnectionRateLimiter, user_buckets
+
+    user_buckets.clear()
+    clock = [time.monotonic()]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+    for _ in range(2):
+        limiter = ConnectionRateLimiter(3, _ws_config())
+        while limiter.allow('chat_message') == 0:
+            pass
+
+    clock[0] += user_buckets.ttl + 60
+    assert ConnectionRateLimiter(3, _ws_config()).allow('chat_message') > 0
+
+
+def test_ws_limiter_charges_subscriptions_to_the_control_bucket():
+    """subscribe and unsubscribe share the control budget instead of the default one."""
+    from chat.rate_limit import ConnectionRateLimiter, user_buckets
+
+    user_buckets.clear()
+    limiter = ConnectionRateLimiter(4, _ws_config(BUCKETS={
+        'control': {'connection': (0.001, 3), 'user': (0.001, 3)},
+        'default': {'connection': (0.001, 1), 'user': (0.001, 1)},
+    }))
+    assert [limiter.allow(t) for t in ('subscribe', 'unsubscribe', 'subscribe')] == [0, 0, 0]
+    assert limiter.allow('subscribe') > 0
+    assert limiter.allow('ping') == 0
+
+
+def test_ws_limiter_flags_sustained_abuse():
+    """Repeated violations inside the window mark the connection as abusive."""
+    from chat.rate_limit import ConnectionRateLimiter, user_buckets
+
+    user_buckets.clear()
+    limiter = ConnectionRateLimiter(2, _ws_config(MAX_VIOLATIONS=3))
+    results = [limiter.allow('chat_message') for _ in range(4)]
+    assert results[:2] == [0, 0]
+    assert not limiter.is_abusive()
+    limiter.allow('chat_message')
+    limiter.allow('chat_message')
+    assert limiter.is_abusive()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_websocket_throttles_then_closes_abusive_clients(settings):
+    """Over-budget frames get a throttled error; sustained abuse closes with 4029."""
+    from asgiref.sync import sync_to_async
+    from channels.testing import WebsocketCommunicator
+    from django.contrib.auth import get_user_model
+
+    from chat.consumers import ChatConsumer
+    from chat.models import Room
+    from chat.rate_limit import user_buckets
+
+    user_buckets.clear()
+    settings.CHAT_WS_RATE_LIMIT = _ws_config(MAX_VIOLATIONS=3)
+    user = await sync_to_async(get_user_model().objects.create_user)(username="flooder", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Flood", slug="flood", created_by=user)
+    communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), "/ws/chat/flood/")
+    communicator.scope["user"] = user
+    communicator.scope["url_route"] = {"kwargs": {"room_slug": "flood"}}
+    connected, _ = await communicator.connect()
+    assert connected
+    await communicator.receive_json_from()  # presence_snapshot
+    await communicator.receive_json_from()  # user_joined
+
+    for i in range(3):
+        await communicator.send_json_to({"type": "chat_message", "message": f"spam {i}", "client_id": str(i)})
+    # The error is sent inline, so it can overtake the queued echoes
+    frames = [await communicator.receive_json_from() for _ in range(3)]
+    assert sorted(frame["type"] for frame in frames) == ["chat_message", "chat_message", "error"]
+    error = next(frame for frame in frames if frame["type"] == "error")
+    assert error["code"] == "throttled"
+    assert error["client_id"] == "2"
+
+    await communicator.send_json_to({"type": "chat_message", "message": "more"})
+    assert (await communicator.receive_json_from())["code"] == "throttled"
+    await communicator.send_json_to({"type": "chat_message", "message": "still more"})
+    closed = await communicator.receive_output()
+    assert closed == {"type": "websocket.close", "code": 4029}
+    await communicator.disconnect()
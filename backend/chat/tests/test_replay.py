@@ -0,0 +1,118 @@
+"""Tests for reconnect replay buffers."""
+import pytest
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+
+from chat.models import Room
+from chat.replay import LocalReplayBuffer
+
+
+def test_since_returns_later_entries_or_none_when_too_old():
+    """Entries after a buffered id are returned; ids pushed out of the ring are a gap."""
+    buffer = LocalReplayBuffer(size=3)
+    for i in range(5):
+        buffer.append('lobby', f'm{i}', f'frame {i}')
+
+    assert buffer.since('lobby', 'm2') == [('m3', 'frame 3'), ('m4', 'frame 4')]
+    assert buffer.since('lobby', 'm4') == []
+    assert buffer.since('lobby', 'm1') is None
+    assert buffer.since('elsewhere', 'm4') is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_reconnect_with_since_replays_missed_messages(ws_connect):
+    """Missed messages are replayed after the snapshot and before live frames."""
+    user = await sync_to_async(get_user_model().objects.create_user)(username="replayer", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Replay Room", slug="replay-room", created_by=user)
+
+    sender = await ws_connect(user, "replay-room")
+    await sender.receive_json_from()  # presence_snapshot
+    await sender.receive_json_from()  # user_joined
+    ids = []
+    for text in ("one", "two", "three"):
+        await sender.send_json_to({"type": "chat_message", "message": text})
+        ids.append((await sender.receive_json_from())["message"]["id"])
+
+    resumed = await ws_connect(user, "replay-room", f"?since={ids[0]}")
+    assert (await resumed.receive_json_from())["type"] == "presence_snapshot"
+    replayed = [await resumed.receive_json_from() for _ in range(2)]
+    assert [frame["message"]["content"] for frame in replayed] == ["two", "three"]
+    assert await resumed.receive_nothing()
+
+    await resumed.disconnect()
+    await sender.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_reconnect_past_the_buffer_asks_for_refetch(ws_connect):
+    """An id the buffer no longer holds gets an explicit history_gap resync."""
+    user = await sync_to_async(get_user_model().objects.create_user)(username="too_late", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Gap Room", slug="gap-room", created_by=user)
+
+    communicator = await ws_connect(user, "gap-room", "?since=00000000-0000-0000-0000-000000000000")
+    assert (await communicator.receive_json_from())["type"] == "presence_snapshot"
+    assert await communicator.receive_json_from() == {"type": "resync", "reason": "history_gap", "room": "gap-room"}
+    assert (await communicator.receive_json_from())["type"] == "user_joined"
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_compact_replay_is_one_history_frame(ws_connect):
+    """With shape=compact, missed messages arrive as one frame with a users side-table."""
+    user = await sync_to_async(get_user_model().objects.create_user)(username="compact", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Compact Room", slug="compact-room", created_by=user)
+
+    sender = await ws_connect(user, "compact-room")
+    await sender.receive_json_from()  # presence_snapshot
+    await sender.receive_json_from()  # user_joined
+    ids = []
+    for text in ("one", "two", "three"):
+        await sender.send_json_to({"type": "chat_message", "message": text})
+        ids.append((await sender.receive_json_from())["message"]["id"])
+
+    resumed = await ws_connect(user, "compact-room", f"?since={ids[0]}&shape=compact")
+    assert (await resumed.receive_json_from())["type"] == "presence_snapshot"
+    history = await resumed.receive_json_from()
+    assert history["type"] == "history"
+    assert [m["content"] for m in history["messages"]] == ["two", "three"]
+    assert {m["user_id"] for m in history["messages"]} == {user.id}
+    assert history["users"] == {str(user.id): history["users"][str(user.id)]}
+    assert history["users"][str(user.id)]["username"] == "compact"
+    assert await resumed.receive_nothing()
+
+    await resumed.disconnect()
+    await sender.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_message_broadcast_during_resume_is_delivered_once(monkeypatch, ws_connect):
+    """A message both replayed and received live while resuming reaches the client once."""
+    from chat.consumers import ChatConsumer
+    from chat.replay import get_replay_buffer
+
+    user = await sync_to_async(get_user_model().objects.create_user)(username="racer", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Race Room", slug="race-room", created_by=user)
+    sender = await ws_connect(user, "race-room", joined=True)
+    await sender.send_json_to({"type": "chat_message", "message": "one"})
+    first_id = (await sender.receive_json_from())["message"]["id"]
+
+    async def broadcast_then_read(self, room_slug, since):
+        # "two" goes out after the resuming socket joined the group, but before the buffer is read
+        await sender.send_json_to({"type": "chat_message", "message": "two"})
+        await sender.receive_json_from()
+        return await sync_to_async(get_replay_buffer().since)(room_slug, since)
+
+    monkeypatch.setattr(ChatConsumer, "get_missed_broadcasts", broadcast_then_read)
+    resumed = await ws_connect(user, "race-room", f"?since={first_id}")
+    assert (await resumed.receive_json_from())["type"] == "presence_snapshot"
+    assert (await resumed.receive_json_from())["message"]["content"] == "two"
+    assert await resumed.receive_nothing()
+
+    await sender.send_json_to({"type": "chat_message", "message": "three"})
+    assert (await resumed.receive_json_from())["message"]["content"] == "three"
+    await resumed.disconnect()
+    await sender.disconnect()
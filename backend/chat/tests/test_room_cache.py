@@ -0,0 +1,148 @@
+"""Tests for the per-process room cache and local cache invalidation."""
+import asyncio
+
+import pytest
+from channels.layers import get_channel_layer
+
+from chat import local_cache
+from chat.local_cache import (
+    INVALIDATION_GROUP,
+    MISSING,
+    InvalidationListener,
+    InvalidationListenerMiddleware,
+    LocalCache,
+    ensure_invalidation_listener,
+)
+from chat.models import Room
+from chat.room_cache import resolve_room, room_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_room_cache():
+    room_cache.clear()
+    yield
+    room_cache.clear()
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache('test-lru', maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    cache.set('none', None)
+    assert cache.get('none') is None
+
+
+@pytest.mark.django_db
+def test_resolve_room_hits_database_once(django_user_model, django_assert_num_queries):
+    """Repeated lookups, including misses, are served from memory."""
+    owner = django_user_model.objects.create_user('cache_owner', password='pass123')
+    room = Room.objects.create(name='Cached Room', created_by=owner)
+
+    with django_assert_num_queries(2):
+        assert resolve_room(room.slug) == (room.id, True)
+        assert resolve_room('no-such-room') is None
+        assert resolve_room(room.slug) == (room.id, True)
+        assert resolve_room('no-such-room') is None
+
+
+@pytest.mark.django_db
+def test_room_save_invalidates_cached_entry(django_user_model):
+    """Deactivating a room drops its cached entry."""
+    owner = django_user_model.objects.create_user('cache_owner2', password='pass123')
+    room = Room.objects.create(name='Closing Room', created_by=owner)
+    assert resolve_room(room.slug) == (room.id, True)
+
+    room.is_active = False
+    room.save()
+    assert resolve_room(room.slug) == (room.id, False)
+
+
+@pytest.mark.django_db
+def test_renaming_a_room_invalidates_its_old_slug(django_user_model):
+    """After a slug change the old slug stops resolving straight away."""
+    owner = django_user_model.objects.create_user('cache_owner3', password='pass123')
+    room = Room.objects.create(name='Old Name', slug='old-name', created_by=owner)
+    assert resolve_room('old-name') == (room.id, True)
+
+    room.slug = 'new-name'
+    room.save()
+    assert resolve_room('old-name') is None
+    assert resolve_room('new-name') == (room.id, True)
+
+
+async def _wait_until_dropped(slug):
+    for _ in range(50):
+        if room_cache.get(slug) is MISSING:
+            break
+        await asyncio.sleep(0.01)
+    assert room_cache.get(slug) is MISSING
+
+
+@pytest.mark.asyncio
+async def test_invalidation_broadcast_clears_other_processes():
+    """The listener drops entries named in invalidation broadcasts."""
+    # Listeners left behind by earlier tests belong to closed event loops
+    await get_channel_layer().flush()
+    listener = await ensure_invalidation_listener()
+    room_cache.set('remote-room', ('id', True))
+
+    await get_channel_layer().group_send(
+        INVALIDATION_GROUP, {'type': 'local_cache.invalidate', 'cache': 'rooms', 'key': 'remote-room'}
+    )
+    await _wait_until_dropped('remote-room')
+    listener.stop()
+    await get_channel_layer().group_discard(INVALIDATION_GROUP, listener.channel_name)
+
+
+@pytest.mark.asyncio
+async def test_listener_survives_layer_errors(monkeypatch):
+    """A failed receive is retried after a pause, dropping entries whose invalidation may be lost."""
+    monkeypatch.setattr(local_cache, 'RETRY_DELAY', 0.01)
+    layer = get_channel_layer()
+    await layer.flush()
+    receive = type(layer).receive
+    failures = [ConnectionError('layer down')]
+
+    async def flaky_receive(self, channel):
+        if failures:
+            raise failures.pop()
+        return await receive(self, channel)
+
+    monkeypatch.setattr(type(layer), 'receive', flaky_receive)
+    room_cache.set('stale-room', ('id', True))
+    listener = InvalidationListener(layer)
+    await listener.start()
+    await _wait_until_dropped('stale-room')
+
+    room_cache.set('remote-room', ('id', True))
+    await layer.group_send(
+        INVALIDATION_GROUP, {'type': 'local_cache.invalidate', 'cache': 'rooms', 'key': 'remote-room'}
+    )
+    await _wait_until_dropped('remote-room')
+    listener.stop()
+    await layer.group_discard(INVALIDATION_GROUP, listener.channel_name)
+
+
+@pytest.mark.asyncio
+async def test_asgi_wrapper_starts_listener_at_lifespan_startup():
+    """The listener runs from server startup, before any WebSocket has checked a room."""
+    await get_channel_layer().flush()
+    messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message)
+
+    await InvalidationListenerMiddleware(None)({'type': 'lifespan'}, receive, send)
+    assert sent == [{'type': 'lifespan.startup.complete'}, {'type': 'lifespan.shutdown.complete'}]
+    listener = local_cache._listeners.get(asyncio.get_running_loop())
+    assert listener is not None
+    listener.stop()
+    await get_channel_layer().group_discard(INVALIDATION_GROUP, listener.channel_name)
@@ -0,0 +1,96 @@
+"""Tests for the denormalized room message statistics."""
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from chat.models import Message, Room
+
+
+@pytest.fixture
+def room(django_user_model):
+    user = django_user_model.objects.create_user('counter', password='pass12345')
+    return Room.objects.create(name='Counted', slug='counted', created_by=user)
+
+
+@pytest.mark.django_db
+def test_counters_follow_creates_and_deletes(room):
+    """Creates, bulk creates and deletes (single and queryset) keep the stored stats exact."""
+    user = room.created_by
+    first = Message.objects.create(room=room, user=user, content='one')
+    last = Message.objects.create(room=room, user=user, content='two')
+    room.refresh_from_db()
+    assert (room.message_count, room.last_message_at) == (2, last.created_at)
+
+    room.description = 'renamed while stale'
+    room.message_count = 0
+    room.save()
+    room.refresh_from_db()
+    assert room.message_count == 2
+
+    last.delete()
+    room.refresh_from_db()
+    assert (room.message_count, room.last_message_at) == (1, first.created_at)
+
+    Message.objects.filter(room=room).delete()
+    room.refresh_from_db()
+    assert (room.message_count, room.last_message_at) == (0, None)
+
+
+@pytest.mark.django_db
+def test_deleting_a_user_uncounts_their_messages_per_room(room, django_user_model):
+    """A user's cascaded messages are uncounted with one UPDATE per room, not one per row."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    other = Room.objects.create(name='Other', slug='other', created_by=room.created_by)
+    poster = django_user_model.objects.create_user('poster', password='pass12345')
+    for i in range(30):
+        Message.objects.create(room=room if i % 3 else other, user=poster, content=f'm{i}')
+    kept = Message.objects.create(room=room, user=room.created_by, content='kept')
+
+    with CaptureQueriesContext(connection) as queries:
+        poster.delete()
+    room_updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "chat_room"')]
+    assert len(room_updates) == 2
+
+    room.refresh_from_db()
+    other.refresh_from_db()
+    assert (room.message_count, room.last_message_at) == (1, kept.created_at)
+    assert (other.message_count, other.last_message_at) == (0, None)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_write_behind_batches_are_counted(room):
+    """bulk_create sends no signals; the write-behind flush counts its batch itself."""
+    import asyncio
+
+    from asgiref.sync import sync_to_async
+
+    from chat import write_behind
+
+    buffer = write_behind.WriteBehindBuffer(flush_interval_ms=5, max_batch_size=10)
+    await asyncio.gather(*[buffer.submit(room.slug, room.created_by, f"batch {i}") for i in range(4)])
+    await sync_to_async(room.refresh_from_db)()
+    assert room.message_count == 4
+    assert room.last_message_at is not None
+
+
+@pytest.mark.django_db
+def test_reconcile_repairs_drift_and_live_count_verifies(room, settings):
+    """The command fixes drifted rooms; LIVE_COUNT makes the API count messages directly."""
+    Message.objects.create(room=room, user=room.created_by, content='one')
+    Room.objects.filter(pk=room.pk).update(message_count=7, last_message_at=None)
+    client = APIClient()
+    client.force_authenticate(user=room.created_by)
+
+    assert client.get(f'/api/rooms/{room.slug}/').data['message_count'] == 7
+    settings.CHAT_ROOM_STATS = {'LIVE_COUNT': True}
+    assert client.get(f'/api/rooms/{room.slug}/').data['message_count'] == 1
+
+    call_command('reconcile_room_stats', '--dry-run')
+    assert Room.objects.get(pk=room.pk).message_count == 7
+    call_command('reconcile_room_stats', '--room', room.slug)
+    room.refresh_from_db()
+    assert room.message_count == 1
+    assert room.last_message_at is not None
@@ -60,3 +60,27 @@ def test_message_serializer_outputs_username(django_user_model):
     message = Message.objects.create(room=room, user=user, content='Hello!')
     data = serializers.MessageSerializer(message).data
     assert data['username'] == 'msg_user'
+
+
+@pytest.mark.django_db
+def test_message_rows_match_message_serializer_byte_for_byte(settings):
+    """The values_list fast path renders exactly what MessageSerializer does, in any timezone."""
+    from rest_framework.renderers import JSONRenderer
+
+    from chat.frames import encode_frame
+
+    user = get_user_model().objects.create_user('fast_path', email='', password='pass12345')
+    room = Room.objects.create(name='Fast', created_by=user)
+    Message.objects.create(room=room, user=user, content='plain')
+    edited = Message.objects.create(room=room, user=user, content='ünïcode "quoted"\n')
+    edited.mark_edited()
+
+    for time_zone in ('UTC', 'Asia/Kolkata'):
+        settings.TIME_ZONE = time_zone
+        messages = Message.objects.filter(room=room).order_by('created_at')
+        expected = serializers.MessageSerializer(messages.select_related('user'), many=True).data
+        rows = serializers.serialize_message_rows(messages.values_list(*serializers.MESSAGE_ROW_FIELDS))
+
+        assert JSONRenderer().render(rows) == JSONRenderer().render(expected)
+        assert encode_frame({'message': rows[1]}) == encode_frame({'message': expected[1]})
+        assert serializers.serialize_message(messages.select_related('user')[1]) == rows[1]
@@ -0,0 +1,56 @@
+"""Tests for typing indicator aggregation."""
+import asyncio
+
+import pytest
+from channels.layers import InMemoryChannelLayer
+
+from chat.typing import TypingAggregator
+
+
+async def _subscribe(layer, group):
+    channel = await layer.new_channel()
+    await layer.group_add(group, channel)
+    return channel
+
+
+@pytest.mark.asyncio
+async def test_typing_events_coalesce_into_one_frame():
+    """A burst of typing events from several users becomes a single broadcast."""
+    layer = InMemoryChannelLayer()
+    channel = await _subscribe(layer, 'chat_lobby')
+    aggregator = TypingAggregator(layer, interval_ms=10, ttl=5)
+
+    for _ in range(20):
+        aggregator.update('lobby', 1, 'alice', True)
+        aggregator.update('lobby', 2, 'bob', True)
+    aggregator.update('lobby', 3, 'carol', True)
+    aggregator.update('lobby', 3, 'carol', False)
+
+    event = await asyncio.wait_for(layer.receive(channel), timeout=1)
+    assert event['type'] == 'typing_indicator'
+    assert event['started'] == [{'user_id': 1, 'username': 'alice'}, {'user_id': 2, 'username': 'bob'}]
+    assert event['stopped'] == []
+
+    await asyncio.sleep(0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(layer.receive(channel), timeout=0.05)
+
+    aggregator.update('lobby', 1, 'alice', False)
+    aggregator.update('lobby', 2, 'bob', False)
+    await asyncio.wait_for(aggregator._task, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_stale_typists_expire():
+    """Typists who stop sending events are reported as stopped after the ttl."""
+    layer = InMemoryChannelLayer()
+    channel = await _subscribe(layer, 'chat_lobby')
+    aggregator = TypingAggregator(layer, interval_ms=10, ttl=0.03)
+
+    aggregator.update('lobby', 1, 'alice', True)
+    started = await asyncio.wait_for(layer.receive(channel), timeout=1)
+    assert started['started'] == [{'user_id': 1, 'username': 'alice'}]
+
+    stopped = await asyncio.wait_for(layer.receive(channel), timeout=1)
+    assert stopped['stopped'] == [{'user_id': 1, 'username': 'alice'}]
+    assert aggregator.rooms == {}
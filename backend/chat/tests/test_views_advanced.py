@@ -43,17 +43,17 @@ def test_message_creation_and_listing(auth_client):
 
     list_resp = client.get(f'/api/messages/?room_slug={room.slug}')
     assert list_resp.status_code == 200
-    assert list_resp.data[0]['content'] == 'hello world'
+    assert list_resp.data['results'][0]['content'] == 'hello world'
 
 
 @pytest.mark.django_db
 def test_room_presence_endpoint(auth_client, django_user_model):
-    """room_presence returns cached online user list."""
+    """room_presence returns the online users from the presence store."""
     client, user = auth_client
     room = Room.objects.create(name='Presence Room', created_by=user)
 
-    from django.core.cache import cache
-    cache.set(f'room_presence:{room.slug}', [{'id': user.id, 'username': user.username}], timeout=30)
+    from chat.presence import get_presence_store
+    get_presence_store().join(room.slug, 'specific.test!presence', user)
 
     resp = client.get(f'/api/presence/{room.slug}/')
     assert resp.status_code == 200
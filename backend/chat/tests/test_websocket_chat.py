@@ -1,16 +1,15 @@
 """Basic WebSocket integration tests."""
+import json
 import pytest
 from asgiref.sync import sync_to_async
-from channels.testing import WebsocketCommunicator
 from django.contrib.auth import get_user_model
 
 from chat.models import Room
-from chat.consumers import ChatConsumer
 
 
 @pytest.mark.asyncio
 @pytest.mark.django_db(transaction=True)
-async def test_websocket_connection_accepts():
+async def test_websocket_connection_accepts(ws_connect):
     """Authenticated clients should establish a WebSocket session."""
     user_model = get_user_model()
     user = await sync_to_async(user_model.objects.create_user)(
@@ -22,14 +21,161 @@ async def test_websocket_connection_accepts():
         slug="test-room",
         created_by=user,
     )
-    communicator = WebsocketCommunicator(
-        ChatConsumer.as_asgi(),
-        "/ws/chat/test-room/"
-    )
-    communicator.scope["user"] = user
-    communicator.scope["url_route"] = {"kwargs": {"room_slug": "test-room"}}
-    connected, _ = await communicator.connect()
-    assert connected
+    communicator = await ws_connect(user, "test-room")
 
     await communicator.send_json_to({"type": "ping"})
     await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_chat_message_frame_is_forwarded_untouched(ws_connect):
+    """Receivers forward the sender's pre-encoded frame byte for byte."""
+    user = await sync_to_async(get_user_model().objects.create_user)(
+        username="ws_fanout",
+        password="pass123",
+    )
+    await sync_to_async(Room.objects.create)(name="Fanout Room", slug="fanout-room", created_by=user)
+    communicator = await ws_connect(user, "fanout-room", joined=True)
+
+    await communicator.send_json_to({"type": "chat_message", "message": "hi there"})
+    frame = await communicator.receive_json_from()
+    assert frame["type"] == "chat_message"
+    assert frame["message"]["content"] == "hi there"
+    assert isinstance(frame["message"]["room"], str)
+
+    from channels.layers import get_channel_layer
+    text = '{"type":"chat_message","message":{"content":"raw"}}'
+    await get_channel_layer().group_send("chat_fanout-room", {"type": "chat_message", "text": text})
+    assert await communicator.receive_from() == text
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_presence_snapshot_then_deltas(ws_connect):
+    """Clients get one snapshot on connect and compact join/leave deltas afterwards."""
+    user_model = get_user_model()
+    alice = await sync_to_async(user_model.objects.create_user)(username="ws_alice", password="pass123")
+    bob = await sync_to_async(user_model.objects.create_user)(username="ws_bob", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Delta Room", slug="delta-room", created_by=alice)
+
+    first = await ws_connect(alice, "delta-room")
+    snapshot = await first.receive_json_from()
+    assert snapshot["type"] == "presence_snapshot"
+    assert snapshot["online_users"] == [{"id": alice.id, "username": "ws_alice"}]
+    assert (await first.receive_json_from())["version"] == snapshot["version"]
+
+    second = await ws_connect(bob, "delta-room")
+    assert len((await second.receive_json_from())["online_users"]) == 2
+    joined = await first.receive_json_from()
+    assert joined == {"type": "user_joined", "room": "delta-room", "username": "ws_bob", "user_id": bob.id, "version": snapshot["version"] + 1}
+
+    await second.disconnect()
+    left = await first.receive_json_from()
+    assert left["type"] == "user_left"
+    assert "online_users" not in left
+    assert left["version"] == snapshot["version"] + 2
+
+    await first.send_json_to({"type": "presence_resync"})
+    resync = await first.receive_json_from()
+    assert resync == {"type": "presence_snapshot", "room": "delta-room", "online_users": [{"id": alice.id, "username": "ws_alice"}], "version": left["version"]}
+    await first.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_msgpack_subprotocol_uses_binary_frames(ws_connect):
+    """Clients offering msgpack send and receive MessagePack frames with the JSON schema."""
+    import msgpack
+
+    user = await sync_to_async(get_user_model().objects.create_user)(
+        username="ws_msgpack",
+        password="pass123",
+    )
+    await sync_to_async(Room.objects.create)(name="Binary Room", slug="binary-room", created_by=user)
+    communicator = await ws_connect(user, "binary-room", subprotocols=["msgpack"])
+    assert communicator.subprotocol == "msgpack"
+
+    snapshot = msgpack.unpackb(await communicator.receive_from())
+    assert snapshot["type"] == "presence_snapshot"
+    assert msgpack.unpackb(await communicator.receive_from())["type"] == "user_joined"
+
+    await communicator.send_to(bytes_data=msgpack.packb({"type": "chat_message", "message": "packed"}))
+    frame = msgpack.unpackb(await communicator.receive_from())
+    assert frame["type"] == "chat_message"
+    assert frame["message"]["content"] == "packed"
+    assert isinstance(frame["message"]["room"], str)
+    await communicator.disconnect()
+
+
+def test_group_events_carry_json_and_encode_msgpack_once(monkeypatch):
+    """Events publish only JSON text; each process packs a given event at most once."""
+    import msgpack
+    from chat import frames
+
+    event = {"type": "chat_message", **frames.encode_event({"type": "chat_message", "message": {"content": "once"}})}
+    assert set(event) == {"type", "text"}
+
+    packed = []
+    encode = frames.encode_frame_msgpack
+    monkeypatch.setattr(frames, "encode_frame_msgpack", lambda payload: packed.append(payload) or encode(payload))
+    copies = [dict(event) for _ in range(3)]
+    encoded = [frames.event_msgpack(copy) for copy in copies]
+    assert len(packed) == 1
+    assert encoded[0] == encoded[2]
+    assert msgpack.unpackb(encoded[0]) == json.loads(event["text"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_busy_room_messages_arrive_in_batch_frames(settings, ws_connect):
+    """Above the rate threshold a burst of chat events is packed into one batch frame."""
+    from channels.layers import get_channel_layer
+
+    settings.CHAT_OUTBOUND = {**settings.CHAT_OUTBOUND, 'BATCH_RATE_THRESHOLD': 2, 'BATCH_MAX_DELAY_MS': 20}
+    user = await sync_to_async(get_user_model().objects.create_user)(
+        username="ws_batch",
+        password="pass123",
+    )
+    await sync_to_async(Room.objects.create)(name="Busy Room", slug="busy-room", created_by=user)
+    communicator = await ws_connect(user, "busy-room", joined=True)
+
+    layer = get_channel_layer()
+    for i in range(4):
+        text = '{"type":"chat_message","room":"busy-room","n":%d}' % i
+        await layer.group_send("chat_busy-room", {"type": "chat_message", "room": "busy-room", "text": text})
+
+    first = await communicator.receive_json_from()
+    assert first == {"type": "chat_message", "room": "busy-room", "n": 0}
+    batch = await communicator.receive_json_from()
+    assert batch["type"] == "batch"
+    assert [event["n"] for event in batch["events"]] == [1, 2, 3]
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_chat_message_stages_are_timed(settings, ws_connect):
+    """Every pipeline stage records a latency sample; nothing is recorded when disabled."""
+    from chat.latency import stage_histogram
+
+    stages = ('save', 'serialize', 'encode', 'replay', 'group_send', 'fanout', 'send', 'end_to_end')
+    user = await sync_to_async(get_user_model().objects.create_user)(username="ws_timed", password="pass123")
+    await sync_to_async(Room.objects.create)(name="Timed Room", slug="timed-room", created_by=user)
+
+    async def send_one(message):
+        communicator = await ws_connect(user, "timed-room", joined=True)
+        await communicator.send_json_to({"type": "chat_message", "message": message})
+        frame = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return frame
+
+    before = {stage: stage_histogram.count(stage=stage) for stage in stages}
+    frame = await send_one("timed")
+    assert "sent_at" not in frame
+    assert all(stage_histogram.count(stage=stage) == before[stage] + 1 for stage in stages)
+
+    settings.CHAT_LATENCY = {'ENABLED': False}
+    await send_one("untimed")
+    assert all(stage_histogram.count(stage=stage) == before[stage] + 1 for stage in stages)
@@ -0,0 +1,83 @@
+"""Tests for write-behind message persistence."""
+import asyncio
+
+import pytest
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from chat import write_behind
+from chat.consumers import ChatConsumer
+from chat.models import Room, Message
+
+
+async def _create_user_and_room(username, slug):
+    user = await sync_to_async(get_user_model().objects.create_user)(username=username, password="pass123")
+    room = await sync_to_async(Room.objects.create)(name=slug.title(), slug=slug, created_by=user)
+    return user, room
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_buffer_flushes_concurrent_messages_in_one_batch():
+    """Messages submitted within one window commit together and broadcast in order."""
+    user, room = await _create_user_and_room("wb_batch", "wb-batch")
+    buffer = write_behind.WriteBehindBuffer(flush_interval_ms=20, max_batch_size=50)
+    committed = []
+
+    async def on_commit(data):
+        committed.append(data['content'])
+
+    batches_before = write_behind.batch_size_histogram.count()
+    results = await asyncio.gather(*[
+        buffer.submit(room.slug, user, f"msg {i}", on_commit=on_commit) for i in range(5)
+    ])
+
+    assert [result['content'] for result in results] == [f"msg {i}" for i in range(5)]
+    assert committed == [f"msg {i}" for i in range(5)]
+    assert write_behind.batch_size_histogram.count() == batches_before + 1
+    assert await sync_to_async(Message.objects.filter(room=room).count)() == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_buffer_rejects_unknown_room_without_failing_batch():
+    """A missing room fails only its own entry."""
+    user, room = await _create_user_and_room("wb_missing", "wb-missing")
+    buffer = write_behind.WriteBehindBuffer(flush_interval_ms=5, max_batch_size=50)
+
+    ok, missing = await asyncio.gather(
+        buffer.submit(room.slug, user, "kept"),
+        buffer.submit("no-such-room", user, "dropped"),
+        return_exceptions=True,
+    )
+
+    assert ok['content'] == "kept"
+    assert isinstance(missing, Room.DoesNotExist)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_consumer_acks_after_write_behind_commit():
+    """With write-behind enabled the sender gets the broadcast and an ack."""
+    user, room = await _create_user_and_room("wb_consumer", "wb-consumer")
+
+    with override_settings(CHAT_WRITE_BEHIND={'ENABLED': True, 'FLUSH_INTERVAL_MS': 1}):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f"/ws/chat/{room.slug}/")
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {"kwargs": {"room_slug": room.slug}}
+        connected, _ = await communicator.connect()
+        assert connected
+        assert (await communicator.receive_json_from())['type'] == 'presence_snapshot'
+        assert (await communicator.receive_json_from())['type'] == 'user_joined'
+
+        await communicator.send_json_to({"type": "chat_message", "message": "hello", "client_id": "c-1"})
+        frames = [await communicator.receive_json_from(), await communicator.receive_json_from()]
+        await communicator.disconnect()
+
+    # The ack is sent before the consumer gets to process its own echo
+    ack, broadcast = sorted(frames, key=lambda frame: frame['type'] != 'message_ack')
+    assert broadcast['type'] == 'chat_message'
+    assert broadcast['message']['content'] == 'hello'
+    assert ack == {'type': 'message_ack', 'room': room.slug, 'message_id': broadcast['message']['id'], 'client_id': 'c-1'}
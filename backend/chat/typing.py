@@ -0,0 +1,169 @@
+"""
+Typing indicator aggregation
+Coalesces per-user typing events into at most one broadcast per room per interval
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .frames import encode_event
+from .metrics import registry
+from .models import Room
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'INTERVAL_MS': 500,
+    'TTL': 5,
+}
+
+updates_counter = registry.counter(
+    'relaydesk_typing_updates_total',
+    'Typing frames received from clients',
+)
+broadcasts_counter = registry.counter(
+    'relaydesk_typing_broadcasts_total',
+    'Aggregated typing_indicator broadcasts sent to room groups',
+)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_TYPING', {})}
+
+
+class RoomTypingState:
+    """Who is typing in one room, and what the room was last told"""
+
+    __slots__ = ('typists', 'announced')
+
+    def __init__(self):
+        self.typists = {}  # user_id -> (username, expires_at)
+        self.announced = {}  # user_id -> username
+
+
+class TypingAggregator:
+    """
+    Per-process typing aggregator
+
+    Start events only refresh a user's expiry; the room hears about a typist
+    on the next tick, and not at all if they stopped within the same interval.
+    Each tick sends one typing_indicator frame per changed room listing who
+    started and who stopped. Frames are deltas, so rooms spread across
+    several processes merge cleanly on the client.
+    """
+
+    def __init__(self, channel_layer, interval_ms=500, ttl=5):
+        self.channel_layer = channel_layer
+        self.interval = interval_ms / 1000.0
+        self.ttl = ttl
+        self.rooms = {}
+        self._task = None
+
+    def update(self, room_slug, user_id, username, is_typing):
+        """Record a typing start or stop; never touches the channel layer"""
+        updates_counter.inc()
+        state = self.rooms.get(room_slug)
+        if state is None:
+            if not is_typing:
+                return
+            state = self.rooms[room_slug] = RoomTypingState()
+        if is_typing:
+            state.typists[user_id] = (username, time.monotonic() + self.ttl)
+        else:
+            state.typists.pop(user_id, None)
+        self._ensure_running()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self.rooms:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Typing aggregator flush failed: {e}", exc_info=True)
+
+    async def flush(self):
+        """Expire stale typists and broadcast one delta per changed room"""
+        now = time.monotonic()
+        for room_slug, state in list(self.rooms.items()):
+            for user_id in [uid for uid, (_, expires_at) in state.typists.items() if expires_at <= now]:
+                del state.typists[user_id]
+
+            started = [
+                {'user_id': user_id, 'username': username}
+                for user_id, (username, _) in state.typists.items()
+                if user_id not in state.announced
+            ]
+            stopped = [
+                {'user_id': user_id, 'username': username}
+                for user_id, username in state.announced.items()
+                if user_id not in state.typists
+            ]
+            state.announced = {user_id: username for user_id, (username, _) in state.typists.items()}
+            if not state.typists:
+                del self.rooms[room_slug]
+
+            if started or stopped:
+                broadcasts_counter.inc()
+                await self.channel_layer.group_send(Room.group_name_for(room_slug), {
+                    'type': 'typing_indicator',
+                    'room': room_slug,
+                    'started': started,
+                    'stopped': stopped,
+                    'user_ids': [user['user_id'] for user in started + stopped],
+                    **encode_event({
+                        'type': 'typing_indicator', 'room': room_slug, 'started': started, 'stopped': stopped
+                    }),
+                })
+
+
+def merge_typing_events(older, newer):
+    """
+    Fold two typing deltas for the same room into one
+
+    A user who started and then stopped (or the reverse) between the two
+    cancels out. An empty merge keeps its frame slot but has no text.
+    """
+    newer_ids = {user['user_id'] for user in newer['started'] + newer['stopped']}
+    older_started = {user['user_id'] for user in older['started']}
+    older_stopped = {user['user_id'] for user in older['stopped']}
+    started = [user for user in older['started'] if user['user_id'] not in newer_ids]
+    stopped = [user for user in older['stopped'] if user['user_id'] not in newer_ids]
+    started += [user for user in newer['started'] if user['user_id'] not in older_stopped]
+    stopped += [user for user in newer['stopped'] if user['user_id'] not in older_started]
+    room_slug = newer['room']
+    return {
+        'type': 'typing_indicator',
+        'room': room_slug,
+        'started': started,
+        'stopped': stopped,
+        'user_ids': [user['user_id'] for user in started + stopped],
+        **(encode_event({
+            'type': 'typing_indicator', 'room': room_slug, 'started': started, 'stopped': stopped
+        }) if started or stopped else {'text': None}),
+    }
+
+
+_aggregators = weakref.WeakKeyDictionary()
+
+
+def get_typing_aggregator():
+    """Return the typing aggregator bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    aggregator = _aggregators.get(loop)
+    if aggregator is None:
+        config = get_config()
+        aggregator = TypingAggregator(
+            get_channel_layer(),
+            interval_ms=config['INTERVAL_MS'],
+            ttl=config['TTL'],
+        )
+        _aggregators[loop] = aggregator
+    return aggregator
@@ -9,12 +9,21 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from django.core.cache import cache
 from django.db.models import Count
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from . import history_cache, room_stats
+from .export import aiter_blocks, gzip_stream, iter_room_ndjson
+from .versions import room_messages_condition, rooms_condition
 from .models import Room, Message
+from .pagination import MessageKeysetPagination
+from .presence import get_presence_store
+from .room_cache import resolve_room
 from .serializers import (
     RoomSerializer, RoomCreateSerializer, MessageSerializer,
-    MessageCreateSerializer, UserSerializer, UserRegistrationSerializer
+    MessageCreateSerializer, UserSerializer, UserRegistrationSerializer,
+    COMPACT_SHAPE, MESSAGE_ROW_FIELDS, compact_messages, serialize_message_rows,
 )
 import logging
 
@@ -64,18 +73,41 @@ def current_user(request):
     return Response(serializer.data)
 
 
+def message_page_response(paginator, page, request):
+    """Paginated messages, normalized with a users side-table for ?shape=compact"""
+    if request.query_params.get('shape') != COMPACT_SHAPE:
+        return paginator.get_paginated_response(page)
+    messages, users = compact_messages(page)
+    response = paginator.get_paginated_response(messages)
+    response.data['users'] = users
+    return response
+
+
 class RoomViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Room CRUD operations
     Handles listing, creating, retrieving, updating rooms
     """
-    queryset = Room.objects.filter(is_active=True).annotate(
-        message_count=Count('messages')
-    )
+    queryset = Room.objects.filter(is_active=True)
     permission_classes = [IsAuthenticated]
     lookup_field = 'slug'
     ordering = ['-created_at']  # ✅ THIS FIXES THE ERROR!
     
+    @method_decorator(rooms_condition)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @method_decorator(rooms_condition)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    def get_queryset(self):
+        """Rooms carry a stored message_count; count live only when configured to verify it"""
+        queryset = super().get_queryset()
+        if room_stats.get_config()['LIVE_COUNT']:
+            queryset = queryset.annotate(live_message_count=Count('messages'))
+        return queryset
+    
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
         if self.action == 'create':
@@ -88,22 +120,65 @@ class RoomViewSet(viewsets.ModelViewSet):
         logger.info(f"Room created: {room.name} by {self.request.user.username}")
     
     @action(detail=True, methods=['get'])
+    @method_decorator(room_messages_condition)
     def messages(self, request, slug=None):
         """
         Get paginated messages for a specific room
-        Supports cursor-based pagination
+        Keyset pagination with ?before= / ?after= cursors, newest page first
+        ?shape=compact moves authors into a users map keyed by user_id
+        The newest page is served from the hot history cache
         """
-        room = self.get_object()
-        messages = Message.objects.filter(room=room).select_related('user')
-        
-        # Apply pagination
-        page = self.paginate_queryset(messages)
-        if page is not None:
-            serializer = MessageSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        entry = resolve_room(slug)
+        if entry is None or not entry[1]:
+            raise Http404
+        room_id = entry[0]
+        paginator = MessageKeysetPagination()
+        messages = Message.objects.filter(room_id=room_id).values_list(*MESSAGE_ROW_FIELDS, named=True)
+
+        if paginator.is_newest_page(request):
+            page_size = paginator.get_page_size(request)
+            cached = history_cache.get_latest(room_id)
+            if cached is not None and (cached['complete'] or len(cached['messages']) >= page_size):
+                page = paginator.paginate_tail(cached['messages'], cached['complete'], request)
+                return message_page_response(paginator, page, request)
+
+            cache_size = history_cache.get_config()['SIZE']
+            if cached is None and history_cache.get_config()['ENABLED'] and page_size <= cache_size:
+                # Load the cache's worth of newest messages; the page is their tail
+                generation = history_cache.current_generation(room_id)
+                newest = list(messages.order_by('-created_at', '-id')[:cache_size + 1])[::-1]
+                data = serialize_message_rows(newest)
+                history_cache.store_latest(room_id, data, generation)
+                page = paginator.paginate_tail(data, len(newest) <= cache_size, request)
+                return message_page_response(paginator, page, request)
+
+        page = paginator.paginate_queryset(messages, request, view=self)
+        return message_page_response(paginator, serialize_message_rows(page), request)
+
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, slug=None):
+        """
+        Stream a room's whole history as NDJSON, oldest first
+        ?compress=gzip returns it gzip-compressed on the fly
+        """
+        entry = resolve_room(slug)
+        if entry is None or not entry[1]:
+            raise Http404
+        stream = iter_room_ndjson(entry[0])
+        filename = f"{slug}.ndjson"
+        content_type = 'application/x-ndjson'
+        if request.query_params.get('compress') == 'gzip':
+            stream = gzip_stream(stream)
+            filename += '.gz'
+            content_type = 'application/gzip'
+        if isinstance(request._request, ASGIRequest):
+            # An async server would otherwise list() a sync iterator whole before sending it
+            stream = aiter_blocks(stream)
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        logger.info(f"History export of {slug} started by {request.user.username}")
+        return response
 
 
 class MessageViewSet(viewsets.ModelViewSet):
@@ -113,6 +188,7 @@ class MessageViewSet(viewsets.ModelViewSet):
     """
     queryset = Message.objects.all().select_related('user', 'room')
     permission_classes = [IsAuthenticated]
+    pagination_class = MessageKeysetPagination
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
@@ -120,6 +196,13 @@ class MessageViewSet(viewsets.ModelViewSet):
             return MessageCreateSerializer
         return MessageSerializer
     
+    @method_decorator(room_messages_condition)
+    def list(self, request, *args, **kwargs):
+        """Rows go straight from values_list() to dicts; same output as MessageSerializer"""
+        rows = self.filter_queryset(self.get_queryset()).values_list(*MESSAGE_ROW_FIELDS, named=True)
+        page = self.paginate_queryset(rows)
+        return message_page_response(self.paginator, serialize_message_rows(page), request)
+    
     def get_queryset(self):
         """Filter messages by room if room_slug is provided"""
         queryset = super().get_queryset()
@@ -144,10 +227,9 @@ class MessageViewSet(viewsets.ModelViewSet):
 def room_presence(request, room_slug):
     """
     Get list of users currently online in a room
-    Uses Redis cache for presence tracking
+    Reads the shared presence store, which purges expired connections
     """
-    cache_key = f"room_presence:{room_slug}"
-    online_users = cache.get(cache_key, [])
+    online_users = get_presence_store().members(room_slug)
     
     return Response({
         'room_slug': room_slug,
@@ -0,0 +1,208 @@
+"""
+Write-behind persistence for WebSocket chat messages
+Buffers incoming messages per process and flushes them with bulk_create
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from . import history_cache, room_stats, versions
+from .metrics import registry
+from .models import Room, Message
+from .room_cache import get_active_room_id
+from .serializers import serialize_message
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'FLUSH_INTERVAL_MS': 5,
+    'MAX_BATCH_SIZE': 200,
+}
+
+batch_size_histogram = registry.histogram(
+    'relaydesk_write_behind_batch_size',
+    'Messages persisted per write-behind flush',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500),
+)
+flush_latency_histogram = registry.histogram(
+    'relaydesk_write_behind_flush_seconds',
+    'Time spent persisting one write-behind batch',
+)
+messages_counter = registry.counter(
+    'relaydesk_write_behind_messages_total',
+    'Messages persisted through the write-behind buffer',
+)
+flush_errors_counter = registry.counter(
+    'relaydesk_write_behind_flush_errors_total',
+    'Write-behind flushes that failed to commit',
+)
+
+
+def get_config():
+    """Return write-behind settings merged over the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'CHAT_WRITE_BEHIND', {})}
+
+
+def is_enabled():
+    return bool(get_config()['ENABLED'])
+
+
+class PendingMessage:
+    """A message waiting in the buffer for the next flush"""
+
+    __slots__ = ('room_slug', 'user', 'content', 'on_commit', 'future')
+
+    def __init__(self, room_slug, user, content, on_commit, future):
+        self.room_slug = room_slug
+        self.user = user
+        self.content = content
+        self.on_commit = on_commit
+        self.future = future
+
+
+class WriteBehindBuffer:
+    """
+    Per-process message buffer
+    Flushes every FLUSH_INTERVAL_MS or as soon as MAX_BATCH_SIZE rows are queued.
+    Batches commit and broadcast strictly in submission order.
+    """
+
+    def __init__(self, flush_interval_ms=5, max_batch_size=200):
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.pending = []
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+
+    async def submit(self, room_slug, user, content, on_commit=None):
+        """
+        Queue a message and wait until its batch commits
+
+        Args:
+            room_slug: Slug of the target room
+            user: Author of the message
+            content: Message text
+            on_commit: Optional coroutine called with the serialized message
+                after the batch commits, in submission order
+
+        Returns:
+            dict: Serialized message
+
+        Raises:
+            Room.DoesNotExist: The room is missing or inactive
+            Exception: Whatever the database raised while committing the batch
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(PendingMessage(room_slug, user, content, on_commit, future))
+
+        if len(self.pending) >= self.max_batch_size:
+            self._schedule_flush(loop, 0)
+        elif self._timer is None:
+            self._schedule_flush(loop, self.flush_interval)
+
+        return await future
+
+    def _schedule_flush(self, loop, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, lambda: loop.create_task(self.flush()))
+
+    async def flush(self):
+        """Persist everything queued so far as one transaction"""
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self.pending = self.pending[:self.max_batch_size], self.pending[self.max_batch_size:]
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            try:
+                results = await database_sync_to_async(self._persist)(batch)
+            except Exception as e:
+                flush_errors_counter.inc()
+                logger.error(f"Write-behind flush of {len(batch)} messages failed: {e}", exc_info=True)
+                for entry in batch:
+                    if not entry.future.done():
+                        entry.future.set_exception(e)
+                results = None
+            else:
+                flush_latency_histogram.observe(time.perf_counter() - started)
+                batch_size_histogram.observe(len(batch))
+                messages_counter.inc(len(batch))
+
+            if results is not None:
+                for entry, data in zip(batch, results):
+                    if data is None:
+                        if not entry.future.done():
+                            entry.future.set_exception(Room.DoesNotExist(f"Room {entry.room_slug} not found"))
+                        continue
+                    if entry.on_commit is not None:
+                        try:
+                            await entry.on_commit(data)
+                        except Exception as e:
+                            logger.error(f"Write-behind broadcast failed for {entry.room_slug}: {e}")
+                    if not entry.future.done():
+                        entry.future.set_result(data)
+
+            if self.pending:
+                loop = asyncio.get_running_loop()
+                delay = 0 if len(self.pending) >= self.max_batch_size else self.flush_interval
+                self._schedule_flush(loop, delay)
+
+    @staticmethod
+    def _persist(batch):
+        """Resolve rooms through the room cache and bulk insert every message"""
+        room_ids = {slug: get_active_room_id(slug) for slug in {entry.room_slug for entry in batch}}
+
+        messages = []
+        for entry in batch:
+            room_id = room_ids[entry.room_slug]
+            messages.append(
+                Message(room_id=room_id, user=entry.user, content=entry.content) if room_id else None
+            )
+
+        with transaction.atomic():
+            created = Message.objects.bulk_create([message for message in messages if message is not None])
+            # bulk_create sends no post_save, so count the batch here
+            room_stats.record_created(created)
+
+        results = [serialize_message(message) if message else None for message in messages]
+        # bulk_create sends no post_save, so extend the history cache and bump versions here
+        for message, data in zip(messages, results):
+            if message is not None:
+                try:
+                    history_cache.append_message(message.room_id, data)
+                except Exception as e:
+                    logger.warning(f"History cache update failed for room {message.room_id}: {e}")
+        for room_id in {message.room_id for message in messages if message is not None}:
+            try:
+                versions.bump_room(room_id)
+            except Exception as e:
+                logger.warning(f"Version stamp update failed for room {room_id}: {e}")
+        return results
+
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_buffer():
+    """Return the write-behind buffer bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        config = get_config()
+        buffer = WriteBehindBuffer(
+            flush_interval_ms=config['FLUSH_INTERVAL_MS'],
+            max_batch_size=config['MAX_BATCH_SIZE'],
+        )
+        _buffers[loop] = buffer
+    return buffer
@@ -6,3 +6,53 @@ from rest_framework.test import APIClient
 def client():
   """Reusable DRF API client fixture."""
   return APIClient()
+
+
+@pytest.fixture
+def room_client(django_user_model):
+  """(client, user, room): an API client authenticated as the owner of an empty room."""
+  from django.core.cache import cache
+  from chat.models import Room
+
+  cache.clear()
+  user = django_user_model.objects.create_user('room_owner', password='pass12345')
+  room = Room.objects.create(name='Lobby', slug='lobby', created_by=user)
+  client = APIClient()
+  client.force_authenticate(user=user)
+  return client, user, room
+
+
+@pytest.fixture
+def ws_connect():
+  """
+  Connect a WebSocket as `user`, asserting it was accepted
+
+  ws_connect(user, slug, query) opens ws/chat/<slug>/; without a slug it
+  opens the multiplexed ws/multiplex/ endpoint. joined=True also reads
+  the presence_snapshot and user_joined frames a room socket starts with.
+  The negotiated subprotocol is left on communicator.subprotocol.
+  """
+  from channels.testing import WebsocketCommunicator
+  from chat.consumers import ChatConsumer, MultiplexChatConsumer
+
+  async def connect(user, slug=None, query="", joined=False, subprotocols=None):
+    if slug is None:
+      communicator = WebsocketCommunicator(
+        MultiplexChatConsumer.as_asgi(), f"/ws/multiplex/{query}", subprotocols=subprotocols
+      )
+    else:
+      communicator = WebsocketCommunicator(
+        ChatConsumer.as_asgi(), f"/ws/chat/{slug}/{query}", subprotocols=subprotocols
+      )
+      communicator.scope["url_route"] = {"kwargs": {"room_slug": slug}}
+    communicator.scope["user"] = user
+    if query:
+      communicator.scope["query_string"] = query.lstrip("?").encode()
+    connected, communicator.subprotocol = await communicator.connect()
+    assert connected
+    if joined:
+      assert (await communicator.receive_json_from())["type"] == "presence_snapshot"
+      assert (await communicator.receive_json_from())["type"] == "user_joined"
+    return communicator
+
+  return connect
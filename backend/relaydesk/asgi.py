@@ -15,9 +15,10 @@ django_asgi_app = get_asgi_application()
 
 # Import routing and JWT middleware after Django setup
 from relaydesk.routing import websocket_urlpatterns
+from chat.local_cache import InvalidationListenerMiddleware
 from chat.middleware import JwtAuthMiddlewareStack
 
-application = ProtocolTypeRouter({
+application = InvalidationListenerMiddleware(ProtocolTypeRouter({
     "http": django_asgi_app,
     # TEMPORARY: Removed AllowedHostsOriginValidator to test if it's blocking connections
     # The validator was rejecting WebSocket connections from Vercel frontend
@@ -31,4 +32,4 @@ application = ProtocolTypeRouter({
     #         URLRouter(websocket_urlpatterns)
     #     )
     # ),
-})
+}))
@@ -3,8 +3,9 @@ WebSocket Routing Configuration
 Maps WebSocket URLs to consumers
 """
 from django.urls import path
-from chat.consumers import ChatConsumer
+from chat.consumers import ChatConsumer, MultiplexChatConsumer
 
 websocket_urlpatterns = [
     path('ws/chat/<slug:room_slug>/', ChatConsumer.as_asgi()),
+    path('ws/multiplex/', MultiplexChatConsumer.as_asgi()),
 ]
@@ -5,7 +5,7 @@ Shared configuration for all environments
 import os
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 from corsheaders.defaults import default_headers
 
 # Build paths
@@ -122,10 +122,18 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# WebSocket Authentication Caches
+# Verified token claims are kept until exp; users until changed or USER_CACHE_TTL
+CHAT_WS_AUTH = {
+    'TOKEN_CACHE_SIZE': config('CHAT_WS_TOKEN_CACHE_SIZE', default=10000, cast=int),
+    'USER_CACHE_SIZE': config('CHAT_WS_USER_CACHE_SIZE', default=5000, cast=int),
+    'USER_CACHE_TTL': config('CHAT_WS_USER_CACHE_TTL', default=300, cast=int),
+}
+
 # Channels Configuration
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': 'chat.channel_layers.InstrumentedRedisChannelLayer',
         'CONFIG': {
             'hosts': [config('REDIS_URL', default='redis://localhost:6379')],
             'capacity': 1500,
@@ -134,6 +142,174 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Sharded channel layer (opt-in)
+# A comma-separated list of Redis URLs spreads groups and process channels
+# over those hosts on a consistent hash ring (chat.channel_layers)
+REDIS_SHARD_URLS = config('REDIS_SHARD_URLS', default='', cast=Csv())
+if REDIS_SHARD_URLS:
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'chat.channel_layers.ShardedRedisChannelLayer',
+        'CONFIG': {
+            'hosts': REDIS_SHARD_URLS,
+            'capacity': 1500,
+            'expiry': 10,
+        },
+    }
+
+# Node-local group fan-out (opt-in)
+# CHANNEL_LAYER_MODE=node_local publishes each group message once over Redis
+# pub/sub and fans it out in process; delivery is at-most-once, no buffering
+if config('CHANNEL_LAYER_MODE', default='core') == 'node_local':
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'chat.channel_layers.NodeLocalChannelLayer',
+        'CONFIG': {
+            'hosts': REDIS_SHARD_URLS or [config('REDIS_URL', default='redis://localhost:6379')],
+        },
+    }
+
+# Chat Write-Behind Persistence (opt-in)
+# Buffers WebSocket messages per process and persists them with bulk_create
+CHAT_WRITE_BEHIND = {
+    'ENABLED': config('CHAT_WRITE_BEHIND_ENABLED', default=False, cast=bool),
+    'FLUSH_INTERVAL_MS': config('CHAT_WRITE_BEHIND_FLUSH_MS', default=5, cast=int),
+    'MAX_BATCH_SIZE': config('CHAT_WRITE_BEHIND_MAX_BATCH', default=200, cast=int),
+}
+
+# Room Presence
+# Per-connection entries in Redis, expired unless refreshed by heartbeats
+CHAT_PRESENCE = {
+    'BACKEND': 'chat.presence.RedisPresenceStore',
+    'OPTIONS': {
+        'url': config('PRESENCE_REDIS_URL', default='redis://localhost:6379/2'),
+        'ttl': config('PRESENCE_TTL', default=60, cast=int),
+    },
+    'HEARTBEAT_INTERVAL': config('PRESENCE_HEARTBEAT_INTERVAL', default=20, cast=int),
+}
+
+# Typing Indicators
+# Typing events are merged into at most one broadcast per room per interval
+CHAT_TYPING = {
+    'INTERVAL_MS': config('CHAT_TYPING_INTERVAL_MS', default=500, cast=int),
+    'TTL': config('CHAT_TYPING_TTL', default=5, cast=int),
+}
+
+# Multiplexed WebSocket Endpoint (ws/multiplex/)
+CHAT_MULTIPLEX = {
+    'MAX_ROOMS': config('CHAT_MULTIPLEX_MAX_ROOMS', default=100, cast=int),
+}
+
+# Room Resolution Cache
+# Per-process slug -> (room id, active) map, invalidated over the channel layer
+CHAT_ROOM_CACHE = {
+    'MAX_SIZE': config('CHAT_ROOM_CACHE_SIZE', default=10000, cast=int),
+    'TTL': config('CHAT_ROOM_CACHE_TTL', default=300, cast=int),
+    'MISS_TTL': config('CHAT_ROOM_CACHE_MISS_TTL', default=30, cast=int),
+}
+
+# Reconnect Replay Buffers
+# Last SIZE chat broadcasts per room; clients resume with ws/chat/<slug>/?since=<message id>
+CHAT_REPLAY = {
+    'BACKEND': 'chat.replay.RedisReplayBuffer',
+    'OPTIONS': {
+        'url': config('REPLAY_REDIS_URL', default='redis://localhost:6379/2'),
+        'size': config('CHAT_REPLAY_SIZE', default=200, cast=int),
+        'ttl': config('CHAT_REPLAY_TTL', default=3600, cast=int),
+    },
+}
+
+# Hot History Cache
+# Newest SIZE messages per room, pre-serialized in the shared cache
+CHAT_HISTORY_CACHE = {
+    'ENABLED': config('CHAT_HISTORY_CACHE_ENABLED', default=True, cast=bool),
+    'SIZE': config('CHAT_HISTORY_CACHE_SIZE', default=100, cast=int),
+    'TTL': config('CHAT_HISTORY_CACHE_TTL', default=300, cast=int),
+}
+
+# MessagePack Subprotocol
+# Clients offering "msgpack" in Sec-WebSocket-Protocol get binary frames; JSON stays the default
+CHAT_MSGPACK = {
+    'ENABLED': config('CHAT_MSGPACK_ENABLED', default=True, cast=bool),
+}
+
+# Outbound Queues
+# Bounded per-socket buffers; typing and presence are dropped before chat,
+# and a client lagging past MAX_LAG_SECONDS is closed with a resync hint
+CHAT_OUTBOUND = {
+    'MAX_QUEUE': config('CHAT_OUTBOUND_MAX_QUEUE', default=256, cast=int),
+    'MAX_LAG_SECONDS': config('CHAT_OUTBOUND_MAX_LAG_SECONDS', default=10, cast=float),
+    'EVICT_CLOSE_CODE': 4008,
+    # Chat frames for a room above this many events/s are packed into batch frames
+    'BATCH_RATE_THRESHOLD': config('CHAT_BATCH_RATE_THRESHOLD', default=20, cast=int),
+    'BATCH_MAX_SIZE': config('CHAT_BATCH_MAX_SIZE', default=50, cast=int),
+    'BATCH_MAX_DELAY_MS': config('CHAT_BATCH_MAX_DELAY_MS', default=10, cast=int),
+}
+
+# WebSocket Inbound Rate Limits
+# In-process token buckets per connection and per user, for each frame type;
+# MAX_VIOLATIONS throttled frames within VIOLATION_WINDOW seconds close the socket
+CHAT_WS_RATE_LIMIT = {
+    'ENABLED': config('CHAT_WS_RATE_LIMIT_ENABLED', default=True, cast=bool),
+    'BUCKETS': {
+        # frame type: (tokens per second, burst)
+        'chat_message': {'connection': (5, 10), 'user': (10, 20)},
+        'typing': {'connection': (5, 10), 'user': (10, 20)},
+        # subscribe/unsubscribe: enough burst to fill a multiplexed connection at once
+        'control': {
+            'connection': (10, CHAT_MULTIPLEX['MAX_ROOMS']),
+            'user': (20, 2 * CHAT_MULTIPLEX['MAX_ROOMS']),
+        },
+        'default': {'connection': (10, 20), 'user': (20, 40)},
+    },
+    'MAX_VIOLATIONS': 20,
+    'VIOLATION_WINDOW': 10,
+    'CLOSE_CODE': 4029,
+}
+
+# WebSocket admission control (per ASGI worker process)
+CHAT_ADMISSION = {
+    'MAX_CONNECTIONS': config('CHAT_WS_MAX_CONNECTIONS', default=5000, cast=int),
+    'MAX_CONCURRENT_HANDSHAKES': config('CHAT_WS_MAX_HANDSHAKES', default=100, cast=int),
+    'RETRY_AFTER': 5,  # seconds, sent to refused clients
+    'CLOSE_CODE': 4013,
+    'READY_LOAD': 0.9,  # readiness probe fails at this fraction of MAX_CONNECTIONS
+}
+
+# Denormalized Room.message_count / last_message_at
+CHAT_ROOM_STATS = {
+    # Count messages live in the room API instead of reading the stored counter (for verification)
+    'LIVE_COUNT': config('CHAT_ROOM_STATS_LIVE_COUNT', default=False, cast=bool),
+}
+
+# Chat pipeline latency histograms (relaydesk_chat_stage_seconds)
+CHAT_LATENCY = {
+    'ENABLED': config('CHAT_LATENCY_ENABLED', default=True, cast=bool),
+}
+
+# NDJSON history export (api/rooms/<slug>/export/, manage.py export_room)
+CHAT_EXPORT = {
+    'CHUNK_SIZE': config('CHAT_EXPORT_CHUNK_SIZE', default=2000, cast=int),  # rows per cursor fetch
+    'GZIP_LEVEL': 6,
+}
+
+# Prometheus scrape endpoint (api/metrics/)
+# With no token set, only loopback scrapers are let in
+CHAT_METRICS = {
+    'TOKEN': config('CHAT_METRICS_TOKEN', default=''),
+    'ALLOWED_IPS': tuple(config('CHAT_METRICS_ALLOWED_IPS', default='127.0.0.1,::1').split(',')),
+    'COUNTS_TTL': config('CHAT_METRICS_COUNTS_TTL', default=60, cast=int),
+}
+
+# Graceful WebSocket drain for rolling deploys (kill -USR2 <daphne pid>)
+CHAT_DRAIN = {
+    'SIGNAL': config('CHAT_DRAIN_SIGNAL', default='SIGUSR2'),
+    'WAVES': config('CHAT_DRAIN_WAVES', default=10, cast=int),
+    'WAVE_INTERVAL': config('CHAT_DRAIN_WAVE_INTERVAL', default=3, cast=float),
+    'JITTER': 0.5,
+    'BACKOFF_MIN': 1,
+    'BACKOFF_MAX': 15,
+    'CLOSE_CODE': 4012,
+}
+
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
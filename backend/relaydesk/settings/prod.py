@@ -95,6 +95,33 @@ CACHES = {
 #     }
 # }
 
+# Presence Configuration
+# TEMPORARY: In-process presence to match the in-memory channel layer above
+CHAT_PRESENCE = {
+    'BACKEND': 'chat.presence.LocalPresenceStore',
+    'OPTIONS': {'ttl': 60},
+    'HEARTBEAT_INTERVAL': 20,
+}
+
+# ORIGINAL Redis presence configuration (commented out for testing):
+# CHAT_PRESENCE = {
+#     'BACKEND': 'chat.presence.RedisPresenceStore',
+#     'OPTIONS': {'url': REDIS_URL, 'ttl': 60},
+#     'HEARTBEAT_INTERVAL': 20,
+# }
+
+# TEMPORARY: In-process replay buffers to match the in-memory channel layer above
+CHAT_REPLAY = {
+    'BACKEND': 'chat.replay.LocalReplayBuffer',
+    'OPTIONS': {'size': 200},
+}
+
+# ORIGINAL Redis replay configuration (commented out for testing):
+# CHAT_REPLAY = {
+#     'BACKEND': 'chat.replay.RedisReplayBuffer',
+#     'OPTIONS': {'url': REDIS_URL, 'size': 200, 'ttl': 3600},
+# }
+
 # Celery Configuration
 # TEMPORARY: Disabled to avoid Redis connection during testing
 # CELERY_BROKER_URL = REDIS_URL
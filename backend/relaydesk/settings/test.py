@@ -27,3 +27,14 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+CHAT_PRESENCE = {
+    'BACKEND': 'chat.presence.LocalPresenceStore',
+    'OPTIONS': {'ttl': 60},
+    'HEARTBEAT_INTERVAL': 20,
+}
+
+CHAT_REPLAY = {
+    'BACKEND': 'chat.replay.LocalReplayBuffer',
+    'OPTIONS': {'size': 200},
+}
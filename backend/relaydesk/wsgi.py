@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'relaydesk.settings')
 
 application = get_wsgi_application()
+
+# Per-process caches (rooms, JWT users) are invalidated over the channel layer
+from chat.local_cache import start_invalidation_thread  # noqa: E402
+
+start_invalidation_thread()
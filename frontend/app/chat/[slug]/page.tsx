@@ -23,6 +23,21 @@ interface User {
   email: string;
 }
 
+// Keyset page of room history (?shape=compact): previous/next are links to older/newer pages
+interface MessagePage {
+  results: any[];
+  users: Record<string, any>;
+  previous: string | null;
+  next: string | null;
+}
+
+// Compact messages reference user_id; put the author back from the users side-table
+const expandMessages = (messages: any[], users: Record<string, any>) =>
+  messages.map((message) => {
+    const user = users[String(message.user_id)];
+    return { ...message, user, username: user?.username };
+  });
+
 export default function ChatPage() {
   const params = useParams();
   const slugParam = params?.slug;
@@ -44,9 +59,13 @@ export default function ChatPage() {
   const manualCloseRef = useRef(false);
   const reconnectTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
   const pingIntervalRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  // Newest message seen on the socket; reconnects resume from it with ?since=
+  const lastMessageIdRef = useRef<string | null>(null);
+  // Server-suggested delay (ms) before the next reconnect, from retry/reconnect frames
+  const reconnectDelayRef = useRef<number | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
-  const { messages, setMessages, addMessage, typingUsers } = useChatStore();
+  const { messages, setMessages, addMessage, mergeMessages, typingUsers } = useChatStore();
   const { theme, addNotification } = useUIStore();
 
   useEffect(() => {
@@ -80,14 +99,16 @@ export default function ChatPage() {
         const [userRes, roomRes, messagesRes] = await Promise.all([
           api.get<User>('/api/auth/me/'),
           api.get<Room>(`/api/rooms/${roomSlug}/`),
-          api.get(`/api/rooms/${roomSlug}/messages/`),
+          api.get<MessagePage>(`/api/rooms/${roomSlug}/messages/?shape=compact`),
         ]);
 
         if (cancelled) return;
         setCurrentUser(userRes.data);
         setRoom(roomRes.data);
         setRoomError(null);
-        setMessages(Array.isArray(messagesRes.data) ? messagesRes.data : []);
+        // Newest page, oldest first; `previous` links to older history
+        const page = messagesRes.data;
+        setMessages(Array.isArray(page?.results) ? expandMessages(page.results, page.users ?? {}) : []);
       } catch (error) {
         if (cancelled) return;
         console.error('Failed to bootstrap chat:', error);
@@ -110,6 +131,19 @@ export default function ChatPage() {
     console.log('[WS Init]', { roomSlug });
     const wsUrl = `${resolveWebSocketBase()}/ws/chat/${roomSlug}/?token=${encodeURIComponent(authToken)}`;
 
+    // The replay buffer no longer reaches back to our last message; reload the newest page instead
+    const refetchHistory = async () => {
+      try {
+        const { data: page } = await api.get<MessagePage>(`/api/rooms/${roomSlug}/messages/?shape=compact`);
+        const fetched = Array.isArray(page?.results) ? expandMessages(page.results, page.users ?? {}) : [];
+        mergeMessages(fetched);
+        if (fetched.length) lastMessageIdRef.current = fetched[fetched.length - 1].id;
+      } catch (error) {
+        console.error('Failed to refetch history:', error);
+        addNotification({ type: 'error', message: 'Some messages may be missing. Reload to catch up.' });
+      }
+    };
+
     const connectSocket = () => {
       console.log('Attempting WS', { roomSlug });
       manualCloseRef.current = false;
@@ -124,7 +158,8 @@ export default function ChatPage() {
         pingIntervalRef.current = null;
       }
 
-      const socket = new WebSocket(wsUrl);
+      const since = lastMessageIdRef.current;
+      const socket = new WebSocket(since ? `${wsUrl}&since=${encodeURIComponent(since)}&shape=compact` : wsUrl);
       ws.current = socket;
 
       socket.onopen = () => {
@@ -143,10 +178,26 @@ export default function ChatPage() {
         console.log('WS message', event.data);
         try {
           const payload = JSON.parse(event.data);
-          if (payload.type === 'chat_message' && payload.message) {
-            addMessage(payload.message);
-          } else if (payload.type === 'error') {
-            addNotification({ type: 'error', message: payload.message || 'An error occurred' });
+          // Busy rooms deliver bursts as one batch frame holding ordered events
+          const frames = payload.type === 'batch' ? payload.events : [payload];
+          for (const frame of frames) {
+            if (frame.type === 'chat_message' && frame.message) {
+              addMessage(frame.message);
+              lastMessageIdRef.current = frame.message.id;
+            } else if (frame.type === 'history' && frame.messages) {
+              // Messages missed while reconnecting, in one compact frame
+              for (const message of expandMessages(frame.messages, frame.users ?? {})) {
+                addMessage(message);
+                lastMessageIdRef.current = message.id;
+              }
+            } else if (frame.type === 'resync' && frame.reason === 'history_gap') {
+              refetchHistory();
+            } else if (frame.type === 'retry' || frame.type === 'reconnect') {
+              // The worker is full or draining; it closes next. Back off so clients spread out.
+              reconnectDelayRef.current = (frame.retry_after ?? 2) * 1000;
+            } else if (frame.type === 'error') {
+              addNotification({ type: 'error', message: frame.message || 'An error occurred' });
+            }
           }
         } catch (error) {
           console.error('Failed to parse WebSocket payload:', error);
@@ -167,11 +218,13 @@ export default function ChatPage() {
           clearInterval(pingIntervalRef.current);
           pingIntervalRef.current = null;
         }
+        const delay = reconnectDelayRef.current ?? 2000;
+        reconnectDelayRef.current = null;
         reconnectTimerRef.current = setTimeout(() => {
           console.log('WS reconnecting');
           setConnectionState('reconnecting');
           connectSocket();
-        }, 2000);
+        }, delay);
       };
     };
 
@@ -191,7 +244,7 @@ export default function ChatPage() {
       }
       setConnectionState('idle');
     };
-  }, [roomSlug, authToken, addMessage, addNotification]);
+  }, [roomSlug, authToken, addMessage, mergeMessages, addNotification]);
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
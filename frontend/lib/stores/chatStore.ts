@@ -18,6 +18,7 @@ interface ChatState {
   onlineUsers: string[];
   setCurrentRoom: (slug: string) => void;
   addMessage: (message: Message) => void;
+  mergeMessages: (messages: Message[]) => void;
   updateMessage: (id: string, updates: Partial<Message>) => void;
   deleteMessage: (id: string) => void;
   setMessages: (messages: Message[]) => void;
@@ -35,10 +36,24 @@ export const useChatStore = create<ChatState>((set) => ({
 
   setCurrentRoom: (slug: string) => set({ currentRoomSlug: slug, messages: [] }),
 
+  // A message can arrive twice (replay after reconnect, history refetch); keep one copy per id
   addMessage: (message: Message) => set((state) => ({
-    messages: [...state.messages, message],
+    messages: state.messages.some((msg) => msg.id === message.id)
+      ? state.messages.map((msg) => (msg.id === message.id ? message : msg))
+      : [...state.messages, message],
   })),
 
+  // Fold a fetched page into what is shown, oldest first, one copy per id
+  mergeMessages: (messages: Message[]) => set((state) => {
+    const byId = new Map(state.messages.map((msg) => [msg.id, msg]));
+    for (const message of messages) byId.set(message.id, message);
+    return {
+      messages: Array.from(byId.values()).sort(
+        (a, b) => a.created_at.localeCompare(b.created_at) || a.id.localeCompare(b.id)
+      ),
+    };
+  }),
+
   updateMessage: (id: string, updates: Partial<Message>) => set((state) => ({
     messages: state.messages.map((msg) =>
       msg.id === id ? { ...msg, ...updates } : msg
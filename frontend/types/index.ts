@@ -18,6 +18,7 @@ export interface Room {
   created_by: User;
   created_at: string;
   message_count: number;
+  last_message_at: string | null;
 }
 
 export interface Message {
@@ -31,12 +32,34 @@ export interface Message {
 }
 
 export interface WSMessage {
-  type: 'chat_message' | 'user_joined' | 'user_left' | 'typing_indicator';
+  type: 'chat_message' | 'user_joined' | 'user_left' | 'typing_indicator' | 'presence_snapshot' | 'resync' | 'batch' | 'retry' | 'reconnect' | 'history';
+  // Slug of the room the frame belongs to (required on ws/multiplex/)
+  room?: string;
   message?: Message;
   username?: string;
   user_id?: number;
-  is_typing?: boolean;
+  // typing_indicator: users who started or stopped typing since the last frame
+  started?: TypingUser[];
+  stopped?: TypingUser[];
+  // Only on presence_snapshot; joins and leaves are deltas against it
   online_users?: OnlineUser[];
+  // Presence version: apply a delta only if it is exactly one newer, else send presence_resync
+  version?: number;
+  // Only on resync: the server is about to close (4008); reconnect and refetch these rooms
+  reason?: string;
+  rooms?: string[];
+  // Only on retry (worker full, 4013) and reconnect (worker draining, 4012): seconds to wait before reconnecting
+  retry_after?: number;
+  // Only on batch: consecutive frames delivered together, in order
+  events?: WSMessage[];
+  // Only on history (replay with shape=compact): messages carry user_id; authors are in users
+  messages?: (Omit<Message, 'user' | 'username'> & { user_id: number })[];
+  users?: Record<string, User>;
+}
+
+export interface TypingUser {
+  user_id: number;
+  username: string;
 }
 
 export interface OnlineUser {